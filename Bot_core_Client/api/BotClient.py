@@ -4,9 +4,13 @@ NapCat Bot 客户端异步API实现
 """
 import json
 import asyncio
-from typing import Optional, List, Dict, Any
+import os
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
 from ..logs import Logger
 from .client import BotClient as BaseBotClient
+from .cache import InfoCache, clone
+from .download_cache import DownloadCache, write_media
+from .media import MediaFile, encode_frame
 
 
 class BotClient(BaseBotClient):
@@ -72,14 +76,14 @@ class BotClient(BaseBotClient):
         await asyncio.sleep(0.1)
 
 
-    async def send_group_image(self, group_id: int, file: str, url: Optional[str] = None):
+    async def send_group_image(self, group_id: int, file: MediaFile, url: Optional[str] = None):
         """
         发送群图片
         :param group_id: 群号
-        :param file: 图片文件路径或 base64
+        :param file: 图片文件路径、base64、本地路径对象（自动编码并缓存）或 LocalFile（流式编码）
         :param url: 图片URL（可选）
         """
-        image_data = {"file": file}
+        image_data = {"file": await self.media.resolve_async(file)}
         if url:
             image_data["url"] = url
 
@@ -95,7 +99,7 @@ class BotClient(BaseBotClient):
                 ]
             }
         }
-        await self.websocket.send(json.dumps(json_msg))
+        await self.websocket.send(encode_frame(json_msg))
         Logger().info(f"发送群图片, 群号: {group_id}")
         await asyncio.sleep(0.1)
 
@@ -150,14 +154,14 @@ class BotClient(BaseBotClient):
         await asyncio.sleep(0.1)
 
 
-    async def send_group_voice(self, group_id: int, file: str, url: Optional[str] = None):
+    async def send_group_voice(self, group_id: int, file: MediaFile, url: Optional[str] = None):
         """
         发送群语音
         :param group_id: 群号
-        :param file: 语音文件路径或 base64
+        :param file: 语音文件路径、base64、本地路径对象（自动编码并缓存）或 LocalFile（流式编码）
         :param url: 语音URL（可选）
         """
-        voice_data = {"file": file}
+        voice_data = {"file": await self.media.resolve_async(file)}
         if url:
             voice_data["url"] = url
 
@@ -173,19 +177,19 @@ class BotClient(BaseBotClient):
                 ]
             }
         }
-        await self.websocket.send(json.dumps(json_msg))
+        await self.websocket.send(encode_frame(json_msg))
         Logger().info(f"发送群语音, 群号: {group_id}")
         await asyncio.sleep(0.1)
 
 
-    async def send_group_video(self, group_id: int, file: str, url: Optional[str] = None):
+    async def send_group_video(self, group_id: int, file: MediaFile, url: Optional[str] = None):
         """
         发送群视频
         :param group_id: 群号
-        :param file: 视频文件路径或 base64
+        :param file: 视频文件路径、base64、本地路径对象（自动编码并缓存）或 LocalFile（流式编码）
         :param url: 视频URL（可选）
         """
-        video_data = {"file": file}
+        video_data = {"file": await self.media.resolve_async(file)}
         if url:
             video_data["url"] = url
 
@@ -201,7 +205,7 @@ class BotClient(BaseBotClient):
                 ]
             }
         }
-        await self.websocket.send(json.dumps(json_msg))
+        await self.websocket.send(encode_frame(json_msg))
         Logger().info(f"发送群视频, 群号: {group_id}")
         await asyncio.sleep(0.1)
 
@@ -387,22 +391,22 @@ class BotClient(BaseBotClient):
         await asyncio.sleep(0.1)
 
 
-    async def send_group_file(self, group_id: int, file: str, name: str):
+    async def send_group_file(self, group_id: int, file: MediaFile, name: str):
         """
         发送群文件
         :param group_id: 群号
-        :param file: 文件路径或 base64
+        :param file: 文件路径、base64、本地路径对象（自动编码并缓存）或 LocalFile（流式编码）
         :param name: 文件名
         """
         json_msg = {
             "action": "send_group_file",
             "params": {
                 "group_id": group_id,
-                "file": file,
+                "file": await self.media.resolve_async(file),
                 "name": name
             }
         }
-        await self.websocket.send(json.dumps(json_msg))
+        await self.websocket.send(encode_frame(json_msg))
         Logger().info(f"发送群文件: {name}, 群号: {group_id}")
         await asyncio.sleep(0.1)
 
@@ -493,14 +497,14 @@ class BotClient(BaseBotClient):
         await asyncio.sleep(0.1)
 
 
-    async def send_private_image(self, user_id: int, file: str, url: Optional[str] = None):
+    async def send_private_image(self, user_id: int, file: MediaFile, url: Optional[str] = None):
         """
         发送私聊图片
         :param user_id: 用户ID
-        :param file: 图片文件路径或 base64
+        :param file: 图片文件路径、base64、本地路径对象（自动编码并缓存）或 LocalFile（流式编码）
         :param url: 图片URL（可选）
         """
-        image_data = {"file": file}
+        image_data = {"file": await self.media.resolve_async(file)}
         if url:
             image_data["url"] = url
 
@@ -516,7 +520,7 @@ class BotClient(BaseBotClient):
                 ]
             }
         }
-        await self.websocket.send(json.dumps(json_msg))
+        await self.websocket.send(encode_frame(json_msg))
         Logger().info(f"发送私聊图片, 用户: {user_id}")
         await asyncio.sleep(0.1)
 
@@ -571,14 +575,14 @@ class BotClient(BaseBotClient):
         await asyncio.sleep(0.1)
 
 
-    async def send_private_voice(self, user_id: int, file: str, url: Optional[str] = None):
+    async def send_private_voice(self, user_id: int, file: MediaFile, url: Optional[str] = None):
         """
         发送私聊语音
         :param user_id: 用户ID
-        :param file: 语音文件路径或 base64
+        :param file: 语音文件路径、base64、本地路径对象（自动编码并缓存）或 LocalFile（流式编码）
         :param url: 语音URL（可选）
         """
-        voice_data = {"file": file}
+        voice_data = {"file": await self.media.resolve_async(file)}
         if url:
             voice_data["url"] = url
 
@@ -594,19 +598,19 @@ class BotClient(BaseBotClient):
                 ]
             }
         }
-        await self.websocket.send(json.dumps(json_msg))
+        await self.websocket.send(encode_frame(json_msg))
         Logger().info(f"发送私聊语音, 用户: {user_id}")
         await asyncio.sleep(0.1)
 
 
-    async def send_private_video(self, user_id: int, file: str, url: Optional[str] = None):
+    async def send_private_video(self, user_id: int, file: MediaFile, url: Optional[str] = None):
         """
         发送私聊视频
         :param user_id: 用户ID
-        :param file: 视频文件路径或 base64
+        :param file: 视频文件路径、base64、本地路径对象（自动编码并缓存）或 LocalFile（流式编码）
         :param url: 视频URL（可选）
         """
-        video_data = {"file": file}
+        video_data = {"file": await self.media.resolve_async(file)}
         if url:
             video_data["url"] = url
 
@@ -622,7 +626,7 @@ class BotClient(BaseBotClient):
                 ]
             }
         }
-        await self.websocket.send(json.dumps(json_msg))
+        await self.websocket.send(encode_frame(json_msg))
         Logger().info(f"发送私聊视频, 用户: {user_id}")
         await asyncio.sleep(0.1)
 
@@ -802,22 +806,22 @@ class BotClient(BaseBotClient):
         await asyncio.sleep(0.1)
 
 
-    async def send_private_file(self, user_id: int, file: str, name: str):
+    async def send_private_file(self, user_id: int, file: MediaFile, name: str):
         """
         发送私聊文件
         :param user_id: 用户ID
-        :param file: 文件路径或 base64
+        :param file: 文件路径、base64、本地路径对象（自动编码并缓存）或 LocalFile（流式编码）
         :param name: 文件名
         """
         json_msg = {
             "action": "send_private_file",
             "params": {
                 "user_id": user_id,
-                "file": file,
+                "file": await self.media.resolve_async(file),
                 "name": name
             }
         }
-        await self.websocket.send(json.dumps(json_msg))
+        await self.websocket.send(encode_frame(json_msg))
         Logger().info(f"发送私聊文件: {name}, 用户: {user_id}")
         await asyncio.sleep(0.1)
 
@@ -875,58 +879,71 @@ class BotClient(BaseBotClient):
         await asyncio.sleep(0.1)
 
 
-    async def get_group_history_msg(self, group_id: int, message_seq: Optional[int] = None):
+    async def get_group_history_msg(self, group_id: int, message_seq: Optional[int] = None,
+                                    count: Optional[int] = None):
         """
         获取群历史消息
         :param group_id: 群号
-        :param message_seq: 消息序号（可选）
-        :return: 返回的消息数据（需要通过响应处理）
+        :param message_seq: 消息序号（可选），返回该消息及之前的消息
+        :param count: 获取的条数（可选）
+        :return: 返回的消息数据
         """
         params = {"group_id": group_id}
         if message_seq:
             params["message_seq"] = message_seq
+        if count:
+            params["count"] = count
 
-        json_msg = {
-            "action": "get_group_history_msg",
-            "params": params
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        data = await self.call_action("get_group_history_msg", params, coalesce=True)
         Logger().info(f"获取群历史消息, 群号: {group_id}")
-        await asyncio.sleep(0.1)
+        return data
 
 
     async def get_msg(self, message_id: int):
         """
-        获取消息详情
+        获取消息详情，最近经过接收循环的消息直接从本地消息存储返回
         :param message_id: 消息ID
-        :return: 返回的消息详情（需要通过响应处理）
+        :return: 返回的消息详情，本地存储中的消息返回副本，可以放心修改
         """
-        json_msg = {
-            "action": "get_msg",
-            "params": {
-                "message_id": message_id
-            }
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        if self.message_store is not None:
+            cached = self.message_store.get(message_id)
+            if cached is not None:
+                # 存储中的字典也是分发给插件的事件，不能交出去被修改
+                return clone(cached)
+
+        data = await self.call_action("get_msg", {
+            "message_id": message_id
+        }, coalesce=True)
         Logger().info(f"获取消息详情: {message_id}")
-        await asyncio.sleep(0.1)
+        return data
+
+
+    def get_recent_msgs(self, group_id: Optional[int] = None, user_id: Optional[int] = None,
+                        limit: int = 20) -> List[Dict]:
+        """
+        获取本地消息存储中会话的最近消息（不发送请求）
+        :param group_id: 群号
+        :param user_id: 私聊用户ID（与 group_id 二选一）
+        :param limit: 最多返回的条数
+        :return: 按时间从旧到新排列的消息事件副本列表
+        """
+        if self.message_store is None:
+            return []
+        return [clone(event) for event in
+                self.message_store.recent(group_id=group_id, user_id=user_id, limit=limit)]
 
 
     async def get_forward_msg(self, message_id: int):
         """
         获取合并转发消息
         :param message_id: 消息ID
-        :return: 返回的合并转发消息（需要通过响应处理）
+        :return: 返回的合并转发消息
         """
-        json_msg = {
-            "action": "get_forward_msg",
-            "params": {
-                "message_id": message_id
-            }
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        data = await self.call_action("get_forward_msg", {
+            "message_id": message_id
+        }, coalesce=True)
         Logger().info(f"获取合并转发消息: {message_id}")
-        await asyncio.sleep(0.1)
+        return data
 
 
     async def set_essence_msg(self, message_id: int):
@@ -945,41 +962,97 @@ class BotClient(BaseBotClient):
         await asyncio.sleep(0.1)
 
 
-    async def get_friend_history_msg(self, user_id: int, message_seq: Optional[int] = None):
+    async def get_friend_history_msg(self, user_id: int, message_seq: Optional[int] = None,
+                                     count: Optional[int] = None):
         """
         获取好友历史消息
         :param user_id: 用户ID
-        :param message_seq: 消息序号（可选）
-        :return: 返回的消息数据（需要通过响应处理）
+        :param message_seq: 消息序号（可选），返回该消息及之前的消息
+        :param count: 获取的条数（可选）
+        :return: 返回的消息数据
         """
         params = {"user_id": user_id}
         if message_seq:
             params["message_seq"] = message_seq
+        if count:
+            params["count"] = count
 
-        json_msg = {
-            "action": "get_friend_history_msg",
-            "params": params
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        data = await self.call_action("get_friend_history_msg", params, coalesce=True)
         Logger().info(f"获取好友历史消息, 用户: {user_id}")
-        await asyncio.sleep(0.1)
+        return data
+
+
+    def iter_group_history(self, group_id: int, since: Optional[int] = None, count: int = 20,
+                           interval: float = 0.1) -> AsyncIterator[Dict]:
+        """
+        从新到旧逐条遍历群历史消息
+        按 message_seq 向前翻页，处理当前页时预取下一页，相邻页重叠的消息只产出一次
+        用法: async for msg in client.iter_group_history(group_id, since=timestamp): ...
+        :param group_id: 群号
+        :param since: 可选，时间戳，遇到更早的消息时停止
+        :param count: 每页条数
+        :param interval: 两次翻页请求之间的最小间隔（秒）
+        """
+        async def fetch(seq: Optional[int]):
+            return await self.get_group_history_msg(group_id, seq, count)
+        return self._iter_history(fetch, since, interval)
+
+
+    def iter_friend_history(self, user_id: int, since: Optional[int] = None, count: int = 20,
+                            interval: float = 0.1) -> AsyncIterator[Dict]:
+        """
+        从新到旧逐条遍历好友历史消息，参数同 iter_group_history
+        :param user_id: 用户ID
+        """
+        async def fetch(seq: Optional[int]):
+            return await self.get_friend_history_msg(user_id, seq, count)
+        return self._iter_history(fetch, since, interval)
+
+
+    async def _iter_history(self, fetch: Callable[[Optional[int]], Awaitable[Any]],
+                            since: Optional[int], interval: float) -> AsyncIterator[Dict]:
+        """历史消息翻页：每页按时间从旧到新，下一页以本页最早一条的 message_seq 为起点"""
+        async def page(seq: Optional[int]):
+            if seq is not None:
+                await asyncio.sleep(interval)
+            return await fetch(seq)
+
+        previous_ids = set()  # 只有相邻两页会重叠，保留上一页的 ID 即可
+        pending = asyncio.ensure_future(page(None))
+        try:
+            while pending is not None:
+                data = await pending
+                pending = None
+                messages = (data or {}).get("messages") or []
+                fresh = [m for m in reversed(messages) if m.get("message_id") not in previous_ids]
+                if not fresh:
+                    return
+                oldest = messages[0]
+                reached = since is not None and oldest.get("time", 0) < since
+                if not reached:
+                    seq = oldest.get("message_seq") or oldest.get("message_id")
+                    pending = asyncio.ensure_future(page(seq))
+                for msg in fresh:
+                    if since is not None and msg.get("time", 0) < since:
+                        return
+                    yield msg
+                previous_ids = {m.get("message_id") for m in messages}
+        finally:
+            if pending is not None:
+                pending.cancel()
 
 
     async def get_essence_msg_list(self, group_id: int):
         """
         获取贴表情详情（获取精华消息列表）
         :param group_id: 群号
-        :return: 返回的精华消息列表（需要通过响应处理）
+        :return: 返回的精华消息列表
         """
-        json_msg = {
-            "action": "get_essence_msg_list",
-            "params": {
-                "group_id": group_id
-            }
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        data = await self.call_action("get_essence_msg_list", {
+            "group_id": group_id
+        }, coalesce=True)
         Logger().info(f"获取贴表情详情, 群号: {group_id}")
-        await asyncio.sleep(0.1)
+        return data
 
 
     async def send_forward_msg(self, messages: List[Dict]):
@@ -1003,35 +1076,65 @@ class BotClient(BaseBotClient):
         获取语音消息详情
         :param file: 语音文件标识
         :param out_format: 输出格式（默认mp3）
-        :return: 返回的语音文件信息（需要通过响应处理）
+        :return: 返回的语音文件信息
         """
-        json_msg = {
-            "action": "get_record",
-            "params": {
-                "file": file,
-                "out_format": out_format
-            }
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        data = await self.call_action("get_record", {
+            "file": file,
+            "out_format": out_format
+        }, coalesce=True)
         Logger().info(f"获取语音消息详情: {file}")
-        await asyncio.sleep(0.1)
+        return data
 
 
     async def get_image(self, file: str):
         """
         获取图片消息详情
         :param file: 图片文件标识
-        :return: 返回的图片文件信息（需要通过响应处理）
+        :return: 返回的图片文件信息
         """
-        json_msg = {
-            "action": "get_image",
-            "params": {
-                "file": file
-            }
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        data = await self.call_action("get_image", {
+            "file": file
+        }, coalesce=True)
         Logger().info(f"获取图片消息详情: {file}")
-        await asyncio.sleep(0.1)
+        return data
+
+    async def get_image_path(self, file: str) -> Optional[str]:
+        """
+        获取图片并缓存到本地磁盘，同一图片再次获取时直接返回缓存文件
+        :param file: 图片文件标识
+        :return: 本地文件路径，获取失败返回 None
+        """
+        suffix = os.path.splitext(file)[1]
+        return await self._download_to_cache("image", file, None,
+                                             suffix if len(suffix) <= 5 else "")
+
+    async def get_record_path(self, file: str, out_format: str = "mp3") -> Optional[str]:
+        """
+        获取语音（转换为 out_format）并缓存到本地磁盘
+        :param file: 语音文件标识
+        :param out_format: 输出格式（默认mp3）
+        :return: 本地文件路径，获取失败返回 None
+        """
+        return await self._download_to_cache("record", file, out_format, f".{out_format}")
+
+    async def _download_to_cache(self, kind: str, file: str, out_format: Optional[str],
+                                 suffix: str) -> Optional[str]:
+        """通过 get_image / get_record 获取文件并写入下载缓存"""
+        if self.download_cache is None:
+            self.download_cache = DownloadCache()
+
+        async def writer(temp_path: str) -> bool:
+            if kind == "record":
+                data = await self.get_record(file, out_format)
+            else:
+                data = await self.get_image(file)
+            if not data:
+                return False
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, write_media, data, temp_path)
+
+        key = DownloadCache.make_key(kind, file, out_format or "")
+        return await self.download_cache.fetch(key, writer, suffix)
 
     # ==================== 群管理相关 ====================
 
@@ -1190,77 +1293,87 @@ class BotClient(BaseBotClient):
         获取登录号信息
         :return: 登录号信息
         """
-        json_msg = {
-            "action": "get_login_info",
-            "params": {}
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        data = await self.call_action("get_login_info", coalesce=True)
         Logger().info("获取登录号信息")
-        await asyncio.sleep(0.1)
+        return data
 
-    async def get_friend_list(self):
+    async def get_friend_list(self, no_cache: bool = False):
         """
         获取好友列表
+        :param no_cache: 是否跳过本地缓存
         :return: 好友列表
         """
-        json_msg = {
-            "action": "get_friend_list",
-            "params": {}
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        if self.info_cache is not None and not no_cache:
+            cached = self.info_cache.get_list(InfoCache.FRIEND_LIST)
+            if cached is not None:
+                return cached
+
+        data = await self.call_action("get_friend_list", coalesce=True)
         Logger().info("获取好友列表")
-        await asyncio.sleep(0.1)
+        if data is not None and self.info_cache is not None:
+            self.info_cache.set_list(InfoCache.FRIEND_LIST, data)
+        return data
 
     async def get_group_info(self, group_id: int, no_cache: bool = False):
         """
         获取群信息
         :param group_id: 群号
-        :param no_cache: 是否不使用缓存
+        :param no_cache: 是否不使用缓存（同时跳过本地缓存）
         :return: 群信息
         """
-        json_msg = {
-            "action": "get_group_info",
-            "params": {
-                "group_id": group_id,
-                "no_cache": no_cache
-            }
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        if self.info_cache is not None and not no_cache:
+            cached = self.info_cache.get_group(group_id)
+            if cached is not None:
+                return cached
+
+        data = await self.call_action("get_group_info", {
+            "group_id": group_id,
+            "no_cache": no_cache
+        }, coalesce=True)
         Logger().info(f"获取群信息: {group_id}")
-        await asyncio.sleep(0.1)
+        if data is not None and self.info_cache is not None:
+            self.info_cache.set_group(group_id, data)
+        return data
 
-    async def get_group_list(self):
+    async def get_group_list(self, no_cache: bool = False):
         """
         获取群列表
+        :param no_cache: 是否跳过本地缓存
         :return: 群列表
         """
-        json_msg = {
-            "action": "get_group_list",
-            "params": {}
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        if self.info_cache is not None and not no_cache:
+            cached = self.info_cache.get_list(InfoCache.GROUP_LIST)
+            if cached is not None:
+                return cached
+
+        data = await self.call_action("get_group_list", coalesce=True)
         Logger().info("获取群列表")
-        await asyncio.sleep(0.1)
+        if data is not None and self.info_cache is not None:
+            self.info_cache.set_list(InfoCache.GROUP_LIST, data)
+        return data
 
     async def get_group_member_info(self, group_id: int, user_id: int, no_cache: bool = False):
         """
         获取群成员信息
         :param group_id: 群号
         :param user_id: 成员QQ号
-        :param no_cache: 是否不使用缓存
+        :param no_cache: 是否不使用缓存（同时跳过本地缓存）
         :return: 群成员信息
         """
-        json_msg = {
-            "action": "get_group_member_info",
-            "params": {
-                "group_id": group_id,
-                "user_id": user_id,
-                "no_cache": no_cache
-            }
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        if self.info_cache is not None and not no_cache:
+            cached = self.info_cache.get_member(group_id, user_id)
+            if cached is not None:
+                return cached
+
+        data = await self.call_action("get_group_member_info", {
+            "group_id": group_id,
+            "user_id": user_id,
+            "no_cache": no_cache
+        }, coalesce=True)
         Logger().info(f"获取群成员信息: {user_id}, 群号: {group_id}")
-        await asyncio.sleep(0.1)
+        if data is not None and self.info_cache is not None:
+            self.info_cache.set_member(group_id, user_id, data)
+        return data
 
     async def get_group_member_list(self, group_id: int):
         """
@@ -1268,15 +1381,11 @@ class BotClient(BaseBotClient):
         :param group_id: 群号
         :return: 群成员列表
         """
-        json_msg = {
-            "action": "get_group_member_list",
-            "params": {
-                "group_id": group_id
-            }
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        data = await self.call_action("get_group_member_list", {
+            "group_id": group_id
+        }, coalesce=True)
         Logger().info(f"获取群成员列表: {group_id}")
-        await asyncio.sleep(0.1)
+        return data
 
     # ==================== 请求处理相关 ====================
 
@@ -1327,26 +1436,18 @@ class BotClient(BaseBotClient):
         获取版本信息
         :return: 版本信息
         """
-        json_msg = {
-            "action": "get_version_info",
-            "params": {}
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        data = await self.call_action("get_version_info", coalesce=True)
         Logger().info("获取版本信息")
-        await asyncio.sleep(0.1)
+        return data
 
     async def get_status(self):
         """
         获取运行状态
         :return: 运行状态
         """
-        json_msg = {
-            "action": "get_status",
-            "params": {}
-        }
-        await self.websocket.send(json.dumps(json_msg))
+        data = await self.call_action("get_status", coalesce=True)
         Logger().info("获取运行状态")
-        await asyncio.sleep(0.1)
+        return data
 
     async def clean_cache(self):
         """
@@ -0,0 +1,167 @@
+"""
+群、成员、好友信息的进程内缓存
+由 BotClient 的查询方法使用，并由接收循环中的通知事件精确失效
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+def clone(value: Any) -> Any:
+    """复制 JSON 结构的字典与列表，调用方修改返回值不会影响缓存或其他调用方"""
+    if isinstance(value, dict):
+        return {k: clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [clone(v) for v in value]
+    return value
+
+
+class TTLCache:
+    """带过期时间的 LRU 缓存"""
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (过期时间, 值)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取未过期的值，命中时移动到最近使用端"""
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expire_at, value = item
+        if expire_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入值，超出容量时淘汰最久未使用的条目"""
+        expire_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expire_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> bool:
+        """删除条目，返回是否存在"""
+        return self._data.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def keys(self):
+        return list(self._data.keys())
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class InfoCache:
+    """
+    群信息、群成员信息、群列表与好友列表缓存
+
+    条目在 ttl 秒后过期，各类条目按 LRU 限制数量。以下通知事件会精确失效相关条目：
+    group_increase / group_decrease 失效该成员与群信息（群人数变化），机器人自身进退群时
+    还会失效群列表；group_admin / group_card 失效该成员；friend_add 失效好友列表。
+    群列表中的 member_count 不随普通成员进退群失效，最长滞后 ttl 秒。
+    写入与读取时都会复制，缓存中的对象不会被调用方修改。
+    """
+    GROUP_LIST = "group_list"
+    FRIEND_LIST = "friend_list"
+
+    def __init__(self, ttl: float = 300.0, max_groups: int = 1024, max_members: int = 16384):
+        """
+        :param ttl: 条目存活时间（秒）
+        :param max_groups: 群信息条目上限
+        :param max_members: 群成员信息条目上限
+        """
+        self.groups = TTLCache(ttl, max_groups)     # group_id -> 群信息
+        self.members = TTLCache(ttl, max_members)   # (group_id, user_id) -> 成员信息
+        self.lists = TTLCache(ttl, 2)               # GROUP_LIST / FRIEND_LIST -> 列表
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _lookup(self, cache: TTLCache, key: Hashable) -> Any:
+        value = cache.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            value = clone(value)
+        return value
+
+    def get_group(self, group_id: int) -> Optional[dict]:
+        return self._lookup(self.groups, group_id)
+
+    def set_group(self, group_id: int, info: dict) -> None:
+        self.groups.set(group_id, clone(info))
+
+    def get_member(self, group_id: int, user_id: int) -> Optional[dict]:
+        return self._lookup(self.members, (group_id, user_id))
+
+    def set_member(self, group_id: int, user_id: int, info: dict) -> None:
+        self.members.set((group_id, user_id), clone(info))
+
+    def get_list(self, name: str) -> Optional[list]:
+        return self._lookup(self.lists, name)
+
+    def set_list(self, name: str, items: list) -> None:
+        self.lists.set(name, clone(items))
+
+    def _invalidate(self, cache: TTLCache, key: Hashable) -> None:
+        if cache.pop(key):
+            self.invalidations += 1
+
+    def invalidate_group(self, group_id: int) -> None:
+        """失效某个群的群信息及其所有成员信息"""
+        self._invalidate(self.groups, group_id)
+        for key in self.members.keys():
+            if key[0] == group_id:
+                self._invalidate(self.members, key)
+
+    def on_event(self, event: dict) -> None:
+        """
+        根据通知事件失效相关条目，由接收循环对每个事件调用
+        :param event: 原始事件字典
+        """
+        if event.get("post_type") != "notice":
+            return
+        notice_type = event.get("notice_type")
+        group_id = event.get("group_id")
+        user_id = event.get("user_id")
+        is_self = user_id is not None and user_id == event.get("self_id")
+
+        if notice_type in ("group_increase", "group_decrease"):
+            if is_self:
+                # 机器人自身进群或退群，群列表与该群的全部信息都已过时
+                self._invalidate(self.lists, self.GROUP_LIST)
+                self.invalidate_group(group_id)
+            else:
+                self._invalidate(self.members, (group_id, user_id))
+                self._invalidate(self.groups, group_id)
+        elif notice_type in ("group_admin", "group_card"):
+            self._invalidate(self.members, (group_id, user_id))
+        elif notice_type == "friend_add":
+            self._invalidate(self.lists, self.FRIEND_LIST)
+
+    def clear(self) -> None:
+        self.groups.clear()
+        self.members.clear()
+        self.lists.clear()
+
+    def stats(self) -> dict:
+        """命中、未命中与失效计数"""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "invalidations": self.invalidations,
+            "groups": len(self.groups),
+            "members": len(self.members),
+        }
@@ -4,26 +4,61 @@ NapCat 消息相关 API - 核心同步功能模块
 """
 import json
 import asyncio
+import itertools
+import os
 from typing import Optional, List, Dict, Any
+from ..concurrency import validate as validate_concurrency
 from ..logs import Logger
+from .cache import clone
+from .connection import StreamInterrupted
+from .dispatch import awaiting
+from .tiers import TIERS
+from .media import FrameEncoder, LocalFile, MediaCache, MediaFile, encode_frame
+from .waiters import WaiterRegistry
 
 # 插件注册表，存储插件名称和函数的映射
 _plugin_registry = {}
 
 
-def plugin(name: str):
+class StopPropagation(Exception):
+    """在插件中抛出，表示事件已处理，优先级更低的插件不再收到该事件"""
+
+
+class _Handled:
+    def __repr__(self) -> str:
+        return "HANDLED"
+
+
+# 插件返回 HANDLED 与抛出 StopPropagation 效果相同
+HANDLED = _Handled()
+
+
+def plugin(name: str, tier: str = "normal", priority: int = 0, max_concurrency: int = None,
+           per_key=None, overflow: str = "queue", max_queue: int = 100):
     """
     插件装饰器
     
     Args:
         name: 插件名称，字符串
+        tier: 插件等级，critical / normal / best-effort，启用过载降级时先跳过低等级的插件
+        priority: 优先级，数值大的先执行，相同时按加载顺序；返回 HANDLED 或抛出
+            StopPropagation 后优先级更低的插件不再执行
+        max_concurrency: 同时处理的事件数上限，默认不限制
+        per_key: 并发计数范围，None 全局，conversation 按会话（群或私聊），user 按用户，
+            或接收消息字典返回键的函数
+        overflow: 名额已满时的策略，queue 排队等待，drop 跳过本插件，latest 只保留最新的一个等待事件
+        max_queue: queue 策略下每个键最多排队的事件数，超过后新事件跳过本插件
         
     Returns:
         装饰器函数
     
     Raises:
-        ValueError: 当插件名称已存在时抛出异常
+        ValueError: 当插件名称已存在或等级、并发参数无效时抛出异常
     """
+    if tier not in TIERS:
+        raise ValueError(f"插件 '{name}' 的等级 '{tier}' 无效，可选 {tuple(TIERS)}")
+    validate_concurrency(name, max_concurrency, per_key, overflow, max_queue)
+
     def decorator(func):
         # 检查插件名称是否已经存在
         if name in _plugin_registry:
@@ -32,6 +67,9 @@ def plugin(name: str):
         # 注册插件
         _plugin_registry[name] = func
         func.plugin_name = name  # 为函数添加插件名称属性
+        func.plugin_tier = tier
+        func.plugin_priority = priority
+        func.plugin_concurrency = (max_concurrency, per_key, overflow, max_queue) if max_concurrency else None
         
         return func
     
@@ -83,14 +121,161 @@ class Message:
         return self._msg.get(key, default)
 
 
+class MessageTemplate:
+    """
+    冻结的消息模板 - 由 MessageBuilder.freeze() 生成
+
+    消息链在冻结时一次性序列化为 JSON 文本，并与动作帧的固定部分一起预先拼好，
+    之后每次发送只在各固定片段之间插入占位符的值（目标号码不同时再拼接帧头）。模板创建后不可修改。
+    """
+    __slots__ = ("_websocket", "_target_type", "_target_id", "_statics", "_slot_names",
+                 "_is_forward", "_heads", "_prefixes", "_suffix")
+
+    def __init__(self, websocket, target_type: str, target_id: int,
+                 message_chain: List[Dict[str, Any]], slots: Dict[int, str],
+                 media: MediaCache = None):
+        self._websocket = websocket
+        media = media if media is not None else MediaCache()
+
+        def _default(obj):
+            # 本地路径对象在冻结时编码一次（同步读取，冻结通常在启动时进行）
+            if isinstance(obj, os.PathLike):
+                return media.resolve(obj)
+            return self._reject(obj)
+
+        self._target_type = target_type
+        self._target_id = target_id
+        self._is_forward = any(seg.get("type") == "node" for seg in message_chain)
+
+        # 固定片段连同括号、逗号与占位符外层的文本段一起预先拼好，
+        # _statics 比占位符多一项，发送时在相邻两项之间插入占位符值的 JSON 字符串
+        statics: List[str] = []
+        slot_names: List[str] = []
+        buffer = "["
+        for index, segment in enumerate(message_chain):
+            separator = "," if index else ""
+            if index in slots:
+                statics.append(buffer + separator + '{"type": "text", "data": {"text": ')
+                buffer = "}}"
+                slot_names.append(slots[index])
+            else:
+                buffer += separator + json.dumps(segment, ensure_ascii=False, default=_default)
+        statics.append(buffer + "]")
+        if not slot_names:
+            # 没有占位符时整条消息链作为末尾片段，保证首尾片段不重复
+            statics.insert(0, "")
+        self._statics = tuple(statics)
+        self._slot_names = tuple(slot_names)
+
+        # 动作帧: 帧头 + 目标号码 + 中段 + 消息链 + "}}"，普通消息与合并转发各一份
+        heads = {}
+        for forward in (False, True):
+            if target_type == 'group':
+                action = "send_group_forward_msg" if forward else "send_group_msg"
+                target_key = "group_id"
+            else:  # private
+                action = "send_private_forward_msg" if forward else "send_private_msg"
+                target_key = "user_id"
+            chain_key = "messages" if forward else "message"
+            heads[forward] = (f'{{"action": "{action}", "params": {{"{target_key}": ',
+                              f', "{chain_key}": ')
+        self._heads = heads
+        self._prefixes = {forward: head + json.dumps(target_id) + middle + statics[0]
+                          for forward, (head, middle) in heads.items()}
+        self._suffix = statics[-1] + "}}"
+
+    @staticmethod
+    def _reject(obj):
+        if isinstance(obj, LocalFile):
+            raise ValueError("LocalFile 不能用于消息模板，请改用 pathlib.Path 或 base64 字符串")
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    @property
+    def slots(self) -> tuple:
+        """模板中的占位符名称"""
+        return self._slot_names
+
+    @property
+    def target_type(self) -> str:
+        return self._target_type
+
+    @property
+    def target_id(self) -> int:
+        return self._target_id
+
+    def _fill(self, values: Dict[str, Any]) -> str:
+        """首尾固定片段之间的部分：依次为占位符值与其后的固定片段"""
+        if not self._slot_names:
+            return ""
+        missing = [name for name in self._slot_names if name not in values]
+        if missing:
+            raise ValueError(f"缺少占位符的值: {', '.join(missing)}")
+        statics = self._statics
+        pieces = []
+        for index, name in enumerate(self._slot_names):
+            pieces.append(json.dumps(str(values[name]), ensure_ascii=False))
+            if index + 1 < len(self._slot_names):
+                pieces.append(statics[index + 1])
+        return "".join(pieces)
+
+    def render(self, **values) -> str:
+        """
+        填充占位符并返回消息链的 JSON 文本
+        :param values: 占位符名称到文本的映射
+        """
+        return self._statics[0] + self._fill(values) + self._statics[-1]
+
+    def _frame(self, forward: bool, target_id: Optional[int], values: Dict[str, Any]) -> str:
+        """拼接完整的动作帧"""
+        if target_id is None or target_id == self._target_id:
+            prefix = self._prefixes[forward]
+        else:
+            head, middle = self._heads[forward]
+            prefix = head + json.dumps(target_id) + middle + self._statics[0]
+        return prefix + self._fill(values) + self._suffix
+
+    async def send(self, target_id: Optional[int] = None, **values) -> None:
+        """
+        发送模板消息
+        :param target_id: 可选，覆盖冻结时的群号/用户ID
+        :param values: 占位符的值
+        """
+        await self._websocket.send(self._frame(False, target_id, values))
+        target_id = self._target_id if target_id is None else target_id
+        if self._target_type == 'group':
+            Logger().info(f"发送群模板消息, 群号: {target_id}")
+        else:
+            Logger().info(f"发送私聊模板消息, 用户: {target_id}")
+        await asyncio.sleep(0.1)
+
+    async def send_forward(self, target_id: Optional[int] = None, **values) -> None:
+        """
+        以合并转发形式发送模板
+        :param target_id: 可选，覆盖冻结时的群号/用户ID
+        :param values: 占位符的值
+        """
+        if not self._is_forward:
+            Logger().warning("模板中没有转发节点，无法发送合并转发消息")
+            return
+        await self._websocket.send(self._frame(True, target_id, values))
+        target_id = self._target_id if target_id is None else target_id
+        if self._target_type == 'group':
+            Logger().info(f"发送群合并转发模板消息, 群号: {target_id}")
+        else:
+            Logger().info(f"发送私聊合并转发模板消息, 用户: {target_id}")
+        await asyncio.sleep(0.1)
+
+
 class MessageBuilder:
     """消息构建器 - 支持链式调用"""
-    def __init__(self, websocket, target_type: str, target_id: int):
+    def __init__(self, websocket, target_type: str, target_id: int, media: MediaCache = None):
         self.websocket = websocket
         self.target_type = target_type  # 'group' or 'private'
         self.target_id = target_id
+        self.media = media if media is not None else MediaCache()
         self.message_chain: List[Dict[str, Any]] = []
-    
+        self._slots: Dict[int, str] = {}  # 消息链下标 -> 占位符名称
+
     def text(self, content: str) -> 'MessageBuilder':
         """添加文本消息"""
         self.message_chain.append({
@@ -98,7 +283,18 @@ class MessageBuilder:
             "data": {"text": content}
         })
         return self
-    
+
+    def slot(self, name: str, default: str = "") -> 'MessageBuilder':
+        """
+        添加文本占位符，冻结为模板后在发送时填充
+        :param name: 占位符名称
+        :param default: 未冻结直接发送时使用的文本
+        """
+        if name in self._slots.values():
+            raise ValueError(f"占位符 '{name}' 已存在")
+        self._slots[len(self.message_chain)] = name
+        return self.text(default)
+
     def at(self, qq: int) -> 'MessageBuilder':
         """添加@某人 (仅群聊)"""
         self.message_chain.append({
@@ -107,8 +303,8 @@ class MessageBuilder:
         })
         return self
     
-    def image(self, file: str, url: Optional[str] = None) -> 'MessageBuilder':
-        """添加图片"""
+    def image(self, file: MediaFile, url: Optional[str] = None) -> 'MessageBuilder':
+        """添加图片，本地路径对象在发送时（线程池中）编码为 base64 并缓存，大文件可传入 LocalFile 流式发送"""
         image_data = {"file": file}
         if url:
             image_data["url"] = url
@@ -134,8 +330,8 @@ class MessageBuilder:
         })
         return self
     
-    def voice(self, file: str, url: Optional[str] = None) -> 'MessageBuilder':
-        """添加语音"""
+    def voice(self, file: MediaFile, url: Optional[str] = None) -> 'MessageBuilder':
+        """添加语音，本地路径对象在发送时（线程池中）编码为 base64 并缓存，大文件可传入 LocalFile 流式发送"""
         voice_data = {"file": file}
         if url:
             voice_data["url"] = url
@@ -145,8 +341,8 @@ class MessageBuilder:
         })
         return self
     
-    def video(self, file: str, url: Optional[str] = None) -> 'MessageBuilder':
-        """添加视频"""
+    def video(self, file: MediaFile, url: Optional[str] = None) -> 'MessageBuilder':
+        """添加视频，本地路径对象在发送时（线程池中）编码为 base64 并缓存，大文件可传入 LocalFile 流式发送"""
         video_data = {"file": file}
         if url:
             video_data["url"] = url
@@ -241,21 +437,31 @@ class MessageBuilder:
             }
         })
         return self
-    
+
+    def freeze(self) -> MessageTemplate:
+        """
+        将当前消息链冻结为不可变模板
+
+        适用于菜单、帮助等内容固定、反复发送的消息。冻结后再修改构建器不会影响模板。
+        """
+        return MessageTemplate(self.websocket, self.target_type, self.target_id,
+                               self.message_chain, self._slots, self.media)
+
     async def send(self) -> None:
         """发送消息"""
+        chain = await self.media.resolve_chain(self.message_chain)
         if self.target_type == 'group':
             action = "send_group_msg"
             params = {
                 "group_id": self.target_id,
-                "message": self.message_chain
+                "message": chain
             }
             log_msg = f"发送群消息, 群号: {self.target_id}"
         else:  # private
             action = "send_private_msg"
             params = {
                 "user_id": self.target_id,
-                "message": self.message_chain
+                "message": chain
             }
             log_msg = f"发送私聊消息, 用户: {self.target_id}"
         
@@ -263,46 +469,95 @@ class MessageBuilder:
             "action": action,
             "params": params
         }
-        await self.websocket.send(json.dumps(json_msg))
+        await self.websocket.send(encode_frame(json_msg))
         Logger().info(log_msg)
         await asyncio.sleep(0.1)
     
-    async def send_forward(self) -> None:
-        """发送转发消息"""
+    async def send_forward(self, max_nodes: int = 100, max_bytes: int = 4 * 1024 * 1024,
+                           nest: bool = False) -> None:
+        """
+        发送转发消息
+
+        节点逐个编码一次后按数量和大小分组，超出限制时拆分为多条合并转发消息依次发送，
+        避免单帧过大被 WebSocket 或 NapCat 拒绝。节点中的 LocalFile 与 send() 一样以分片流式发送。
+        :param max_nodes: 每条合并转发消息的最大节点数
+        :param max_bytes: 每帧的最大字节数
+        :param nest: 拆分后是否将各组作为嵌套转发节点合并发送，以减少发出的消息条数
+        """
         # 检查消息链中是否包含转发节点
-        has_forward_nodes = any(msg.get("type") == "node" for msg in self.message_chain)
-        if not has_forward_nodes:
+        nodes = [msg for msg in self.message_chain if msg.get("type") == "node"]
+        if not nodes:
             Logger().warning("消息链中没有转发节点，无法发送合并转发消息")
             return
-            
+
         if self.target_type == 'group':
             action = "send_group_forward_msg"
-            params = {
-                "group_id": self.target_id,
-                "messages": self.message_chain
-            }
+            target_key = "group_id"
             log_msg = f"发送群合并转发消息, 群号: {self.target_id}"
         else:  # private
             action = "send_private_forward_msg"
-            params = {
-                "user_id": self.target_id,
-                "messages": self.message_chain
-            }
+            target_key = "user_id"
             log_msg = f"发送私聊合并转发消息, 用户: {self.target_id}"
-        
-        json_msg = {
-            "action": action,
-            "params": params
-        }
-        await self.websocket.send(json.dumps(json_msg))
-        Logger().info(log_msg)
-        await asyncio.sleep(0.1)
+
+        prefix = (f'{{"action": "{action}", "params": {{"{target_key}": '
+                  f'{json.dumps(self.target_id)}, "messages": [')
+        suffix = ']}}'
+        # 每个节点只编码一次，分组与拼帧都基于编码后的文本；LocalFile 以占位符代替，按编码后长度计算
+        nodes = await self.media.resolve_chain(nodes)
+        encoder = FrameEncoder()
+        encoded = [encoder.dumps(node) for node in nodes]
+        budget = max_bytes - len(prefix) - len(suffix)
+        groups = self._group_encoded(encoded, max_nodes, budget, encoder.size)
+
+        if nest and len(groups) > 1:
+            first = nodes[0]["data"]
+            head = (f'{{"type": "node", "data": {{"user_id": {json.dumps(first["user_id"])}, '
+                    f'"nickname": {json.dumps(first["nickname"])}, "content": [')
+            tail = ']}}'
+            # 嵌套节点本身也要装进一帧，内层分组预留包装开销
+            inner = self._group_encoded(encoded, max_nodes, budget - len(head) - len(tail),
+                                        encoder.size)
+            groups = self._group_encoded([head + ",".join(group) + tail for group in inner],
+                                         max_nodes, budget, encoder.size)
+
+        for index, group in enumerate(groups, 1):
+            await self.websocket.send(encoder.frame(prefix + ",".join(group) + suffix))
+            if len(groups) > 1:
+                Logger().info(f"{log_msg} ({index}/{len(groups)})")
+            else:
+                Logger().info(log_msg)
+            await asyncio.sleep(0.1)
+
+    @staticmethod
+    def _group_encoded(encoded: List[str], max_nodes: int, budget: int,
+                       size=len) -> List[List[str]]:
+        """
+        按节点数与总长度将编码后的节点分组，单个超长节点独占一组
+        :param size: 计算节点发送长度的函数
+        """
+        groups: List[List[str]] = []
+        current: List[str] = []
+        total = 0
+        for text in encoded:
+            # 逗号分隔符计入长度
+            length = size(text)
+            extra = length + (1 if current else 0)
+            if current and (len(current) >= max_nodes or total + extra > budget):
+                groups.append(current)
+                current, total = [], 0
+                extra = length
+            current.append(text)
+            total += extra
+        if current:
+            groups.append(current)
+        return groups
 
 
 class MessageSender:
     """消息发送器 - 用于选择发送目标"""
-    def __init__(self, websocket):
+    def __init__(self, websocket, media: MediaCache = None):
         self.websocket = websocket
+        self.media = media
     
     def all(self, msg) -> MessageBuilder:
         """
@@ -317,10 +572,10 @@ class MessageSender:
         message_type = msg_dict.get("message_type")
         if message_type == "group":
             group_id = msg_dict.get("group_id")
-            return MessageBuilder(self.websocket, 'group', group_id)
+            return MessageBuilder(self.websocket, 'group', group_id, self.media)
         elif message_type == "private":
             user_id = msg_dict.get("user_id")
-            return MessageBuilder(self.websocket, 'private', user_id)
+            return MessageBuilder(self.websocket, 'private', user_id, self.media)
         else:
             raise ValueError(f"不支持的消息类型: {message_type}")
     
@@ -334,17 +589,17 @@ class MessageSender:
             if msg_dict.get("message_type") != "group":
                 raise ValueError("消息类型不是群消息")
             group_id = msg_dict.get("group_id")
-            return MessageBuilder(self.websocket, 'group', group_id)
+            return MessageBuilder(self.websocket, 'group', group_id, self.media)
         elif isinstance(group_id_or_msg, dict):
             # 如果传入的是消息字典
             msg = group_id_or_msg
             if msg.get("message_type") != "group":
                 raise ValueError("消息类型不是群消息")
             group_id = msg.get("group_id")
-            return MessageBuilder(self.websocket, 'group', group_id)
+            return MessageBuilder(self.websocket, 'group', group_id, self.media)
         else:
             # 如果传入的是群号
-            return MessageBuilder(self.websocket, 'group', group_id_or_msg)
+            return MessageBuilder(self.websocket, 'group', group_id_or_msg, self.media)
     
     def private(self, user_id_or_msg) -> MessageBuilder:
         """
@@ -356,28 +611,137 @@ class MessageSender:
             if msg_dict.get("message_type") != "private":
                 raise ValueError("消息类型不是私聊消息")
             user_id = msg_dict.get("user_id")
-            return MessageBuilder(self.websocket, 'private', user_id)
+            return MessageBuilder(self.websocket, 'private', user_id, self.media)
         elif isinstance(user_id_or_msg, dict):
             # 如果传入的是消息字典
             msg = user_id_or_msg
             if msg.get("message_type") != "private":
                 raise ValueError("消息类型不是私聊消息")
             user_id = msg.get("user_id")
-            return MessageBuilder(self.websocket, 'private', user_id)
+            return MessageBuilder(self.websocket, 'private', user_id, self.media)
         else:
             # 如果传入的是用户ID
-            return MessageBuilder(self.websocket, 'private', user_id_or_msg)
+            return MessageBuilder(self.websocket, 'private', user_id_or_msg, self.media)
 
 
 class BotClient:
     """Bot客户端基础类 - 仅包含核心同步功能"""
-    def __init__(self, websocket):
+    def __init__(self, websocket, info_cache=None, message_store=None, media_cache=None,
+                 download_cache=None, roster=None, state=None, enablement=None):
         self.websocket = websocket
         self.logger = Logger()
-    
+        self.download_cache = download_cache  # get_image_path / get_record_path 的磁盘缓存，首次使用时创建
+        # 本地媒体文件的 base64 编码缓存，MessageBuilder 与 send_*_image 等方法共用
+        self.media = media_cache if media_cache is not None else MediaCache()
+        self.info_cache = info_cache  # 可选的 InfoCache，用于群/成员/好友信息查询
+        self.message_store = message_store  # 可选的 MessageStore，用于查找最近的消息
+        self.roster = roster  # 可选的 Roster，全部群的成员名册
+        self.state = state  # 插件会话状态存储（StateStore），由 PluginManager 提供
+        self.enablement = enablement  # 按群/私聊的插件开关表（EnablementTable），由 PluginManager 提供
+        self.waiters = WaiterRegistry()  # wait_for 登记的等待者，由接收循环在分发前检查
+        self._pending: Dict[str, asyncio.Future] = {}  # echo -> 等待响应的 Future
+        self._inflight: Dict[tuple, asyncio.Future] = {}  # (动作, 参数) -> 进行中的查询
+        self._echo_seq = itertools.count(1)
+        self.coalesced = 0  # 被合并到进行中查询的调用次数
+
+    async def call_action(self, action: str, params: Optional[Dict[str, Any]] = None,
+                          timeout: float = 10.0, coalesce: bool = False):
+        """
+        发送动作并等待 NapCat 的响应（通过 echo 字段匹配）
+        :param action: 动作名称
+        :param params: 动作参数
+        :param timeout: 等待响应的超时时间（秒）
+        :param coalesce: 是否合并并发的相同查询。为 True 时，动作与参数都相同且仍在等待响应的
+                         调用只发送一次，每个调用方（包括发起查询的调用方）各自得到结果的副本，可以放心修改
+        :return: 响应中的 data 字段，动作失败或超时返回 None
+        """
+        with awaiting():
+            return await self._call_action(action, params, timeout, coalesce)
+
+    async def _call_action(self, action: str, params: Optional[Dict[str, Any]], timeout: float,
+                           coalesce: bool):
+        if not coalesce:
+            return await self._request(action, params, timeout)
+
+        key = (action, json.dumps(params or {}, sort_keys=True))
+        shared = self._inflight.get(key)
+        if shared is not None:
+            self.coalesced += 1
+            # shield: 某个调用方被取消时不影响其他共享该请求的调用方
+            return clone(await asyncio.shield(shared))
+
+        task = asyncio.ensure_future(self._request(action, params, timeout))
+        self._inflight[key] = task
+
+        def _done(_):
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+        task.add_done_callback(_done)
+        # 发起查询的调用方先于合并进来的调用方恢复执行，同样只能拿到副本
+        return clone(await asyncio.shield(task))
+
+    async def _request(self, action: str, params: Optional[Dict[str, Any]], timeout: float):
+        """发送一次带 echo 的动作并等待匹配的响应"""
+        echo = f"bc{next(self._echo_seq)}"
+        future = asyncio.get_running_loop().create_future()
+        self._pending[echo] = future
+        try:
+            await self.websocket.send(json.dumps({
+                "action": action,
+                "params": params or {},
+                "echo": echo
+            }))
+            response = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"动作 {action} 等待响应超时")
+            return None
+        except StreamInterrupted as e:
+            # 动作没有发出，不必等到超时
+            self.logger.warning(f"动作 {action} 发送失败: {e}")
+            return None
+        finally:
+            self._pending.pop(echo, None)
+
+        if response.get("status") == "failed" or response.get("retcode", 0) != 0:
+            self.logger.warning(
+                f"动作 {action} 执行失败: {response.get('wording') or response.get('message')}")
+            return None
+        return response.get("data")
+
+    def handle_response(self, msg: dict) -> bool:
+        """
+        将动作响应交给等待中的 call_action
+        :param msg: 收到的原始字典
+        :return: 是否匹配到等待中的调用
+        """
+        echo = msg.get("echo")
+        if echo is None:
+            return False
+        future = self._pending.get(str(echo))
+        if future is None or future.done():
+            return False
+        future.set_result(msg)
+        return True
+
+    async def wait_for(self, predicate=None, group_id: Optional[int] = None,
+                       user_id: Optional[int] = None, timeout: Optional[float] = 60.0,
+                       consume: bool = True) -> Optional[dict]:
+        """
+        等待会话中的下一条消息，例如向用户提问后等待回答
+        :param predicate: 可选，接收原始消息事件，返回是否匹配
+        :param group_id: 群号，私聊时为 None
+        :param user_id: 用户ID，等待群内任意成员时为 None
+        :param timeout: 超时时间（秒），None 表示一直等待
+        :param consume: 匹配的消息是否不再分发给插件
+        :return: 匹配的原始消息事件，超时返回 None
+        """
+        with awaiting():
+            return await self.waiters.wait(predicate, group_id, user_id, timeout, consume)
+
     def send_msg(self) -> 'MessageSender':
         """
         创建消息发送器 - 链式调用入口
         :param msg: 可选，消息对象(Message/dict)，如果传入则自动识别类型
         """
-        return MessageSender(self.websocket)
+        return MessageSender(self.websocket, self.media)
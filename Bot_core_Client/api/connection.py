@@ -0,0 +1,240 @@
+"""
+与连接无关的发送通道
+BotClient 通过它发送动作帧。连接断开期间的动作进入出站队列（内存或 sqlite WAL 文件），
+重连后按原顺序补发，超过有效期的动作会被丢弃。分片发送的动作（LocalFile）不排队，
+连接不可用时抛出 StreamInterrupted。
+"""
+import asyncio
+import re
+import sqlite3
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Union
+
+import websockets
+
+from ..logs import Logger
+
+# 本包构造的动作帧都以 action 字段开头，只需匹配帧首部即可取得动作名
+_ACTION_PATTERN = re.compile(r'\{"action":\s*"([^"]+)"')
+
+
+class StreamInterrupted(ConnectionError):
+    """分片发送的动作因连接断开而失败，这类动作不会进入出站队列"""
+
+
+class Connection:
+    """
+    可重绑定的 WebSocket 发送通道
+
+    提供与 websocket 相同的 send() 接口，可以直接传给 BotClient / MessageBuilder。
+    Bot 在每次连上服务器时调用 bind()，断开时调用 unbind()，插件持有的客户端因此始终可用。
+    """
+    def __init__(self, sqlite_path: Optional[str] = None, default_ttl: float = 300.0,
+                 query_ttl: float = 10.0, action_ttl: Optional[Dict[str, float]] = None,
+                 max_size: int = 10000, flush_interval: float = 0.1, write_interval: float = 0.2):
+        """
+        :param sqlite_path: 可选，出站队列的 sqlite 文件路径，进程重启后仍会补发
+        :param default_ttl: 排队动作的默认有效期（秒）
+        :param query_ttl: get_* 查询动作的有效期（秒），调用方通常早已超时，不必补发太久
+        :param action_ttl: 按动作名指定的有效期，优先于以上两项
+        :param max_size: 队列上限，超出时丢弃最早的动作
+        :param flush_interval: 补发时两帧之间的间隔（秒）
+        :param write_interval: 使用 sqlite 时，排队的动作最多缓存多少秒后在一个事务中写入
+        """
+        self.default_ttl = default_ttl
+        self.query_ttl = query_ttl
+        self.action_ttl = dict(action_ttl or {})
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self.write_interval = write_interval
+        self.logger = Logger()
+
+        self._ws = None
+        self._flushing = False
+        self._flush_task: Optional[asyncio.Task] = None
+        self._memory = deque()  # (过期时间, 动作名, 帧)
+        self.queued = 0
+        self.flushed = 0
+        self.expired = 0
+        self.dropped = 0
+
+        self._unsaved: List[tuple] = []  # 尚未写入 sqlite 的 (动作名, 过期时间, 帧)
+        self._write_handle: Optional[asyncio.TimerHandle] = None
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS outbound ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, action TEXT, "
+                "expire_at REAL NOT NULL, frame TEXT NOT NULL)")
+            self._db.commit()
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None
+
+    def ttl_for(self, action: Optional[str]) -> float:
+        """动作在队列中的有效期"""
+        if action in self.action_ttl:
+            return self.action_ttl[action]
+        if action and action.startswith("get_"):
+            return self.query_ttl
+        return self.default_ttl
+
+    def bind(self, websocket) -> None:
+        """绑定新连接，并在后台按顺序补发排队的动作"""
+        self._ws = websocket
+        if self.pending():
+            self._flushing = True
+            self._flush_task = asyncio.ensure_future(self._flush())
+
+    def unbind(self) -> None:
+        """连接断开，之后的动作进入队列"""
+        self._ws = None
+        self._flushing = False
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+
+    async def send(self, data: Union[str, AsyncIterator[str]]) -> None:
+        """
+        发送动作帧，未连接或正在补发时放入队列，保证顺序
+        :param data: 序列化后的动作帧，或按片段产出的异步迭代器（以 WebSocket 分片发送）
+        :raises StreamInterrupted: 分片帧在未连接或发送过程中断开时，该动作没有发出也不会排队
+        """
+        streamed = not isinstance(data, str)
+        if streamed and self._flushing and self._flush_task is not None:
+            # 分片帧不排队（排队需要在内存中拼出完整的帧），等补发结束后直接发送
+            # wait 不传播补发任务的取消（unbind 时被取消），之后按连接状态处理
+            await asyncio.wait([self._flush_task])
+        if self._ws is not None and not self._flushing:
+            try:
+                await self._ws.send(data)
+                return
+            except websockets.exceptions.ConnectionClosed as e:
+                self._ws = None
+                if streamed:
+                    # 分片帧已部分消费，无法重新入队
+                    raise StreamInterrupted("连接在分片发送过程中断开，该动作未发出") from e
+                self.logger.warning("连接已断开，动作进入出站队列")
+        if streamed:
+            raise StreamInterrupted("连接已断开，分片发送的动作不进入出站队列")
+        self._enqueue(data)
+
+    def _enqueue(self, data: str) -> None:
+        match = _ACTION_PATTERN.match(data)
+        action = match.group(1) if match else None
+        expire_at = time.time() + self.ttl_for(action)
+        self.queued += 1
+
+        if self._db is not None:
+            # 断线期间每个动作都写一次数据库会阻塞事件循环，先缓存再批量写入
+            self._unsaved.append((action, expire_at, data))
+            if self._write_handle is None:
+                try:
+                    loop = asyncio.get_running_loop()
+                except RuntimeError:
+                    self._write()
+                else:
+                    self._write_handle = loop.call_later(self.write_interval, self._write)
+        else:
+            self._memory.append((expire_at, action, data))
+            while len(self._memory) > self.max_size:
+                self._memory.popleft()
+                self.dropped += 1
+
+    def _write(self) -> None:
+        """在一个事务中写入缓存的排队动作，并丢弃超出上限的最早动作"""
+        if self._write_handle is not None:
+            self._write_handle.cancel()
+            self._write_handle = None
+        if self._db is None or not self._unsaved:
+            return
+        rows, self._unsaved = self._unsaved, []
+        try:
+            with self._db:
+                self._db.executemany(
+                    "INSERT INTO outbound (action, expire_at, frame) VALUES (?, ?, ?)", rows)
+                overflow = self._db.execute("SELECT COUNT(*) FROM outbound").fetchone()[0] - self.max_size
+                if overflow > 0:
+                    self._db.execute("DELETE FROM outbound WHERE id IN "
+                                     "(SELECT id FROM outbound ORDER BY id LIMIT ?)", (overflow,))
+                    self.dropped += overflow
+        except sqlite3.Error as e:
+            self.logger.error(f"写入出站队列数据库失败: {e}")
+
+    def pending(self) -> int:
+        """队列中的动作数"""
+        if self._db is not None:
+            return self._db.execute("SELECT COUNT(*) FROM outbound").fetchone()[0] + len(self._unsaved)
+        return len(self._memory)
+
+    def _peek(self):
+        """取队首动作：(标识, 过期时间, 动作名, 帧)，队列为空返回 None"""
+        if self._db is not None:
+            # 补发前先写入缓存的动作，保证按入队顺序
+            self._write()
+            return self._db.execute(
+                "SELECT id, expire_at, action, frame FROM outbound ORDER BY id LIMIT 1").fetchone()
+        if self._memory:
+            entry = self._memory[0]
+            return (entry,) + entry
+        return None
+
+    def _remove_head(self, row_id) -> None:
+        if self._db is not None:
+            self._db.execute("DELETE FROM outbound WHERE id = ?", (row_id,))
+            self._db.commit()
+        elif self._memory and self._memory[0] is row_id:
+            # 发送期间队首可能已因超出上限被丢弃
+            self._memory.popleft()
+
+    async def _flush(self) -> None:
+        """按入队顺序补发，发送成功后才从队列中移除"""
+        sent = 0
+        try:
+            while self._ws is not None:
+                head = self._peek()
+                if head is None:
+                    break
+                row_id, expire_at, action, frame = head
+                if expire_at < time.time():
+                    self._remove_head(row_id)
+                    self.expired += 1
+                    self.logger.warning(f"出站动作 {action} 已过期，丢弃")
+                    continue
+                try:
+                    await self._ws.send(frame)
+                except websockets.exceptions.ConnectionClosed:
+                    self._ws = None
+                    break
+                self._remove_head(row_id)
+                self.flushed += 1
+                sent += 1
+                await asyncio.sleep(self.flush_interval)
+            if sent:
+                self.logger.info(f"出站队列补发 {sent} 个动作，剩余 {self.pending()} 个")
+        finally:
+            # unbind 后又重新 bind 时，已被取消的旧任务不能改动新任务的状态
+            if self._flush_task is asyncio.current_task():
+                self._flushing = False
+                self._flush_task = None
+
+    def close(self) -> None:
+        """关闭队列数据库，未发送的动作保留在文件中"""
+        if self._db is not None:
+            self._write()
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        return {
+            "connected": self.connected,
+            "pending": self.pending(),
+            "queued": self.queued,
+            "flushed": self.flushed,
+            "expired": self.expired,
+            "dropped": self.dropped,
+        }
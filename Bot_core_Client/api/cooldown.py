@@ -0,0 +1,103 @@
+"""
+插件冷却与限频装饰器
+@cooldown 与 @plugin 一起使用，顺序任意：装饰器只在函数上记录限制，由 PluginManager 在调用插件前检查。
+所有限制共用一个分层时间轮，按 (插件名, 作用范围) 记录，插件热重载后仍然有效。
+"""
+from typing import Callable, Hashable, Optional
+
+from ..timing_wheel import TimingWheel
+
+SCOPES = ("user", "group", "global")
+
+# 所有插件共用的时间轮，不随插件模块重载
+_wheel = TimingWheel()
+
+
+class PluginLimit:
+    """
+    在 seconds 秒的窗口内最多允许 count 次使用
+
+    调用插件前先计为一次使用（并发到达的事件不会同时通过检查），窗口内超出次数的事件不会调用插件。
+    指定 when 时，满足 when(msg) 的事件受限并计数；不指定时只有消息事件受限，且插件处理了事件
+    （返回真值、HANDLED 或抛出 StopPropagation）才算一次使用，否则计数在插件返回后退回。
+    """
+    __slots__ = ("count", "seconds", "per", "when")
+
+    def __init__(self, count: int, seconds: float, per: str = "user",
+                 when: Optional[Callable[[dict], bool]] = None):
+        if per not in SCOPES:
+            raise ValueError(f"未知的作用范围: {per}，可选 {SCOPES}")
+        self.count = count
+        self.seconds = seconds
+        self.per = per
+        self.when = when
+
+    def key(self, plugin_name: str, msg: dict) -> Hashable:
+        """计数键，同一插件上的多个限制互不影响"""
+        group_id = msg.get("group_id") or 0
+        if self.per == "user":
+            scope = (group_id, msg.get("user_id") or 0)
+        elif self.per == "group":
+            scope = (group_id, 0) if group_id else (0, msg.get("user_id") or 0)
+        else:
+            scope = ()
+        return (plugin_name, self.per, self.count, self.seconds) + scope
+
+    def allowed(self, key: Hashable) -> bool:
+        """窗口内的使用次数是否未达上限"""
+        return _wheel.get(key, 0) < self.count
+
+    def hit(self, key: Hashable) -> None:
+        """记录一次使用，窗口从第一次使用开始计时"""
+        used = _wheel.get(key, 0)
+        if used == 0:
+            _wheel.schedule(key, self.seconds, 1)
+        else:
+            _wheel.update(key, used + 1)
+
+    def refund(self, key: Hashable) -> None:
+        """退回一次使用，窗口的结束时间不变"""
+        used = _wheel.get(key, 0)
+        if used > 0:
+            _wheel.update(key, used - 1)
+
+    def remaining(self, plugin_name: str, msg: dict) -> float:
+        """距离窗口结束的秒数，未受限时为 0"""
+        key = self.key(plugin_name, msg)
+        if self.allowed(key):
+            return 0.0
+        return _wheel.remaining(key) or 0.0
+
+
+def _attach(limit: PluginLimit):
+    def decorator(func):
+        func.plugin_limits = getattr(func, "plugin_limits", ()) + (limit,)
+        return func
+    return decorator
+
+
+def cooldown(seconds: float, per: str = "user", when: Optional[Callable[[dict], bool]] = None):
+    """
+    冷却装饰器：每次使用后 seconds 秒内不能再次使用
+    :param seconds: 冷却时间（秒）
+    :param per: 作用范围，user（群内按成员、私聊按用户）/ group（按群，私聊按用户）/ global
+    :param when: 可选，接收原始消息字典，返回该事件是否是一次使用（如是否为某个命令）
+    """
+    return _attach(PluginLimit(1, seconds, per, when))
+
+
+def throttle(count: int, seconds: float, per: str = "user",
+             when: Optional[Callable[[dict], bool]] = None):
+    """
+    限频装饰器：seconds 秒的窗口内最多使用 count 次
+    :param count: 窗口内允许的次数
+    :param seconds: 窗口长度（秒）
+    :param per: 作用范围，同 cooldown
+    :param when: 可选，同 cooldown
+    """
+    return _attach(PluginLimit(count, seconds, per, when))
+
+
+def stats() -> dict:
+    """时间轮中仍在生效的限制数与已过期数"""
+    return _wheel.stats()
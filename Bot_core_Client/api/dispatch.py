@@ -0,0 +1,84 @@
+"""
+分发上下文
+Bot 在独立任务中分发每个事件，并在任务的上下文中记录所属的分发。插件在分发中调用 call_action、
+wait_for 等待响应期间，所属的分发被标记为“等待中”：Bot 限制同时执行的分发数时不计入这些分发，
+因为它们等待的响应与消息都要由读取循环读取，计入上限会让读取循环与插件互相等待。
+插件在分发中创建的子任务继承同一个分发记录；分发之外（定时任务、名册刷新等）的调用不计数。
+"""
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Iterator, Optional
+
+
+class _Dispatch:
+    """一次分发的记录：进行中的等待数与是否已结束"""
+    __slots__ = ("tracker", "waits", "done")
+
+    def __init__(self, tracker: "DispatchTracker"):
+        self.tracker = tracker
+        self.waits = 0
+        self.done = False
+
+
+_current: "ContextVar[Optional[_Dispatch]]" = ContextVar("current_dispatch", default=None)
+
+
+class DispatchTracker:
+    """运行中的分发数与其中正在等待的分发数，每个分发最多计为一个等待中"""
+
+    def __init__(self):
+        self.running = 0
+        self.waiting = 0
+        self._changed: Optional[asyncio.Event] = None  # 在事件循环中创建
+
+    @property
+    def busy(self) -> int:
+        """占用并发上限的分发数"""
+        return self.running - self.waiting
+
+    async def run(self, coro: Awaitable):
+        """在当前任务中执行一次分发，须在分发任务内部调用，以便只修改该任务的上下文"""
+        record = _Dispatch(self)
+        _current.set(record)
+        self.running += 1
+        try:
+            return await coro
+        finally:
+            record.done = True
+            self.running -= 1
+            if record.waits:
+                self.waiting -= 1
+            self._notify()
+
+    def _notify(self) -> None:
+        if self._changed is not None:
+            self._changed.set()
+
+    async def wait_below(self, limit: int) -> None:
+        """等待占用上限的分发数低于 limit，分发结束或开始等待时被唤醒"""
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        while self.busy >= limit:
+            self._changed.clear()
+            await self._changed.wait()
+
+
+@contextmanager
+def awaiting() -> Iterator[None]:
+    """标记当前分发正在等待读取循环（动作响应、下一条消息等），不在分发中时不做任何事"""
+    record = _current.get()
+    if record is None or record.done:
+        yield
+        return
+    record.waits += 1
+    if record.waits == 1:
+        record.tracker.waiting += 1
+        record.tracker._notify()
+    try:
+        yield
+    finally:
+        record.waits -= 1
+        # 分发已结束时 run() 已经扣除过等待计数
+        if record.waits == 0 and not record.done:
+            record.tracker.waiting -= 1
@@ -0,0 +1,189 @@
+"""
+get_image / get_record 结果的磁盘缓存
+按文件标识与格式缓存下载到本地的文件，总大小超出上限时按最近使用时间淘汰。
+写入先落到临时文件再原子替换，同一文件的并发请求只下载一次。
+"""
+import asyncio
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import urllib.request
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from ..logs import Logger
+
+_PART_SUFFIX = ".part"
+
+
+def write_media(data: dict, path: str) -> bool:
+    """
+    将 get_image / get_record 的响应内容写入文件（阻塞操作，应在线程池中调用）
+    依次尝试响应中的 base64 内容、NapCat 本机文件路径与下载地址
+    :param data: 响应的 data 字段
+    :param path: 目标文件路径
+    :return: 是否写入成功
+    """
+    if data.get("base64"):
+        with open(path, "wb") as f:
+            f.write(base64.b64decode(data["base64"]))
+        return True
+    local = data.get("file")
+    if local and os.path.isfile(local):
+        # NapCat 与机器人在同一台机器上
+        shutil.copyfile(local, path)
+        return True
+    url = data.get("url")
+    if url and url.startswith(("http://", "https://")):
+        with urllib.request.urlopen(url, timeout=30) as response, open(path, "wb") as f:
+            shutil.copyfileobj(response, f)
+        return True
+    return False
+
+
+class DownloadCache:
+    """有大小上限的磁盘 LRU 缓存"""
+
+    def __init__(self, directory: str = os.path.join("cache", "downloads"),
+                 max_bytes: int = 512 * 1024 * 1024):
+        """
+        :param directory: 缓存目录
+        :param max_bytes: 缓存文件总大小上限（字节）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.logger = Logger()
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()  # 键哈希 -> (文件名, 大小)
+        self._bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    def _scan(self) -> None:
+        """载入已有的缓存文件，按修改时间恢复使用顺序，清理残留的临时文件"""
+        found = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.endswith(_PART_SUFFIX):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            if not os.path.isfile(path):
+                continue
+            stat = os.stat(path)
+            found.append((stat.st_mtime, name.split(".", 1)[0], name, stat.st_size))
+        for _, digest, name, size in sorted(found):
+            self._entries[digest] = (name, size)
+            self._bytes += size
+        self._evict()
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        """由文件标识等信息计算缓存键"""
+        return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        查找缓存文件
+        :return: 本地文件路径，未缓存返回 None
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        path = os.path.join(self.directory, entry[0])
+        if not os.path.exists(path):
+            # 文件被外部删除
+            del self._entries[key]
+            self._bytes -= entry[1]
+            return None
+        self._entries.move_to_end(key)
+        try:
+            os.utime(path)  # 记录使用时间，重启后仍能恢复顺序
+        except OSError:
+            pass
+        return path
+
+    async def fetch(self, key: str, writer: Callable[[str], Awaitable[bool]],
+                    suffix: str = "") -> Optional[str]:
+        """
+        获取缓存文件，不存在时调用 writer 写入
+        :param key: 缓存键（见 make_key）
+        :param writer: 异步函数，接收临时文件路径并写入内容，成功返回 True
+        :param suffix: 文件扩展名（如 ".jpg"）
+        :return: 本地文件路径，获取失败返回 None
+        """
+        path = self.get(key)
+        if path is not None:
+            self.hits += 1
+            return path
+
+        shared = self._inflight.get(key)
+        if shared is not None:
+            return await asyncio.shield(shared)
+
+        self.misses += 1
+        task = asyncio.ensure_future(self._download(key, writer, suffix))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _download(self, key: str, writer: Callable[[str], Awaitable[bool]],
+                        suffix: str) -> Optional[str]:
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=_PART_SUFFIX)
+        os.close(fd)
+        try:
+            if not await writer(temp_path):
+                return None
+            name = key + suffix
+            path = os.path.join(self.directory, name)
+            os.replace(temp_path, path)
+        except Exception as e:
+            self.logger.error(f"写入下载缓存失败: {e}")
+            return None
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        size = os.path.getsize(path)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[1]
+            if old[0] != name:
+                try:
+                    os.remove(os.path.join(self.directory, old[0]))
+                except OSError:
+                    pass
+        self._entries[key] = (name, size)
+        self._bytes += size
+        self._evict(keep=key)
+        return path
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """删除最久未使用的文件直到总大小不超过上限"""
+        while self._bytes > self.max_bytes and self._entries:
+            key, (name, size) = next(iter(self._entries.items()))
+            if key == keep:
+                break
+            del self._entries[key]
+            self._bytes -= size
+            self.evictions += 1
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
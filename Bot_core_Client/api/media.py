@@ -0,0 +1,277 @@
+"""
+本地媒体文件处理
+图片、语音、视频、文件以 pathlib.Path（或其他 os.PathLike）传入发送方法时，
+读取文件并编码为 base64:// 发送。编码结果按文件内容的哈希缓存，重复发送同一内容时直接复用。
+
+大文件使用 LocalFile：发送时通过 mmap 分块读取、在线程池中编码，并以 WebSocket 分片逐块发送，
+事件循环不会被阻塞，内存中也不会出现完整的 base64 副本。
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import mmap
+import os
+import re
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+# 大文件 base64 编码使用的线程池
+_encoder = ThreadPoolExecutor(max_workers=2, thread_name_prefix="media-encode")
+
+
+class LocalFile:
+    """
+    以流式 base64 发送的本地文件
+
+    用作 MessageBuilder.image/voice/video 与 send_*_image/voice/video/file 的 file 参数。
+    不会被 MediaCache 缓存，适合视频等大文件；不能用于 freeze() 生成的模板。
+    """
+    # 默认大小上限（字节），可通过类属性全局修改或在构造时单独指定
+    DEFAULT_MAX_SIZE = 100 * 1024 * 1024
+    # 每次编码的原始字节数，必须是 3 的倍数，保证分块编码结果可以直接拼接
+    CHUNK_SIZE = 3 * 256 * 1024
+
+    def __init__(self, path: Union[str, "os.PathLike[str]"], max_size: Optional[int] = None):
+        """
+        :param path: 本地文件路径
+        :param max_size: 文件大小上限（字节），超出时抛出 ValueError
+        """
+        self.path = os.path.abspath(os.fspath(path))
+        self.size = os.path.getsize(self.path)
+        limit = self.DEFAULT_MAX_SIZE if max_size is None else max_size
+        if self.size > limit:
+            raise ValueError(f"文件 {self.path} 大小 {self.size} 超过上限 {limit} 字节")
+
+    @staticmethod
+    def _encode_chunk(view: mmap.mmap, offset: int, length: int) -> str:
+        return base64.b64encode(view[offset:offset + length]).decode("ascii")
+
+    async def chunks(self) -> AsyncIterator[str]:
+        """逐块产出 base64 文本（不含 base64:// 前缀），编码在线程池中进行"""
+        if self.size == 0:
+            return
+        with open(self.path, "rb") as f:
+            view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        job = None
+        try:
+            for offset in range(0, len(view), self.CHUNK_SIZE):
+                job = _encoder.submit(self._encode_chunk, view, offset, self.CHUNK_SIZE)
+                yield await asyncio.wrap_future(job)
+        finally:
+            # 发送被取消时编码线程可能仍在读取映射，等它结束后再关闭
+            if job is not None and not job.done():
+                job.add_done_callback(lambda _: view.close())
+            else:
+                view.close()
+
+    def __repr__(self) -> str:
+        return f"LocalFile({self.path!r}, size={self.size})"
+
+
+MediaFile = Union[str, "os.PathLike[str]", LocalFile]
+
+
+class FrameEncoder:
+    """
+    将动作帧或其中的片段编码为 JSON 文本，LocalFile 以占位符代替
+    同一个编码器编码的片段可以任意拼接，发送前由 frame() 把占位符展开为文件内容
+    """
+
+    def __init__(self):
+        self.sources: Dict[str, LocalFile] = {}
+        self._token = uuid.uuid4().hex
+        self._pattern = re.compile(f'"({self._token}:\\d+)"')
+
+    def default(self, obj):
+        """json.dumps 的 default 参数"""
+        if isinstance(obj, LocalFile):
+            marker = f"{self._token}:{len(self.sources)}"
+            self.sources[marker] = obj
+            return marker
+        raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj, default=self.default)
+
+    def size(self, text: str) -> int:
+        """展开占位符后的长度（文件按 base64 编码后的长度计算）"""
+        if not self.sources:
+            return len(text)
+        extra = 0
+        for marker in self._pattern.findall(text):
+            extra += len("base64://") + (self.sources[marker].size + 2) // 3 * 4 - len(marker)
+        return len(text) + extra
+
+    def frame(self, text: str) -> Union[str, AsyncIterator[str]]:
+        """
+        不包含占位符时返回原字符串；包含时返回按片段产出的异步迭代器，
+        文件内容在发送过程中逐块编码，不会拼接出完整的帧
+        """
+        if not self.sources:
+            return text
+        pieces = self._pattern.split(text)
+        if len(pieces) == 1:
+            return text
+
+        # split 的结果中奇数位置为占位符，按固定片段与文件片段交替排列
+        parts: List[Union[str, LocalFile]] = [pieces[0] + '"base64://']
+        for index in range(1, len(pieces), 2):
+            parts.append(self.sources[pieces[index]])
+            tail = '"' + pieces[index + 1]
+            parts.append(tail + '"base64://' if index + 2 < len(pieces) else tail)
+
+        async def _fragments() -> AsyncIterator[str]:
+            for part in parts:
+                if isinstance(part, LocalFile):
+                    async for chunk in part.chunks():
+                        yield chunk
+                else:
+                    yield part
+
+        return _fragments()
+
+
+def encode_frame(json_msg: dict) -> Union[str, AsyncIterator[str]]:
+    """
+    序列化动作帧
+    不包含 LocalFile 时返回普通字符串；包含时返回按片段产出的异步迭代器，
+    文件内容在发送过程中逐块编码，不会拼接出完整的帧
+    """
+    encoder = FrameEncoder()
+    return encoder.frame(encoder.dumps(json_msg))
+
+
+class MediaCache:
+    """按内容哈希缓存 base64 编码结果的 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024):
+        """
+        :param max_entries: 最多缓存的文件数
+        :param max_bytes: 缓存的编码结果总大小上限（字节）
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._payloads: "OrderedDict[str, str]" = OrderedDict()  # 内容哈希 -> base64://...
+        self._bytes = 0
+        # (路径, 修改时间, 大小) -> 内容哈希，文件未变化时不必重新读取计算哈希
+        self._digests: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, path: str) -> Tuple[Tuple[str, int, int], Optional[str]]:
+        """按 (路径, 修改时间, 大小) 查找编码结果，只需要一次 stat，不读取文件"""
+        stat = os.stat(path)
+        stat_key = (path, stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(stat_key)
+        if digest is not None:
+            payload = self._payloads.get(digest)
+            if payload is not None:
+                self._digests.move_to_end(stat_key)
+                self._payloads.move_to_end(digest)
+                self.hits += 1
+                return stat_key, payload
+        return stat_key, None
+
+    @staticmethod
+    def _load(path: str) -> Tuple[str, str]:
+        """读取文件并计算哈希与 base64 编码，可在线程池中执行"""
+        with open(path, "rb") as f:
+            data = f.read()
+        return hashlib.sha256(data).hexdigest(), "base64://" + base64.b64encode(data).decode("ascii")
+
+    def _remember(self, stat_key: Tuple[str, int, int], digest: str, payload: str) -> str:
+        self._remember_digest(stat_key, digest)
+        cached = self._payloads.get(digest)
+        if cached is not None:
+            # 不同路径的相同内容共享同一个编码结果
+            self._payloads.move_to_end(digest)
+            self.hits += 1
+            return cached
+        self.misses += 1
+        self._store(digest, payload)
+        return payload
+
+    def resolve(self, file: MediaFile) -> str:
+        """
+        将发送方法的 file 参数转换为 NapCat 可用的字符串（同步版本，缓存未命中时在当前线程读取文件）
+        字符串原样返回（file://、http://、base64:// 等），本地路径对象转换为 base64://
+        在事件循环中请使用 resolve_async
+        :param file: 文件参数
+        """
+        if not isinstance(file, os.PathLike):
+            return file
+        path = os.path.abspath(os.fspath(file))
+        stat_key, payload = self._cached(path)
+        if payload is not None:
+            return payload
+        return self._remember(stat_key, *self._load(path))
+
+    async def resolve_async(self, file: MediaFile) -> str:
+        """
+        同 resolve，缓存未命中时在线程池中读取文件并编码，不阻塞事件循环
+        :param file: 文件参数
+        """
+        if not isinstance(file, os.PathLike):
+            return file
+        path = os.path.abspath(os.fspath(file))
+        stat_key, payload = self._cached(path)
+        if payload is not None:
+            return payload
+        digest, payload = await asyncio.get_running_loop().run_in_executor(_encoder, self._load, path)
+        return self._remember(stat_key, digest, payload)
+
+    async def resolve_chain(self, chain: List[Dict]) -> List[Dict]:
+        """
+        将消息链（包括转发节点的内容）中本地路径对象形式的 file 转换为 base64://
+        没有需要转换的段时原样返回，否则返回替换后的新列表，原消息链不变
+        """
+        resolved = None
+        for index, segment in enumerate(chain):
+            data = segment.get("data") if isinstance(segment, dict) else None
+            if not isinstance(data, dict):
+                continue
+            new_data = None
+            if isinstance(data.get("file"), os.PathLike):
+                new_data = dict(data, file=await self.resolve_async(data["file"]))
+            content = data.get("content")
+            if isinstance(content, list):
+                new_content = await self.resolve_chain(content)
+                if new_content is not content:
+                    new_data = dict(new_data or data, content=new_content)
+            if new_data is not None:
+                if resolved is None:
+                    resolved = list(chain)
+                resolved[index] = dict(segment, data=new_data)
+        return chain if resolved is None else resolved
+
+    def _remember_digest(self, stat_key: Tuple[str, int, int], digest: str) -> None:
+        self._digests[stat_key] = digest
+        self._digests.move_to_end(stat_key)
+        while len(self._digests) > self.max_entries * 4:
+            self._digests.popitem(last=False)
+
+    def _store(self, digest: str, payload: str) -> None:
+        """写入编码结果，超出数量或大小上限时淘汰最久未使用的条目"""
+        if len(payload) > self.max_bytes:
+            return
+        self._payloads[digest] = payload
+        self._bytes += len(payload)
+        while len(self._payloads) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._payloads.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def clear(self) -> None:
+        self._payloads.clear()
+        self._digests.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._payloads),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
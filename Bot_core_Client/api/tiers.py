@@ -0,0 +1,6 @@
+"""
+插件等级
+@plugin(tier=...) 可选的等级，数值越小越重要；启用过载降级时按等级跳过插件。
+"""
+
+TIERS = {"critical": 0, "normal": 1, "best-effort": 2}
@@ -0,0 +1,117 @@
+"""
+等待会话中的下一条消息
+插件调用 client.wait_for 后登记一个等待者，接收循环在分发前只检查与事件所在会话对应的等待者，
+匹配的消息可以被消费，不再分发给普通插件。
+"""
+import asyncio
+from typing import Callable, Dict, List, Optional, Tuple
+
+WaiterKey = Tuple[int, int]  # (群号, 用户ID)，私聊群号为 0，不限用户时用户ID为 0
+
+
+class _Waiter:
+    __slots__ = ("predicate", "consume", "future")
+
+    def __init__(self, predicate: Optional[Callable[[dict], bool]], consume: bool,
+                 future: asyncio.Future):
+        self.predicate = predicate
+        self.consume = consume
+        self.future = future
+
+
+class WaiterRegistry:
+    """按会话索引的等待者表"""
+
+    def __init__(self):
+        self._waiters: Dict[WaiterKey, List[_Waiter]] = {}
+        self.matched = 0
+        self.consumed = 0
+        self.timeouts = 0
+
+    @staticmethod
+    def event_keys(event: dict) -> Tuple[WaiterKey, ...]:
+        """事件可能匹配的等待者键，非消息事件返回空元组"""
+        if event.get("post_type") != "message":
+            return ()
+        user_id = event.get("user_id") or 0
+        if event.get("message_type") == "group":
+            group_id = event.get("group_id") or 0
+            return ((group_id, user_id), (group_id, 0))
+        return ((0, user_id),)
+
+    async def wait(self, predicate: Optional[Callable[[dict], bool]] = None,
+                   group_id: Optional[int] = None, user_id: Optional[int] = None,
+                   timeout: Optional[float] = 60.0, consume: bool = True) -> Optional[dict]:
+        """
+        等待会话中满足条件的下一条消息
+        :param predicate: 可选，接收原始消息事件，返回是否匹配
+        :param group_id: 群号，私聊时为 None
+        :param user_id: 用户ID，群内不限发送者时为 None
+        :param timeout: 超时时间（秒），None 表示一直等待
+        :param consume: 匹配的消息是否不再分发给插件
+        :return: 匹配的消息事件，超时返回 None
+        """
+        if group_id is None and user_id is None:
+            raise ValueError("必须指定 group_id 或 user_id")
+        key = (group_id or 0, user_id or 0)
+        waiter = _Waiter(predicate, consume, asyncio.get_running_loop().create_future())
+        self._waiters.setdefault(key, []).append(waiter)
+        try:
+            return await asyncio.wait_for(waiter.future, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            return None
+        finally:
+            self._remove(key, waiter)
+
+    def _remove(self, key: WaiterKey, waiter: _Waiter) -> None:
+        waiters = self._waiters.get(key)
+        if waiters is None:
+            return
+        try:
+            waiters.remove(waiter)
+        except ValueError:
+            pass
+        if not waiters:
+            del self._waiters[key]
+
+    def feed(self, event: dict) -> bool:
+        """
+        将事件交给对应会话的等待者，由接收循环在分发前调用
+        按登记顺序检查：不消费的等待者都会收到事件，第一个匹配的消费型等待者收到后停止
+        :param event: 原始事件字典
+        :return: True 表示事件已被消费，不应再分发给插件
+        """
+        if not self._waiters:
+            return False
+        for key in self.event_keys(event):
+            waiters = self._waiters.get(key)
+            if not waiters:
+                continue
+            for waiter in list(waiters):
+                if waiter.future.done():
+                    continue
+                if waiter.predicate is not None:
+                    try:
+                        if not waiter.predicate(event):
+                            continue
+                    except Exception as e:
+                        waiter.future.set_exception(e)
+                        continue
+                waiter.future.set_result(event)
+                self.matched += 1
+                if waiter.consume:
+                    self.consumed += 1
+                    return True
+        return False
+
+    def __len__(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def stats(self) -> dict:
+        return {
+            "waiting": len(self),
+            "matched": self.matched,
+            "consumed": self.consumed,
+            "timeouts": self.timeouts,
+        }
@@ -1,16 +1,91 @@
 import websockets
 import asyncio
 import json
+from typing import Callable
 from .logs import Logger
 from .plugin_manager import PluginManager
 from .api.BotClient import BotClient
+from .api.cache import InfoCache
+from .api.connection import Connection
+from .api.dispatch import DispatchTracker
+from .breaker import CircuitBreaker
+from .dedup import EventDeduplicator
+from .enablement import EnablementTable
+from .inbound_queue import InboundQueue
+from .message_store import MessageStore
+from .overload import OverloadMonitor
+from .ratelimit import InboundLimiter
+from .roster import Roster
+from .scheduler import Scheduler
+from .state import StateStore
 
 class Bot:
-    def __init__(self, url: str, token: str = None, plugin_dir: str = "plugins"):
+    def __init__(self, url: str, token: str = None, plugin_dir: str = "plugins",
+                 info_cache: InfoCache = None, dedup: EventDeduplicator = None,
+                 message_store: MessageStore = None, connection: Connection = None,
+                 roster: Roster = None, state: StateStore = None,
+                 limiter: InboundLimiter = None, inbound: InboundQueue = None,
+                 overload: OverloadMonitor = None, scheduler: Scheduler = None,
+                 breaker_factory: Callable[[str], CircuitBreaker] = CircuitBreaker,
+                 enablement: EnablementTable = None):
         self.url = url
         self.token = token
-        self.plugin_manager = PluginManager(plugin_dir)
+        # 可选的过载检测，根据事件循环延迟与入站队列深度跳过低等级插件，默认不启用
+        self.overload = overload
+        self.plugin_manager = PluginManager(plugin_dir, state=state, overload=self.overload,
+                                            breaker_factory=breaker_factory, enablement=enablement)
         self.logger = Logger()
+        # 群/成员/好友信息缓存，跨重连保留
+        self.info_cache = info_cache if info_cache is not None else InfoCache()
+        # 最近事件集合，过滤重连后重复推送的事件
+        self.dedup = dedup if dedup is not None else EventDeduplicator()
+        # 按会话保存最近消息，供 get_msg / get_recent_msgs 本地查找
+        self.message_store = message_store if message_store is not None else MessageStore()
+        # 与连接无关的发送通道和客户端，重连后插件持有的 client 依然可用
+        self.connection = connection if connection is not None else Connection()
+        # 可选的全部群成员名册，每次连上服务器后在后台刷新
+        self.roster = roster
+        self.client = BotClient(self.connection, info_cache=self.info_cache,
+                                message_store=self.message_store, roster=self.roster,
+                                state=self.plugin_manager.state,
+                                enablement=self.plugin_manager.enablement)
+        self._roster_task = None
+        # 可选的入站限流，刷屏消息在分发给插件之前被丢弃、抽样或合并
+        self.limiter = limiter
+        # 读取循环与插件分发之间的有界队列，插件处理不过来时限制积压
+        self.inbound = inbound if inbound is not None else InboundQueue()
+        if self.limiter is not None:
+            self.limiter.bind(self.inbound.put_nowait)
+        if self.overload is not None:
+            self.overload.bind(lambda: len(self.inbound))
+        self._dispatch_tasks = set()  # 正在执行的分发任务，保持引用防止被回收
+        # 运行中与等待中的分发数，等待 call_action / wait_for 或插件并发名额的分发不占用 max_inflight
+        self._dispatch_tracker = DispatchTracker()
+        # 插件 @scheduled 声明的定时任务，共用一个调度器
+        self.scheduler = scheduler if scheduler is not None else Scheduler()
+        self._dispatcher = None
+
+    def _spawn_dispatch(self, msg: dict, client: BotClient):
+        """
+        在独立任务中分发事件
+        插件可能会等待动作响应，而响应由接收循环读取，所以分发不能阻塞接收循环
+        """
+        task = asyncio.ensure_future(
+            self._dispatch_tracker.run(self.plugin_manager.process_message(msg, client)))
+        self._dispatch_tasks.add(task)
+        task.add_done_callback(self._dispatch_tasks.discard)
+
+    async def _dispatch_loop(self):
+        """
+        从入站队列取出事件并分发
+        分发任务达到上限时暂停出队，积压留在队列里，由队列策略决定阻塞读取还是丢弃
+        """
+        while True:
+            msg = await self.inbound.get()
+            # 正在等待动作响应或 wait_for 的分发不计入：它们等待的内容要由读取循环读取，
+            # 计入上限会让读取循环因队列满而阻塞，形成互相等待
+            await self._dispatch_tracker.wait_below(self.inbound.max_inflight)
+            self._spawn_dispatch(msg, self.client)
 
     async def _connect_and_listen(self):
         """连接并持续监听消息"""
@@ -22,16 +97,39 @@ class Bot:
                 
                 async with websockets.connect(self.url, additional_headers=additional_headers) as ws:
                     self.logger.info("已连接至服务器")
-                    client = BotClient(ws)
-                    async for message in ws:
-                        try:
-                            self.logger.info(f"收到消息: {message}")
-                            msg = json.loads(message)
-                            await self.plugin_manager.process_message(msg, client)
-                        except json.JSONDecodeError:
-                            self.logger.warning(f"无法解析JSON消息: {message}")
-                        except Exception as e:
-                            self.logger.error(f"处理消息时发生错误: {e}")
+                    client = self.client
+                    self.connection.bind(ws)
+                    self.dedup.connected()
+                    if self.roster is not None and (self._roster_task is None or self._roster_task.done()):
+                        self._roster_task = asyncio.ensure_future(self.roster.refresh(client))
+                    try:
+                        async for message in ws:
+                            try:
+                                self.logger.info(f"收到消息: {message}")
+                                msg = json.loads(message)
+                                # 动作响应交给等待中的调用，不再分发给插件
+                                if client.handle_response(msg):
+                                    continue
+                                if self.dedup.is_duplicate(msg):
+                                    self.logger.debug("丢弃重复事件")
+                                    continue
+                                self.info_cache.on_event(msg)
+                                if self.roster is not None:
+                                    self.roster.on_event(msg)
+                                self.message_store.add(msg)
+                                # wait_for 消费的消息不再分发给插件
+                                if client.waiters.feed(msg):
+                                    continue
+                                if self.limiter is not None and not self.limiter.admit(msg):
+                                    continue
+                                await self.inbound.put(msg)
+                            except json.JSONDecodeError:
+                                self.logger.warning(f"无法解析JSON消息: {message}")
+                            except Exception as e:
+                                self.logger.error(f"处理消息时发生错误: {e}")
+                    finally:
+                        # 断开期间的动作进入出站队列，重连后补发
+                        self.connection.unbind()
             except websockets.exceptions.ConnectionClosed as e:
                 self.logger.error(f"WebSocket连接已关闭，正在尝试重连... 错误: {e}")
             except websockets.exceptions.InvalidURI as e:
@@ -50,14 +148,49 @@ class Bot:
             self.logger.info("将在3秒后尝试重连...")
             await asyncio.sleep(3)
 
+    def get_metrics(self) -> dict:
+        """汇总各组件的运行指标"""
+        metrics = {
+            "info_cache": self.info_cache.stats(),
+            "dedup": self.dedup.stats(),
+            "message_store": self.message_store.stats(),
+            "outbound": self.connection.stats(),
+            "media": self.client.media.stats(),
+            "downloads": self.client.download_cache.stats() if self.client.download_cache else {},
+            "roster": self.roster.stats() if self.roster is not None else {},
+            "state": self.plugin_manager.state.stats(),
+            "waiters": self.client.waiters.stats(),
+            "limiter": self.limiter.stats() if self.limiter is not None else {},
+            "inbound": dict(self.inbound.stats(), dispatching=self._dispatch_tracker.running,
+                            awaiting=self._dispatch_tracker.waiting),
+            "overload": self.overload.stats() if self.overload is not None else None,
+            "scheduler": self.scheduler.stats(),
+            "plugins": self.plugin_manager.stats(),
+            "actions": {
+                "pending": len(self.client._pending),
+                "coalesced": self.client.coalesced,
+            },
+        }
+        return metrics
+
     async def run(self):
         """启动机器人"""
         try:
+            # 加载回调可能在文件监听线程中调用，定时任务切回事件循环中重新登记
+            loop = asyncio.get_running_loop()
+            self.plugin_manager.add_reload_listener(
+                lambda jobs: loop.call_soon_threadsafe(self.scheduler.sync, jobs))
+            self.scheduler.start(self.client)
+            # 插件状态的定时写回与过期清理
+            self.plugin_manager.state.start()
             # 加载所有插件
             self.plugin_manager.load_plugins()
             # 开启插件热重载监听
             self.plugin_manager.start_watching()
             self.logger.info(f"已加载 {self.plugin_manager.get_plugin_count()} 个插件处理函数")
+            self._dispatcher = asyncio.ensure_future(self._dispatch_loop())
+            if self.overload is not None:
+                self.overload.start()
             await self._connect_and_listen()
         except KeyboardInterrupt:
             self.logger.info("程序已退出")
@@ -66,5 +199,14 @@ class Bot:
             self.logger.error(f"主循环异常: {e}")
             self.plugin_manager.stop_watching()
         finally:
+            if self._dispatcher is not None:
+                self._dispatcher.cancel()
+            if self.overload is not None:
+                self.overload.stop()
+            self.scheduler.stop()
             self.plugin_manager.stop_watching()
+            self.message_store.close()
+            self.plugin_manager.state.close()
+            self.plugin_manager.enablement.close()
+            self.connection.close()
             self.logger.info("程序已退出")
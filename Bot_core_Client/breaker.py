@@ -0,0 +1,103 @@
+"""
+插件熔断
+持续出错的插件在每个事件上都会抛出异常、写日志、消耗 CPU。熔断器统计每个插件在时间窗口内的失败次数，
+超过阈值后暂停调用该插件（open），经过恢复时间后放行一次试探调用（half-open），
+成功则恢复（closed），失败则再次暂停并延长恢复时间。插件重新加载时熔断状态被重置。
+"""
+import time
+from collections import deque
+from typing import Optional
+
+from .logs import Logger
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """单个插件的熔断器"""
+
+    def __init__(self, name: str = "", failure_threshold: int = 5, window: float = 60.0,
+                 recovery_time: float = 30.0, max_recovery_time: float = 600.0):
+        """
+        :param name: 插件名，用于日志
+        :param failure_threshold: 窗口内失败多少次后熔断
+        :param window: 统计失败的时间窗口（秒）
+        :param recovery_time: 熔断后多久放行试探调用（秒）
+        :param max_recovery_time: 试探连续失败时恢复时间翻倍的上限（秒）
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.recovery_time = recovery_time
+        self.max_recovery_time = max_recovery_time
+        self.logger = Logger()
+        self.state = CLOSED
+        self._failures = deque()  # 窗口内的失败时间
+        self._opened_at = 0.0
+        self._current_recovery = recovery_time
+        self._probe_started: Optional[float] = None  # 试探调用开始时间
+        self.total_failures = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """是否可以调用插件，open 状态到期后转为 half-open 并只放行一次试探"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self._current_recovery:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probe_started = None
+        now = time.monotonic()
+        # 试探调用尚未结束时拒绝其他调用；试探被取消而没有结果时，超过恢复时间后允许重新试探
+        if self._probe_started is not None and now - self._probe_started < self._current_recovery:
+            self.rejected += 1
+            return False
+        self._probe_started = now
+        return True
+
+    def release(self) -> None:
+        """allow() 放行后事件没有调用插件（被限制跳过等），交还试探机会"""
+        if self.state == HALF_OPEN:
+            self._probe_started = None
+
+    def record_success(self) -> None:
+        if self.state == HALF_OPEN:
+            self.logger.info(f"插件 {self.name} 试探调用成功，恢复正常")
+            self.state = CLOSED
+            self._probe_started = None
+            self._failures.clear()
+            self._current_recovery = self.recovery_time
+
+    def record_failure(self) -> None:
+        now = time.monotonic()
+        self.total_failures += 1
+        if self.state == HALF_OPEN:
+            self._current_recovery = min(self._current_recovery * 2, self.max_recovery_time)
+            self._open(now, "试探调用失败")
+            return
+        self._failures.append(now)
+        while self._failures and now - self._failures[0] > self.window:
+            self._failures.popleft()
+        if len(self._failures) >= self.failure_threshold:
+            self._open(now, f"{self.window:.0f} 秒内失败 {len(self._failures)} 次")
+
+    def _open(self, now: float, reason: str) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self._probe_started = None
+        self._failures.clear()
+        self.trips += 1
+        self.logger.warning(f"插件 {self.name} {reason}，暂停调用 {self._current_recovery:.0f} 秒")
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "failures": self.total_failures,
+            "rejected": self.rejected,
+            "trips": self.trips,
+        }
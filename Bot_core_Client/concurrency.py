@@ -0,0 +1,169 @@
+"""
+插件并发限制
+@plugin(max_concurrency=...) 声明的插件同时处理的事件数不超过上限，可全局或按会话/用户分别计数。
+名额已满时按 overflow 策略处理：queue 排队等待，drop 跳过本插件，latest 只保留最新的一个等待者。
+等待发生在事件自己的分发任务中，插件的优先级与阻止传播语义不受影响；排队期间该分发不计入
+Bot 的同时分发上限，每个键排队的事件超过 max_queue 后新事件跳过本插件。
+"""
+import asyncio
+from collections import deque
+from typing import Callable, Dict, Hashable, Optional, Union
+
+from .api.dispatch import awaiting
+
+OVERFLOW_POLICIES = ("queue", "drop", "latest")
+KEY_SCOPES = ("conversation", "user")
+
+
+def conversation_key(msg: dict) -> Hashable:
+    """会话键：群消息按群，私聊按用户"""
+    group_id = msg.get("group_id")
+    if group_id:
+        return ("group", group_id)
+    return ("private", msg.get("user_id") or 0)
+
+
+def user_key(msg: dict) -> Hashable:
+    return msg.get("user_id") or 0
+
+
+class PluginConcurrency:
+    """单个插件的并发名额，每个键一组计数与等待队列"""
+
+    def __init__(self, name: str, max_concurrency: int,
+                 per_key: Union[None, str, Callable[[dict], Hashable]] = None,
+                 overflow: str = "queue", max_queue: int = 100):
+        """
+        :param name: 插件名
+        :param max_concurrency: 每个键同时运行的上限
+        :param per_key: None 全局计数，conversation 按会话，user 按用户，或接收消息字典返回键的函数
+        :param overflow: 名额已满时的策略，queue / drop / latest
+        :param max_queue: queue 策略下每个键最多排队的事件数，超过后新事件跳过本插件
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.per_key = per_key
+        self.overflow = overflow
+        self.max_queue = max_queue
+        if per_key is None:
+            self._key_func = None
+        elif per_key == "conversation":
+            self._key_func = conversation_key
+        elif per_key == "user":
+            self._key_func = user_key
+        else:
+            self._key_func = per_key
+        # 键 -> [运行中的数量, 等待者 future 队列]，空闲的键被删除
+        self._slots: Dict[Hashable, list] = {}
+        self.running = 0  # 所有键运行中的总数
+        self.acquired = 0
+        self.queued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.peak = 0
+
+    @property
+    def config(self) -> tuple:
+        """限制参数，热重载前后相同时沿用原来的计数"""
+        return (self.max_concurrency, self.per_key, self.overflow, self.max_queue)
+
+    def key(self, msg: dict) -> Hashable:
+        if self._key_func is None:
+            return None
+        try:
+            return self._key_func(msg)
+        except Exception:
+            return None
+
+    async def acquire(self, key: Hashable) -> bool:
+        """
+        获取一个名额，返回 False 表示本次事件不调用插件（被丢弃或被更新的事件替代）
+        返回 True 后必须调用 release(key)
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = [0, deque()]
+        if slot[0] < self.max_concurrency and not slot[1]:
+            self._grant(slot)
+            return True
+        waiters = slot[1]
+        if self.overflow == "drop" or (self.overflow == "queue" and len(waiters) >= self.max_queue):
+            self.dropped += 1
+            return False
+        if self.overflow == "latest":
+            # 只保留最新的等待者，旧的等待者放弃调用插件
+            while waiters:
+                previous = waiters.popleft()
+                if not previous.done():
+                    previous.set_result(False)
+                    self.coalesced += 1
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        self.queued += 1
+        try:
+            # 排队的分发不占用同时分发的上限，否则占满名额的等待者会让读取循环停止读取
+            with awaiting():
+                granted = await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.result():
+                # 名额已转交但任务被取消，归还名额
+                self.release(key)
+            else:
+                try:
+                    waiters.remove(future)
+                except ValueError:
+                    pass
+                self._discard_idle(key, slot)
+            raise
+        return granted
+
+    def _grant(self, slot: list) -> None:
+        slot[0] += 1
+        self.running += 1
+        self.acquired += 1
+        if self.running > self.peak:
+            self.peak = self.running
+
+    def release(self, key: Hashable) -> None:
+        slot = self._slots.get(key)
+        if slot is None:
+            return
+        slot[0] -= 1
+        self.running -= 1
+        waiters = slot[1]
+        while waiters:
+            future = waiters.popleft()
+            if not future.done():
+                # 名额直接转交给下一个等待者
+                self._grant(slot)
+                future.set_result(True)
+                return
+        self._discard_idle(key, slot)
+
+    def _discard_idle(self, key: Hashable, slot: list) -> None:
+        if slot[0] <= 0 and not slot[1] and self._slots.get(key) is slot:
+            del self._slots[key]
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "waiting": sum(len(slot[1]) for slot in self._slots.values()),
+            "peak": self.peak,
+            "acquired": self.acquired,
+            "queued": self.queued,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+
+def validate(name: str, max_concurrency: Optional[int], per_key, overflow: str,
+             max_queue: int = 100) -> None:
+    """检查 @plugin 的并发参数"""
+    if max_concurrency is not None and max_concurrency < 1:
+        raise ValueError(f"插件 '{name}' 的 max_concurrency 必须大于 0")
+    if max_queue < 1:
+        raise ValueError(f"插件 '{name}' 的 max_queue 必须大于 0")
+    if isinstance(per_key, str) and per_key not in KEY_SCOPES:
+        raise ValueError(f"插件 '{name}' 的 per_key '{per_key}' 无效，可选 {KEY_SCOPES} 或函数")
+    if overflow not in OVERFLOW_POLICIES:
+        raise ValueError(f"插件 '{name}' 的 overflow '{overflow}' 无效，可选 {OVERFLOW_POLICIES}")
@@ -0,0 +1,107 @@
+"""
+入站事件去重
+重连后 NapCat 可能会重新推送最近的事件，在分发前过滤掉已经处理过的事件
+"""
+import time
+from typing import Dict, Optional, Tuple
+
+# 用于计算通知/请求事件指纹的字段
+_NOTICE_FIELDS = (
+    "post_type", "notice_type", "request_type", "sub_type", "time",
+    "group_id", "user_id", "operator_id", "target_id", "message_id", "flag",
+)
+
+
+class EventDeduplicator:
+    """
+    最近事件集合
+
+    消息事件以 message_id 为键，通知与请求事件以关键字段的哈希为键，键统一存为整数。
+    集合按插入顺序保存，超过 max_size 或存活超过 ttl 秒的键会被淘汰；元事件（心跳、生命周期）
+    不参与去重。
+
+    通知没有唯一编号，指纹中的 time 只精确到秒，同一秒内两次相同的戳一戳指纹相同。
+    因此通知只在重连后的 replay_window 秒内、且与之前的连接中收到过的通知相同时才被丢弃，
+    同一个连接中收到的相同通知都是真实事件。
+    """
+    def __init__(self, max_size: int = 4096, ttl: float = 600.0, replay_window: float = 30.0):
+        """
+        :param max_size: 最多记住的事件数
+        :param ttl: 事件被记住的时间（秒）
+        :param replay_window: 重连后多少秒内把与之前连接相同的通知视为重新推送
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.replay_window = replay_window
+        self._seen: Dict[int, Tuple[float, int]] = {}  # 事件键 -> (记录时间, 连接序号)，dict 保持插入顺序
+        self._connection = 0  # 当前连接序号，每次连上服务器加一
+        self._connected_at = 0.0
+        self.checked = 0
+        self.dropped = 0
+
+    @staticmethod
+    def event_key(event: dict) -> Optional[int]:
+        """
+        计算事件键，不参与去重的事件返回 None
+        :param event: 原始事件字典
+        """
+        post_type = event.get("post_type")
+        if post_type in (None, "meta_event"):
+            return None
+        if post_type in ("message", "message_sent") and event.get("message_id") is not None:
+            return hash((post_type, event.get("message_id")))
+        return hash(tuple(event.get(field) for field in _NOTICE_FIELDS))
+
+    @staticmethod
+    def _has_id(event: dict) -> bool:
+        return event.get("post_type") in ("message", "message_sent") and event.get("message_id") is not None
+
+    def connected(self) -> None:
+        """每次连上服务器时调用，之后 replay_window 秒内重新推送的通知会被丢弃"""
+        self._connection += 1
+        self._connected_at = time.monotonic()
+
+    def _expire(self, now: float) -> None:
+        """淘汰过期与超出容量的键（最早插入的键最先过期）"""
+        seen = self._seen
+        deadline = now - self.ttl
+        while seen:
+            oldest = next(iter(seen))
+            if seen[oldest][0] > deadline and len(seen) < self.max_size:
+                break
+            del seen[oldest]
+
+    def is_duplicate(self, event: dict) -> bool:
+        """
+        检查事件是否已经处理过，未处理过的事件会被记录
+        :param event: 原始事件字典
+        :return: True 表示重复事件，应当丢弃
+        """
+        key = self.event_key(event)
+        if key is None:
+            return False
+
+        self.checked += 1
+        now = time.monotonic()
+        self._expire(now)
+        seen = self._seen.get(key)
+        if seen is not None and (self._has_id(event) or (
+                seen[1] != self._connection and now - self._connected_at <= self.replay_window)):
+            self.dropped += 1
+            return True
+        if seen is not None:
+            # 移到末尾，保持按记录时间排序
+            del self._seen[key]
+        self._seen[key] = (now, self._connection)
+        return False
+
+    def clear(self) -> None:
+        self._seen.clear()
+
+    def stats(self) -> dict:
+        """检查数、丢弃的重复事件数与当前记录数"""
+        return {
+            "checked": self.checked,
+            "dropped": self.dropped,
+            "size": len(self._seen),
+        }
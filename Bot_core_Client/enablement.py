@@ -0,0 +1,198 @@
+"""
+按群 / 按私聊用户开关插件
+每个插件名分配一个固定的位序号，每个群（私聊按用户）保存一个整数位集，置位表示该插件在此处被关闭。
+分发时每个事件取一次位集，每个插件只需一次按位与；开关在运行时生效，不需要重新加载插件。
+插件重新加载后不再存在、且没有在任何地方被关闭的插件名会交还位序号，供新的插件名复用。
+可选保存到一个小的 JSON 文件，重启后恢复；修改后延迟合并写入，写文件在线程池中进行。
+"""
+import asyncio
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from .logs import Logger
+
+
+class EnablementTable:
+    """插件开关表，默认所有插件在所有群和私聊中开启"""
+
+    def __init__(self, path: Optional[str] = None, save_delay: float = 1.0):
+        """
+        :param path: 可选，保存开关表的 JSON 文件路径
+        :param save_delay: 修改后延迟多少秒写入文件，期间的多次修改合并为一次写入
+        """
+        self.path = path
+        self.save_delay = save_delay
+        self.logger = Logger()
+        self._version = 0  # 每次修改加一
+        self._saved_version = 0  # 已写入文件的版本，较旧的快照不会覆盖较新的
+        self._save_handle: Optional[asyncio.TimerHandle] = None
+        self._write_lock = threading.Lock()
+        self._slots: Dict[str, int] = {}  # 插件名 -> 位序号，跨热重载保持不变
+        self._groups: Dict[int, int] = {}  # 群号 -> 关闭的插件位集
+        self._users: Dict[int, int] = {}  # 私聊用户 -> 关闭的插件位集
+        self.skipped = 0
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._slots = {str(name): int(slot) for name, slot in data.get("slots", {}).items()}
+            self._groups = {int(k): int(v) for k, v in data.get("groups", {}).items() if int(v)}
+            self._users = {int(k): int(v) for k, v in data.get("users", {}).items() if int(v)}
+        except (OSError, ValueError, AttributeError) as e:
+            self.logger.error(f"读取插件开关表 {self.path} 失败: {e}")
+
+    def _snapshot(self) -> tuple:
+        data = {
+            "slots": dict(self._slots),
+            "groups": {str(k): v for k, v in self._groups.items()},
+            "users": {str(k): v for k, v in self._users.items()},
+        }
+        return self._version, data
+
+    def _write(self, version: int, data: dict) -> None:
+        """写入 JSON 文件（先写临时文件再替换，避免写到一半的文件）"""
+        with self._write_lock:
+            if version <= self._saved_version:
+                return
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+                self._saved_version = version
+            except OSError as e:
+                self.logger.error(f"保存插件开关表 {self.path} 失败: {e}")
+
+    def save(self) -> None:
+        """立即写入 JSON 文件"""
+        if self._save_handle is not None:
+            self._save_handle.cancel()
+            self._save_handle = None
+        if self.path:
+            self._write(*self._snapshot())
+
+    def _changed(self) -> None:
+        """记录一次修改，在事件循环中延迟到线程池写入，没有事件循环时立即写入"""
+        self._version += 1
+        if not self.path:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.save()
+            return
+        if self._save_handle is None:
+            self._save_handle = loop.call_later(self.save_delay, self._save_later, loop)
+
+    def _save_later(self, loop: asyncio.AbstractEventLoop) -> None:
+        self._save_handle = None
+        loop.run_in_executor(None, self._write, *self._snapshot())
+
+    def close(self) -> None:
+        """写入尚未保存的修改（由 Bot.run 退出时调用）"""
+        if self._version > self._saved_version:
+            self.save()
+
+    def slot(self, plugin_name: str) -> int:
+        """插件的位序号，第一次出现时分配最小的空闲序号"""
+        slot = self._slots.get(plugin_name)
+        if slot is None:
+            used = set(self._slots.values())
+            slot = 0
+            while slot in used:
+                slot += 1
+            self._slots[plugin_name] = slot
+        return slot
+
+    def reclaim(self, loaded: Iterable[str]) -> int:
+        """
+        交还不在 loaded 中、且在所有群和私聊中都没有被关闭的插件名的位序号
+        仍被关闭的插件名保留位序号，插件改名或暂时移除后再加载时关闭状态不丢失
+        :param loaded: 当前加载的插件名
+        :return: 交还的位序号数
+        """
+        loaded = set(loaded)
+        in_use = 0
+        for mask in self._groups.values():
+            in_use |= mask
+        for mask in self._users.values():
+            in_use |= mask
+        stale = [name for name, slot in self._slots.items()
+                 if name not in loaded and not (in_use >> slot) & 1]
+        for name in stale:
+            del self._slots[name]
+        if stale:
+            self._changed()
+        return len(stale)
+
+    def mask(self, msg: dict) -> int:
+        """事件所在群（私聊为用户）中被关闭的插件位集"""
+        group_id = msg.get("group_id")
+        if group_id:
+            return self._groups.get(group_id, 0)
+        user_id = msg.get("user_id")
+        return self._users.get(user_id, 0) if user_id else 0
+
+    def _table(self, group_id: Optional[int], user_id: Optional[int]):
+        if (group_id is None) == (user_id is None):
+            raise ValueError("group_id 与 user_id 必须且只能指定一个")
+        return (self._groups, group_id) if group_id is not None else (self._users, user_id)
+
+    def _set(self, plugin_name: str, group_id: Optional[int], user_id: Optional[int],
+             enabled: bool) -> bool:
+        table, key = self._table(group_id, user_id)
+        bit = 1 << self.slot(plugin_name)
+        old = table.get(key, 0)
+        new = old & ~bit if enabled else old | bit
+        if new == old:
+            return False
+        if new:
+            table[key] = new
+        else:
+            del table[key]
+        self._changed()
+        return True
+
+    def disable(self, plugin_name: str, group_id: Optional[int] = None,
+                user_id: Optional[int] = None) -> bool:
+        """
+        在群（或私聊用户）中关闭插件
+        :param plugin_name: 插件名
+        :param group_id: 群号，与 user_id 二选一
+        :param user_id: 私聊用户
+        :return: 状态是否发生变化
+        """
+        return self._set(plugin_name, group_id, user_id, False)
+
+    def enable(self, plugin_name: str, group_id: Optional[int] = None,
+               user_id: Optional[int] = None) -> bool:
+        """在群（或私聊用户）中重新开启插件，参数同 disable"""
+        return self._set(plugin_name, group_id, user_id, True)
+
+    def is_enabled(self, plugin_name: str, group_id: Optional[int] = None,
+                   user_id: Optional[int] = None) -> bool:
+        """插件在群（或私聊用户）中是否开启，参数同 disable"""
+        table, key = self._table(group_id, user_id)
+        slot = self._slots.get(plugin_name)
+        return slot is None or not (table.get(key, 0) >> slot) & 1
+
+    def disabled_plugins(self, group_id: Optional[int] = None,
+                         user_id: Optional[int] = None) -> List[str]:
+        """群（或私聊用户）中被关闭的插件名"""
+        table, key = self._table(group_id, user_id)
+        mask = table.get(key, 0)
+        return [name for name, slot in self._slots.items() if (mask >> slot) & 1]
+
+    def stats(self) -> dict:
+        """已分配位序号的插件数、有插件被关闭的群数与私聊用户数、因关闭而跳过的调用数"""
+        return {
+            "plugins": len(self._slots),
+            "groups": len(self._groups),
+            "users": len(self._users),
+            "skipped": self.skipped,
+        }
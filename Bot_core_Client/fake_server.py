@@ -0,0 +1,604 @@
+"""
+本地模拟的 NapCat 服务器
+实现 OneBot 11 正向 WebSocket 的主要行为：Token 鉴权、连接时的 lifecycle 事件、心跳、
+按脚本或随机生成的群聊/私聊消息与通知，以及带延迟、按 echo 匹配的动作响应。
+不需要 QQ 账号即可运行 Bot、调试插件或做压力测试。
+
+在测试中:
+    async with FakeNapCat(token="test") as server:
+        bot = Bot(server.url, token="test")
+        ...
+        await server.push(server.group_message(group_id, user_id, "/help"))
+        action = await server.wait_for_action("send_group_msg")
+
+命令行: python -m Bot_core_Client.fake_server --port 3001 --token test --rate 5
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import OrderedDict, deque
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
+from urllib.parse import parse_qs, urlsplit
+
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+from .logs import Logger
+
+# 随机消息的文本
+_SAMPLE_TEXTS = ("你好", "在吗", "/help", "哈哈哈", "今天吃什么", "签到", "/roll", "晚安",
+                 "有人吗", "收到", "666", "？")
+
+# 只需要返回成功的动作
+_NOOP_ACTIONS = frozenset((
+    "delete_msg", "set_group_ban", "set_group_whole_ban", "set_group_special_title",
+    "set_group_name", "set_group_leave", "set_essence_msg", "set_group_add_request",
+    "set_friend_add_request", "send_poke", "send_group_poke", "send_private_poke",
+    "send_group_file", "send_private_file", "send_group_ai_voice", "clean_cache",
+    "forward_msg_to_group", "forward_msg_to_private",
+))
+
+# 脚本中的一项：事件字典（可带 "_delay" 字段），或 (延迟秒数, 事件字典)
+ScriptItem = Union[dict, Tuple[float, dict]]
+
+
+class ActionFailed(Exception):
+    """在动作处理函数中抛出，返回 status=failed 的响应"""
+    def __init__(self, retcode: int, message: str):
+        super().__init__(message)
+        self.retcode = retcode
+        self.message = message
+
+
+class FakeNapCat:
+    """模拟的 NapCat WebSocket 服务器"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, token: Optional[str] = None,
+                 self_id: int = 10000, groups: Optional[Dict[int, List[int]]] = None,
+                 group_count: int = 3, members_per_group: int = 20,
+                 latency: Tuple[float, float] = (0.005, 0.03), rate: float = 0.0,
+                 private_ratio: float = 0.1, notice_ratio: float = 0.02,
+                 heartbeat_interval: float = 30.0, script: Optional[Iterable[ScriptItem]] = None,
+                 history_size: int = 1000, seed: Optional[int] = None):
+        """
+        :param host: 监听地址
+        :param port: 监听端口，0 表示随机分配（见 url）
+        :param token: 可选，客户端需要通过 Authorization: Bearer 头或 access_token 参数提供
+        :param self_id: 机器人自己的 QQ 号
+        :param groups: 可选，群号 -> 成员 QQ 号列表，第一个成员为群主；不传时自动生成
+        :param group_count: 自动生成的群数
+        :param members_per_group: 自动生成的每个群的成员数
+        :param latency: 动作响应延迟的范围（秒），每次在其中随机取值
+        :param rate: 每秒随机生成的事件数，0 表示不生成
+        :param private_ratio: 随机事件中私聊消息的比例
+        :param notice_ratio: 随机事件中通知（戳一戳、进群）的比例
+        :param heartbeat_interval: 心跳间隔（秒），0 表示不发送
+        :param script: 可选，每个连接建立后按顺序发送的事件
+        :param history_size: 每个会话保留的历史消息数，供 get_msg 与历史消息查询
+        :param seed: 随机数种子，便于复现
+        """
+        self.host = host
+        self.port = port
+        self.token = token
+        self.self_id = self_id
+        self.latency = latency
+        self.rate = rate
+        self.private_ratio = private_ratio
+        self.notice_ratio = notice_ratio
+        self.heartbeat_interval = heartbeat_interval
+        self.script = list(script) if script is not None else []
+        self.history_size = history_size
+        self.logger = Logger()
+        self._random = random.Random(seed)
+        if groups is None:
+            groups = {
+                100000 + g: [200000 + g * 1000 + m for m in range(members_per_group)]
+                for g in range(1, group_count + 1)
+            }
+        self.members: Dict[int, Dict[int, dict]] = {
+            group_id: {user_id: self._make_member(group_id, user_id, i) for i, user_id in enumerate(user_ids)}
+            for group_id, user_ids in groups.items()
+        }
+        self.friends = sorted({user_id for members in self.members.values() for user_id in members})[:50]
+        self.handlers: Dict[str, Callable[[dict], Any]] = {}
+        self.actions: List[dict] = []  # 收到的所有动作请求，测试中用于断言
+        self._action_seen: Optional[asyncio.Event] = None
+        self._connections: Set = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self._server = None
+        self._generator: Optional[asyncio.Task] = None
+        self._message_ids = itertools.count(1)
+        self._messages: "OrderedDict[int, dict]" = OrderedDict()  # message_id -> 消息事件
+        self._history: Dict[tuple, deque] = {}  # ("group"/"private", 号码) -> 消息事件
+        self.events_sent = 0
+        self.rejected = 0
+
+    # ---------- 启动与停止 ----------
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}"
+
+    async def start(self) -> None:
+        self._action_seen = asyncio.Event()
+        self._server = await serve(self._handle, self.host, self.port,
+                                   process_request=self._authenticate)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if self.rate > 0:
+            self._generator = asyncio.ensure_future(self._generate())
+        self.logger.info(f"模拟 NapCat 服务器已启动: {self.url}")
+
+    async def stop(self) -> None:
+        if self._generator is not None:
+            self._generator.cancel()
+            self._generator = None
+        for task in list(self._tasks):
+            task.cancel()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeNapCat":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await asyncio.Future()
+        finally:
+            await self.stop()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ---------- 连接 ----------
+
+    def _authenticate(self, connection, request):
+        if not self.token:
+            return None
+        header = request.headers.get("Authorization", "")
+        query = parse_qs(urlsplit(request.path).query)
+        if header == f"Bearer {self.token}" or query.get("access_token", [None])[0] == self.token:
+            return None
+        self.rejected += 1
+        return connection.respond(HTTPStatus.UNAUTHORIZED, "token 验证失败\n")
+
+    async def _handle(self, connection) -> None:
+        self._connections.add(connection)
+        self.logger.info(f"客户端已连接: {connection.remote_address}")
+        tasks = [self._spawn(self._play_script(connection))]
+        if self.heartbeat_interval > 0:
+            tasks.append(self._spawn(self._heartbeat(connection)))
+        try:
+            await connection.send(json.dumps(self._meta_event("lifecycle", sub_type="connect")))
+            async for raw in connection:
+                try:
+                    request = json.loads(raw)
+                except json.JSONDecodeError:
+                    self.logger.warning(f"无法解析客户端消息: {raw}")
+                    continue
+                self.actions.append(request)
+                self._action_seen.set()
+                self._spawn(self._respond(connection, request))
+        except ConnectionClosed:
+            pass
+        finally:
+            self._connections.discard(connection)
+            for task in tasks:
+                task.cancel()
+            self.logger.info("客户端已断开")
+
+    async def _respond(self, connection, request: dict) -> None:
+        """模拟处理延迟后返回响应；请求没有 echo 时响应也不带 echo（与 NapCat 相同）"""
+        await asyncio.sleep(self._random.uniform(*self.latency))
+        action = request.get("action", "")
+        params = request.get("params") or {}
+        response = {"status": "ok", "retcode": 0, "data": None, "message": "", "wording": ""}
+        try:
+            handler = self.handlers.get(action) or getattr(self, f"_action_{action}", None)
+            if handler is not None:
+                response["data"] = handler(params)
+            elif action not in _NOOP_ACTIONS:
+                raise ActionFailed(1404, f"不支持的 API: {action}")
+        except ActionFailed as e:
+            response.update(status="failed", retcode=e.retcode, message=e.message, wording=e.message)
+        except Exception as e:
+            response.update(status="failed", retcode=1200, message=str(e), wording=str(e))
+        if "echo" in request:
+            response["echo"] = request["echo"]
+        try:
+            await connection.send(json.dumps(response, ensure_ascii=False))
+        except ConnectionClosed:
+            pass
+
+    async def wait_for_action(self, action: str, predicate: Optional[Callable[[dict], bool]] = None,
+                              timeout: float = 5.0, start: int = 0) -> dict:
+        """
+        等待收到指定的动作请求，测试中用于断言机器人的行为
+        :param action: 动作名
+        :param predicate: 可选，接收 params，返回是否匹配
+        :param timeout: 超时时间（秒），超时抛出 asyncio.TimeoutError
+        :param start: 从 actions 的第几项开始查找
+        :return: 匹配的请求
+        """
+        async def find():
+            index = start
+            while True:
+                while index < len(self.actions):
+                    request = self.actions[index]
+                    index += 1
+                    if request.get("action") == action and (
+                            predicate is None or predicate(request.get("params") or {})):
+                        return request
+                self._action_seen.clear()
+                await self._action_seen.wait()
+        return await asyncio.wait_for(find(), timeout)
+
+    # ---------- 事件 ----------
+
+    async def push(self, event: dict) -> None:
+        """向所有已连接的客户端发送一个事件"""
+        data = json.dumps(event, ensure_ascii=False)
+        for connection in list(self._connections):
+            try:
+                await connection.send(data)
+                self.events_sent += 1
+            except ConnectionClosed:
+                pass
+
+    async def _play_script(self, connection) -> None:
+        for item in self.script:
+            if isinstance(item, tuple):
+                delay, event = item
+                # 脚本在每个连接上重放，不修改调用方传入的事件
+                event = dict(event)
+            else:
+                event = dict(item)
+                delay = event.pop("_delay", 0)
+            if delay:
+                await asyncio.sleep(delay)
+            event.setdefault("time", int(time.time()))
+            event.setdefault("self_id", self.self_id)
+            if event.get("post_type") == "message":
+                self._remember(event)
+            await connection.send(json.dumps(event, ensure_ascii=False))
+            self.events_sent += 1
+
+    async def _heartbeat(self, connection) -> None:
+        interval = int(self.heartbeat_interval * 1000)
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await connection.send(json.dumps(self._meta_event(
+                "heartbeat", status={"online": True, "good": True}, interval=interval)))
+
+    async def _generate(self) -> None:
+        """按 rate 持续生成随机事件，落后时一次补发多个以保持平均速率"""
+        loop = asyncio.get_running_loop()
+        interval = 1.0 / self.rate
+        deadline = loop.time()
+        while True:
+            deadline += interval
+            delay = deadline - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if self._connections:
+                await self.push(self.random_event())
+
+    def _meta_event(self, meta_event_type: str, **fields) -> dict:
+        event = {"time": int(time.time()), "self_id": self.self_id, "post_type": "meta_event",
+                 "meta_event_type": meta_event_type}
+        event.update(fields)
+        return event
+
+    def random_event(self) -> dict:
+        """生成一个随机的群消息、私聊消息或通知，没有任何群成员时生成心跳"""
+        roll = self._random.random()
+        groups = [group_id for group_id, members in self.members.items() if members]
+        if not groups:
+            return self._meta_event("heartbeat", status={"online": True, "good": True},
+                                    interval=int(self.heartbeat_interval * 1000))
+        group_id = self._random.choice(groups)
+        user_id = self._random.choice(list(self.members[group_id]))
+        if roll < self.notice_ratio:
+            return self.notice("notify", group_id=group_id, user_id=user_id, sub_type="poke",
+                               target_id=self.self_id)
+        text = self._random.choice(_SAMPLE_TEXTS)
+        if roll < self.notice_ratio + self.private_ratio and self.friends:
+            return self.private_message(self._random.choice(self.friends), text)
+        return self.group_message(group_id, user_id, text)
+
+    def _next_message(self, message, **fields) -> dict:
+        segments = _to_segments(message)
+        message_id = next(self._message_ids)
+        event = {
+            "self_id": self.self_id,
+            "time": int(time.time()),
+            "message_id": message_id,
+            "message_seq": message_id,
+            "real_id": message_id,
+            "message": segments,
+            "raw_message": _raw_message(segments),
+            "font": 14,
+            "message_format": "array",
+        }
+        event.update(fields)
+        self._remember(event)
+        return event
+
+    def group_message(self, group_id: int, user_id: int, message, post_type: str = "message") -> dict:
+        """
+        构造一条群消息事件并记入历史，用 push 发送
+        :param message: 文本或消息段列表
+        """
+        member = self.members.get(group_id, {}).get(user_id) or self._make_member(group_id, user_id, -1)
+        return self._next_message(
+            message, post_type=post_type, message_type="group", sub_type="normal",
+            group_id=group_id, user_id=user_id,
+            sender={"user_id": user_id, "nickname": member["nickname"], "card": member["card"],
+                    "role": member["role"]})
+
+    def private_message(self, user_id: int, message, post_type: str = "message") -> dict:
+        """构造一条私聊消息事件并记入历史"""
+        return self._next_message(
+            message, post_type=post_type, message_type="private", sub_type="friend",
+            user_id=user_id, target_id=self.self_id,
+            sender={"user_id": user_id, "nickname": f"用户{user_id}", "card": ""})
+
+    def notice(self, notice_type: str, **fields) -> dict:
+        """构造一个通知事件，如 notice("group_increase", group_id=..., user_id=..., sub_type="approve")"""
+        event = {"time": int(time.time()), "self_id": self.self_id, "post_type": "notice",
+                 "notice_type": notice_type}
+        event.update(fields)
+        return event
+
+    def _remember(self, event: dict) -> None:
+        if event.get("message_type") == "group":
+            key = ("group", event.get("group_id"))
+        else:
+            key = ("private", event.get("target_id") if event.get("user_id") == self.self_id
+                   else event.get("user_id"))
+        history = self._history.get(key)
+        if history is None:
+            history = self._history[key] = deque(maxlen=self.history_size)
+        history.append(event)
+        message_id = event.get("message_id")
+        if message_id is not None:
+            self._messages[message_id] = event
+            while len(self._messages) > self.history_size * 10:
+                self._messages.popitem(last=False)
+
+    # ---------- 数据 ----------
+
+    def _make_member(self, group_id: int, user_id: int, index: int) -> dict:
+        now = int(time.time())
+        return {
+            "group_id": group_id,
+            "user_id": user_id,
+            "nickname": f"用户{user_id}",
+            "card": "",
+            "sex": "unknown",
+            "age": 0,
+            "area": "",
+            "level": "1",
+            "qq_level": 0,
+            "join_time": now - 86400 * (index + 1) if index >= 0 else now,
+            "last_sent_time": now,
+            "title_expire_time": 0,
+            "unfriendly": False,
+            "card_changeable": True,
+            "is_robot": False,
+            "shut_up_timestamp": 0,
+            "role": "owner" if index == 0 else "admin" if 0 < index <= 2 else "member",
+            "title": "",
+        }
+
+    def _group(self, params: dict) -> Dict[int, dict]:
+        group_id = int(params.get("group_id", 0))
+        members = self.members.get(group_id)
+        if members is None:
+            raise ActionFailed(1200, f"群 {group_id} 不存在")
+        return members
+
+    def _member(self, params: dict) -> dict:
+        member = self._group(params).get(int(params.get("user_id", 0)))
+        if member is None:
+            raise ActionFailed(1200, "成员不存在")
+        return member
+
+    def _group_info(self, group_id: int) -> dict:
+        return {"group_id": group_id, "group_name": f"测试群{group_id}", "group_remark": "",
+                "group_all_shut": 0, "member_count": len(self.members[group_id]),
+                "max_member_count": 500}
+
+    # ---------- 动作 ----------
+
+    def _action_get_login_info(self, params: dict) -> dict:
+        return {"user_id": self.self_id, "nickname": "FakeNapCat"}
+
+    def _action_get_status(self, params: dict) -> dict:
+        return {"online": True, "good": True, "stat": {}}
+
+    def _action_get_version_info(self, params: dict) -> dict:
+        return {"app_name": "NapCat.Onebot", "protocol_version": "v11", "app_version": "fake"}
+
+    def _action_send_group_msg(self, params: dict) -> dict:
+        self._group(params)
+        event = self._next_message(params.get("message", ""), post_type="message_sent",
+                                   message_type="group", sub_type="normal",
+                                   group_id=int(params["group_id"]), user_id=self.self_id,
+                                   sender={"user_id": self.self_id, "nickname": "FakeNapCat",
+                                           "card": "", "role": "member"})
+        return {"message_id": event["message_id"]}
+
+    def _action_send_private_msg(self, params: dict) -> dict:
+        event = self._next_message(params.get("message", ""), post_type="message_sent",
+                                   message_type="private", sub_type="friend",
+                                   user_id=self.self_id, target_id=int(params.get("user_id", 0)),
+                                   sender={"user_id": self.self_id, "nickname": "FakeNapCat", "card": ""})
+        return {"message_id": event["message_id"]}
+
+    def _action_send_msg(self, params: dict) -> dict:
+        if params.get("message_type") == "group" or (
+                params.get("group_id") and params.get("message_type") != "private"):
+            return self._action_send_group_msg(params)
+        return self._action_send_private_msg(params)
+
+    def _action_send_group_forward_msg(self, params: dict) -> dict:
+        data = self._action_send_group_msg({"group_id": params.get("group_id"),
+                                            "message": [{"type": "forward", "data": {}}]})
+        data["res_id"] = f"fake-{data['message_id']}"
+        return data
+
+    def _action_send_private_forward_msg(self, params: dict) -> dict:
+        data = self._action_send_private_msg({"user_id": params.get("user_id"),
+                                              "message": [{"type": "forward", "data": {}}]})
+        data["res_id"] = f"fake-{data['message_id']}"
+        return data
+
+    def _action_send_forward_msg(self, params: dict) -> dict:
+        if params.get("group_id"):
+            return self._action_send_group_forward_msg(params)
+        return self._action_send_private_forward_msg(params)
+
+    def _action_get_msg(self, params: dict) -> dict:
+        event = self._messages.get(int(params.get("message_id", 0)))
+        if event is None:
+            raise ActionFailed(1200, "消息不存在")
+        return event
+
+    def _history_page(self, key: tuple, params: dict) -> dict:
+        messages = list(self._history.get(key, ()))
+        seq = params.get("message_seq")
+        if seq:
+            messages = [m for m in messages if m["message_seq"] <= int(seq)]
+        count = int(params.get("count") or 20)
+        return {"messages": messages[-count:]}
+
+    def _action_get_group_history_msg(self, params: dict) -> dict:
+        return self._history_page(("group", int(params.get("group_id", 0))), params)
+
+    def _action_get_friend_history_msg(self, params: dict) -> dict:
+        return self._history_page(("private", int(params.get("user_id", 0))), params)
+
+    def _action_get_group_list(self, params: dict) -> list:
+        return [self._group_info(group_id) for group_id in self.members]
+
+    def _action_get_group_info(self, params: dict) -> dict:
+        self._group(params)
+        return self._group_info(int(params["group_id"]))
+
+    def _action_get_group_member_list(self, params: dict) -> list:
+        return list(self._group(params).values())
+
+    def _action_get_group_member_info(self, params: dict) -> dict:
+        return self._member(params)
+
+    def _action_get_friend_list(self, params: dict) -> list:
+        return [{"user_id": user_id, "nickname": f"用户{user_id}", "remark": ""}
+                for user_id in self.friends]
+
+    def _action_get_stranger_info(self, params: dict) -> dict:
+        user_id = int(params.get("user_id", 0))
+        return {"user_id": user_id, "nickname": f"用户{user_id}", "sex": "unknown", "age": 0}
+
+    def _action_get_essence_msg_list(self, params: dict) -> list:
+        self._group(params)
+        return []
+
+    def _action_set_group_card(self, params: dict) -> None:
+        member = self._member(params)
+        old, member["card"] = member["card"], params.get("card", "")
+        self._spawn(self.push(self.notice("group_card", group_id=member["group_id"],
+                                          user_id=member["user_id"], card_new=member["card"],
+                                          card_old=old)))
+
+    def _action_set_group_admin(self, params: dict) -> None:
+        member = self._member(params)
+        enable = params.get("enable", True)
+        member["role"] = "admin" if enable else "member"
+        self._spawn(self.push(self.notice("group_admin", group_id=member["group_id"],
+                                          user_id=member["user_id"],
+                                          sub_type="set" if enable else "unset")))
+
+    def _action_set_group_kick(self, params: dict) -> None:
+        member = self._member(params)
+        del self.members[member["group_id"]][member["user_id"]]
+        self._spawn(self.push(self.notice("group_decrease", group_id=member["group_id"],
+                                          user_id=member["user_id"], operator_id=self.self_id,
+                                          sub_type="kick")))
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self._connections),
+            "events_sent": self.events_sent,
+            "actions": len(self.actions),
+            "rejected": self.rejected,
+        }
+
+
+def _to_segments(message) -> list:
+    if isinstance(message, str):
+        return [{"type": "text", "data": {"text": message}}]
+    if isinstance(message, dict):
+        return [message]
+    return list(message or [])
+
+
+def _raw_message(segments: list) -> str:
+    """按 CQ 码格式拼接 raw_message"""
+    parts = []
+    for segment in segments:
+        data = segment.get("data") or {}
+        if segment.get("type") == "text":
+            parts.append(str(data.get("text", "")))
+        else:
+            args = "".join(f",{k}={v}" for k, v in data.items())
+            parts.append(f"[CQ:{segment.get('type')}{args}]")
+    return "".join(parts)
+
+
+def load_script(path: str) -> List[dict]:
+    """读取 JSON Lines 脚本，每行一个事件，可用 "_delay" 字段指定发送前等待的秒数"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="本地模拟的 NapCat WebSocket 服务器")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--token", default=None, help="需要客户端提供的 token")
+    parser.add_argument("--rate", type=float, default=1.0, help="每秒随机生成的事件数，0 表示不生成")
+    parser.add_argument("--groups", type=int, default=3, help="自动生成的群数")
+    parser.add_argument("--members", type=int, default=20, help="每个群的成员数")
+    parser.add_argument("--latency", type=float, nargs=2, default=(0.005, 0.03),
+                        metavar=("MIN", "MAX"), help="动作响应延迟范围（秒）")
+    parser.add_argument("--heartbeat", type=float, default=30.0, help="心跳间隔（秒）")
+    parser.add_argument("--script", default=None, help="JSON Lines 事件脚本，连接后按顺序发送")
+    parser.add_argument("--seed", type=int, default=None, help="随机数种子")
+    args = parser.parse_args(argv)
+
+    server = FakeNapCat(host=args.host, port=args.port, token=args.token, rate=args.rate,
+                        group_count=args.groups, members_per_group=args.members,
+                        latency=tuple(args.latency), heartbeat_interval=args.heartbeat,
+                        script=load_script(args.script) if args.script else None, seed=args.seed)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        server.logger.info("模拟服务器已退出")
+
+
+if __name__ == "__main__":
+    main()
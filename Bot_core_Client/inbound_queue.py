@@ -0,0 +1,152 @@
+"""
+入站事件队列
+位于 WebSocket 读取循环与插件分发之间，限制机器人最多积压多少事件。
+队列满时按策略处理：block 暂停读取（背压传递到连接），drop_oldest 丢弃最早的事件，
+priority 按 post_type 优先级丢弃（心跳等元事件最先，其次通知）。
+"""
+import asyncio
+import itertools
+from collections import deque
+from typing import Dict, Optional
+
+from .logs import Logger
+
+POLICIES = ("block", "drop_oldest", "priority")
+
+# 数值越小越先被丢弃，未知类型按通知处理
+PRIORITIES = {"meta_event": 0, "notice": 1, "request": 2, "message": 3, "message_sent": 3}
+_LEVELS = 4
+
+
+class InboundQueue:
+    """按 post_type 分级存放、整体保持到达顺序的有界队列"""
+
+    def __init__(self, max_size: int = 1000, policy: str = "block", max_inflight: int = 64):
+        """
+        :param max_size: 队列长度上限
+        :param policy: 队列满时的策略，block / drop_oldest / priority
+        :param max_inflight: 同时执行的分发任务上限，达到上限时暂停出队，积压留在队列中
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"未知的队列策略: {policy}，可选 {POLICIES}")
+        self.max_size = max_size
+        self.policy = policy
+        self.max_inflight = max_inflight
+        self.logger = Logger()
+        self._levels = [deque() for _ in range(_LEVELS)]  # 每级: (序号, 事件)
+        self._size = 0
+        self._seq = itertools.count()
+        # 等待中的 get / put，按需创建 Future，不在构造时绑定事件循环
+        self._getters = deque()
+        self._putters = deque()
+        self.enqueued = 0
+        self.blocked = 0
+        self.max_depth = 0
+        self.dropped: Dict[str, int] = {}  # post_type -> 丢弃数
+
+    @staticmethod
+    def priority(event: dict) -> int:
+        return PRIORITIES.get(event.get("post_type"), 1)
+
+    def _append(self, event: dict) -> None:
+        self._levels[self.priority(event)].append((next(self._seq), event))
+        self._size += 1
+        self.enqueued += 1
+        if self._size > self.max_depth:
+            self.max_depth = self._size
+        self._wake(self._getters)
+
+    def _pop_level(self, level: int) -> dict:
+        _, event = self._levels[level].popleft()
+        self._size -= 1
+        if self._size < self.max_size:
+            self._wake(self._putters)
+        return event
+
+    @staticmethod
+    def _wake(waiters: deque) -> None:
+        while waiters:
+            future = waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+
+    async def _wait(self, waiters: deque) -> None:
+        future = asyncio.get_running_loop().create_future()
+        waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已被唤醒却被取消，把机会让给下一个等待者
+                self._wake(waiters)
+            raise
+
+    def _oldest_level(self) -> Optional[int]:
+        """队首序号最小（最早到达）的级别"""
+        best = None
+        for level, items in enumerate(self._levels):
+            if items and (best is None or items[0][0] < self._levels[best][0][0]):
+                best = level
+        return best
+
+    def _drop(self, event: dict) -> None:
+        post_type = event.get("post_type") or "unknown"
+        self.dropped[post_type] = self.dropped.get(post_type, 0) + 1
+
+    def _make_room(self, event: dict) -> bool:
+        """
+        队列已满时按丢弃策略腾出位置
+        :return: 新事件是否可以入队
+        """
+        if self.policy == "priority":
+            level = self.priority(event)
+            for lower in range(level + 1):
+                if self._levels[lower]:
+                    self._drop(self._pop_level(lower))
+                    return True
+            # 队列中都是更重要的事件，丢弃新事件
+            self._drop(event)
+            return False
+        self._drop(self._pop_level(self._oldest_level()))
+        return True
+
+    async def put(self, event: dict) -> None:
+        """
+        事件入队，block 策略下队列满时等待出队
+        :param event: 原始事件字典
+        """
+        if self._size >= self.max_size:
+            if self.policy == "block":
+                self.blocked += 1
+                while self._size >= self.max_size:
+                    await self._wait(self._putters)
+            elif not self._make_room(event):
+                return
+        self._append(event)
+
+    def put_nowait(self, event: dict) -> None:
+        """不等待的入队，block 策略下队列满时仍然入队（用于限流合并等少量内部事件）"""
+        if self._size >= self.max_size and self.policy != "block":
+            if not self._make_room(event):
+                return
+        self._append(event)
+
+    async def get(self) -> dict:
+        """按到达顺序取出下一个事件，队列为空时等待"""
+        while not self._size:
+            await self._wait(self._getters)
+        return self._pop_level(self._oldest_level())
+
+    def __len__(self) -> int:
+        return self._size
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._size,
+            "max_depth": self.max_depth,
+            "enqueued": self.enqueued,
+            "blocked": self.blocked,
+            "dropped": sum(self.dropped.values()),
+            "dropped_by_type": dict(self.dropped),
+        }
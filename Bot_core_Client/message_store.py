@@ -0,0 +1,180 @@
+"""
+最近消息存储
+接收循环经过的消息按会话保存在内存环形缓冲中，可按 message_id 查找或取最近 N 条，
+避免为刚收到的消息再调用 get_msg / get_group_history_msg。
+可选地将被挤出内存的消息写入 sqlite，保留更长的历史。
+"""
+import json
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional, Tuple
+
+from .logs import Logger
+
+ConversationKey = Tuple[str, int]  # ("group", 群号) 或 ("private", 用户ID)
+
+
+class MessageStore:
+    """按会话划分的最近消息环形缓冲"""
+
+    def __init__(self, per_conversation: int = 200, max_conversations: int = 2048,
+                 sqlite_path: Optional[str] = None, spill_max_age: float = 7 * 86400):
+        """
+        :param per_conversation: 每个群/私聊在内存中保留的消息数
+        :param max_conversations: 内存中保留的会话数，超出时淘汰最久没有消息的会话
+        :param sqlite_path: 可选，溢出到 sqlite 的数据库文件路径
+        :param spill_max_age: sqlite 中消息的保留时间（秒）
+        """
+        self.per_conversation = per_conversation
+        self.max_conversations = max_conversations
+        self.spill_max_age = spill_max_age
+        self._conversations: "OrderedDict[ConversationKey, deque]" = OrderedDict()
+        self._by_id: Dict[int, dict] = {}  # message_id -> 事件，仅包含内存中的消息
+        self.logger = Logger()
+        self.hits = 0
+        self.misses = 0
+        self.spilled = 0
+
+        self._db: Optional[sqlite3.Connection] = None
+        self._uncommitted = 0
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "message_id INTEGER PRIMARY KEY, conversation TEXT NOT NULL, "
+                "time INTEGER NOT NULL, data TEXT NOT NULL)")
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_messages_conversation "
+                "ON messages (conversation, time)")
+            self._db.commit()
+
+    @staticmethod
+    def conversation_key(event: dict) -> Optional[ConversationKey]:
+        """计算消息事件所属的会话，非消息事件返回 None"""
+        if event.get("post_type") not in ("message", "message_sent"):
+            return None
+        if event.get("message_type") == "group":
+            return ("group", event.get("group_id"))
+        if event.get("post_type") == "message_sent" and event.get("target_id"):
+            # 机器人自己发出的私聊消息，会话对象是接收方
+            return ("private", event.get("target_id"))
+        return ("private", event.get("user_id"))
+
+    def add(self, event: dict) -> None:
+        """
+        记录一条消息事件，其他事件会被忽略
+        :param event: 原始事件字典
+        """
+        key = self.conversation_key(event)
+        message_id = event.get("message_id")
+        if key is None or message_id is None:
+            return
+
+        buffer = self._conversations.get(key)
+        if buffer is None:
+            buffer = self._conversations[key] = deque()
+            if len(self._conversations) > self.max_conversations:
+                _, evicted = self._conversations.popitem(last=False)
+                for old in evicted:
+                    self._evict(old)
+        else:
+            self._conversations.move_to_end(key)
+
+        if len(buffer) >= self.per_conversation:
+            self._evict(buffer.popleft())
+        buffer.append(event)
+        self._by_id[message_id] = event
+
+    def _evict(self, event: dict) -> None:
+        """将消息移出内存，启用 sqlite 时写入数据库"""
+        self._by_id.pop(event.get("message_id"), None)
+        if self._db is None:
+            return
+        key = self.conversation_key(event)
+        try:
+            self._db.execute(
+                "INSERT OR REPLACE INTO messages (message_id, conversation, time, data) "
+                "VALUES (?, ?, ?, ?)",
+                (event.get("message_id"), f"{key[0]}:{key[1]}", event.get("time", 0),
+                 json.dumps(event, ensure_ascii=False)))
+            self.spilled += 1
+            self._uncommitted += 1
+            if self._uncommitted >= 100:
+                self.flush()
+        except sqlite3.Error as e:
+            self.logger.error(f"写入消息存储数据库失败: {e}")
+
+    def flush(self) -> None:
+        """提交未写入的溢出消息，并清理超过保留时间的记录"""
+        if self._db is None:
+            return
+        try:
+            self._db.execute("DELETE FROM messages WHERE time < ?",
+                             (int(time.time() - self.spill_max_age),))
+            self._db.commit()
+            self._uncommitted = 0
+        except sqlite3.Error as e:
+            self.logger.error(f"提交消息存储数据库失败: {e}")
+
+    def get(self, message_id: int) -> Optional[dict]:
+        """
+        按 message_id 查找消息
+        :return: 原始消息事件，未找到返回 None
+        """
+        event = self._by_id.get(message_id)
+        if event is None and self._db is not None:
+            row = self._db.execute("SELECT data FROM messages WHERE message_id = ?",
+                                   (message_id,)).fetchone()
+            if row is not None:
+                event = json.loads(row[0])
+        if event is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return event
+
+    def recent(self, group_id: Optional[int] = None, user_id: Optional[int] = None,
+               limit: int = 20) -> List[dict]:
+        """
+        获取会话中最近的消息，按时间从旧到新排列
+        :param group_id: 群号，与 user_id 二选一
+        :param user_id: 私聊用户ID
+        :param limit: 最多返回的条数
+        """
+        if group_id is not None:
+            key = ("group", group_id)
+        elif user_id is not None:
+            key = ("private", user_id)
+        else:
+            raise ValueError("必须指定 group_id 或 user_id")
+        if limit <= 0:
+            return []
+
+        buffer = self._conversations.get(key, ())
+        messages = list(buffer)[-limit:] if limit < len(buffer) else list(buffer)
+        missing = limit - len(messages)
+        if missing > 0 and self._db is not None:
+            rows = self._db.execute(
+                "SELECT data FROM messages WHERE conversation = ? "
+                "ORDER BY time DESC, rowid DESC LIMIT ?",
+                (f"{key[0]}:{key[1]}", missing)).fetchall()
+            messages = [json.loads(row[0]) for row in reversed(rows)] + messages
+        return messages
+
+    def close(self) -> None:
+        """提交并关闭数据库"""
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> dict:
+        return {
+            "conversations": len(self._conversations),
+            "messages": len(self._by_id),
+            "hits": self.hits,
+            "misses": self.misses,
+            "spilled": self.spilled,
+        }
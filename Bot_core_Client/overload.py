@@ -0,0 +1,126 @@
+"""
+过载检测与按等级降级（可选，传入 Bot(..., overload=OverloadMonitor()) 启用）
+定期测量事件循环延迟与入站队列深度，过载时 PluginManager 跳过低等级的插件，
+压力回落到更低的阈值并保持一段时间后才恢复（滞回），避免在临界点反复切换。
+"""
+import asyncio
+import time
+from typing import Callable, Dict, Optional
+
+from .api.tiers import TIERS
+from .logs import Logger
+
+
+class OverloadMonitor:
+    """
+    过载等级：0 正常，1 跳过 best-effort 插件，2 只运行 critical 插件
+    未声明等级的插件为 normal，等级 2 时同样会被跳过，启用前应为必须运行的插件声明 critical
+
+    压力为 max(循环延迟 / lag_threshold, 队列深度 / depth_threshold)。
+    压力达到 1 进入等级 1，达到 2 进入等级 2；等级 n 在压力低于 n * release 且
+    已持续 hold 秒后才降一级。
+    """
+    def __init__(self, lag_threshold: float = 0.2, depth_threshold: int = 200,
+                 release: float = 0.5, hold: float = 5.0, interval: float = 0.5):
+        """
+        :param lag_threshold: 视为过载的事件循环延迟（秒）
+        :param depth_threshold: 视为过载的入站队列深度
+        :param release: 恢复阈值系数，越小越不容易恢复
+        :param hold: 压力回落后保持多久才降级（秒）
+        :param interval: 采样间隔（秒）
+        """
+        self.lag_threshold = lag_threshold
+        self.depth_threshold = depth_threshold
+        self.release = release
+        self.hold = hold
+        self.interval = interval
+        self.logger = Logger()
+        self.level = 0
+        self.lag = 0.0
+        self.depth = 0
+        self._depth_source: Optional[Callable[[], int]] = None
+        self._calm_since: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._shed: Dict[str, int] = {}  # 本次过载期间跳过的插件 -> 次数
+        self.shed_total = 0
+        self.transitions = 0
+
+    def bind(self, depth_source: Callable[[], int]) -> None:
+        """注册返回当前入站队列深度的函数"""
+        self._depth_source = depth_source
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            # 实际唤醒时间比预期晚多少，即事件循环延迟
+            self.update(loop.time() - start - self.interval,
+                        self._depth_source() if self._depth_source else 0)
+
+    def pressure(self) -> float:
+        return max(self.lag / self.lag_threshold if self.lag_threshold else 0.0,
+                   self.depth / self.depth_threshold if self.depth_threshold else 0.0)
+
+    def update(self, lag: float, depth: int) -> None:
+        """
+        记录一次采样并调整过载等级
+        :param lag: 事件循环延迟（秒）
+        :param depth: 入站队列深度
+        """
+        self.lag = max(lag, 0.0)
+        self.depth = depth
+        pressure = self.pressure()
+        target = 2 if pressure >= 2 else 1 if pressure >= 1 else 0
+        if target > self.level:
+            self._calm_since = None
+            self._set_level(target, pressure)
+        elif self.level and pressure < self.level * self.release:
+            now = time.monotonic()
+            if self._calm_since is None:
+                self._calm_since = now
+            elif now - self._calm_since >= self.hold:
+                self._calm_since = now
+                self._set_level(self.level - 1, pressure)
+        else:
+            self._calm_since = None
+
+    def _set_level(self, level: int, pressure: float) -> None:
+        previous = self.level
+        self.level = level
+        self.transitions += 1
+        if level > previous:
+            self.logger.warning(f"检测到过载（循环延迟 {self.lag:.3f}s，队列深度 {self.depth}），"
+                                f"降级等级 {previous} -> {level}")
+        else:
+            self.logger.info(f"压力回落（{pressure:.2f}），降级等级 {previous} -> {level}")
+        if self._shed:
+            summary = ", ".join(f"{name}: {count}" for name, count in self._shed.items())
+            self.logger.info(f"过载期间跳过的插件调用: {summary}")
+            self._shed.clear()
+
+    def allows(self, tier: str) -> bool:
+        """当前等级下是否运行该等级的插件"""
+        return TIERS.get(tier, 1) <= 2 - self.level
+
+    def record_shed(self, plugin_name: str) -> None:
+        self._shed[plugin_name] = self._shed.get(plugin_name, 0) + 1
+        self.shed_total += 1
+
+    def stats(self) -> dict:
+        return {
+            "level": self.level,
+            "lag": self.lag,
+            "depth": self.depth,
+            "shed": self.shed_total,
+            "transitions": self.transitions,
+        }
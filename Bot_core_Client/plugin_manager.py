@@ -1,10 +1,18 @@
+import asyncio
 import importlib
 import sys
 import inspect
 import os
 from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
 from .logs import Logger
-from .api.client import Message, _plugin_registry
+from .api.client import HANDLED, Message, StopPropagation, _plugin_registry
+from .breaker import CircuitBreaker
+from .concurrency import PluginConcurrency
+from .enablement import EnablementTable
+from .overload import OverloadMonitor
+from .scheduler import _job_registry
+from .state import StateStore
 
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
@@ -20,23 +28,48 @@ class PluginFileHandler(FileSystemEventHandler):
             return
         if event.src_path.endswith(".py"):
             self.logger.info(f"检测到新文件: {event.src_path}")
-            self.plugin_manager.load_plugins()
+            self.plugin_manager.request_reload()
 
     def on_modified(self, event):
         if event.is_directory:
             return
         if event.src_path.endswith(".py"):
             self.logger.info(f"检测到文件修改: {event.src_path}")
-            self.plugin_manager.load_plugins()
+            self.plugin_manager.request_reload()
 
 class PluginManager:
     """动态插件管理器"""
 
-    def __init__(self, plugin_dir: str = "plugins"):
+    def __init__(self, plugin_dir: str = "plugins", state: StateStore = None,
+                 overload: OverloadMonitor = None,
+                 breaker_factory: Callable[[str], CircuitBreaker] = CircuitBreaker,
+                 enablement: EnablementTable = None):
         self.plugin_dir = plugin_dir
         self.plugins = []  # 存储所有加载的插件函数
+        # 插件会话状态，由管理器持有，热重载插件模块时不会丢失
+        self.state = state if state is not None else StateStore()
+        # 按群/私聊的插件开关，运行时修改立即生效
+        self.enablement = enablement if enablement is not None else EnablementTable()
+        # 可选的过载检测，过载时跳过低等级的插件
+        self.overload = overload
+        # 中间件: (pre, post, 插件名集合或 None 表示全局)
+        self._middlewares: List[Tuple[Optional[Callable], Optional[Callable], Optional[frozenset]]] = []
+        # 编译后的调用链，插件列表或中间件变化时重新生成
+        self._pipeline: tuple = ()
+        self._global_pre: tuple = ()
+        self._global_post: tuple = ()
+        self._compiled_for = None
+        self._compiled_len = -1
+        self.jobs = {}  # 本次加载登记的定时任务
+        # 每个插件的熔断器，参数可通过 functools.partial(CircuitBreaker, ...) 调整
+        self.breaker_factory = breaker_factory
+        self.breakers = {}
+        # 每个插件的并发名额，参数不变时跨热重载保留，正在运行的旧插件仍计入上限
+        self.gates = {}
+        self._reload_listeners: List[Callable] = []
         self.logger = Logger()
         self.observer = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None  # start_watching 时所在的事件循环
 
     def load_plugins(self):
         """动态加载所有插件（递归遍历子文件夹）"""
@@ -60,12 +93,13 @@ class PluginManager:
             self._load_plugins_from_project()
             return
 
-        # 清空现有插件列表，重新加载
-        self.plugins = []
+        # 新的插件列表先在局部变量中生成，全部加载后一次替换
+        plugins = []
         self.logger.info("开始重新加载插件...")
 
         # 清空插件注册表
         _plugin_registry.clear()
+        _job_registry.clear()
         
         for plugin_file in plugin_files:
             try:
@@ -93,13 +127,15 @@ class PluginManager:
 
                 if module_plugins:
                     for plugin_name, plugin_func in module_plugins:
-                        self.plugins.append(plugin_func)
+                        plugins.append(plugin_func)
                         self.logger.info(f"成功加载插件 [{plugin_name}] 从模块 {module_name}")
                 # 如果没有使用@plugin装饰器的函数，静默处理，不显示任何信息
 
             except Exception as e:
                 self.logger.error(f"加载插件 {plugin_file} 时发生错误: {e}")
 
+        self._install(plugins)
+        self._publish_jobs()
         self.logger.info(f"插件加载完成，共 {len(self.plugins)} 个处理函数")
 
     def _load_plugins_from_project(self):
@@ -113,12 +149,13 @@ class PluginManager:
             if f.stem != '__init__' and '__pycache__' not in f.parts and 'venv' not in f.parts and '.venv' not in f.parts
         ]
         
-        # 清空现有插件列表，重新加载
-        self.plugins = []
+        # 新的插件列表先在局部变量中生成，全部加载后一次替换
+        plugins = []
         self.logger.info("开始从项目中加载插件...")
         
         # 清空插件注册表
         _plugin_registry.clear()
+        _job_registry.clear()
         
         # 临时保存已导入的模块，避免重复导入
         imported_modules = set()
@@ -154,7 +191,7 @@ class PluginManager:
 
                 if module_plugins:
                     for plugin_name, plugin_func in module_plugins:
-                        self.plugins.append(plugin_func)
+                        plugins.append(plugin_func)
                         self.logger.info(f"成功加载插件 [{plugin_name}] 从模块 {module_name}")
                         
             except Exception as e:
@@ -162,12 +199,38 @@ class PluginManager:
                 self.logger.debug(f"尝试导入模块 {py_file} 时发生错误，已跳过: {e}")
                 continue
         
+        self._install(plugins)
+        self._publish_jobs()
         self.logger.info(f"项目插件加载完成，共 {len(self.plugins)} 个处理函数")
 
+    def _install(self, plugins: list) -> None:
+        """
+        用完整加载的插件列表替换当前列表：先编译调用链再替换，分发时不会看到加载到一半的列表
+        重新加载的插件从正常的熔断状态开始
+        """
+        self.breakers = {}
+        self._compile(plugins)
+        self.plugins = plugins
+
+    def request_reload(self) -> None:
+        """
+        文件监听线程检测到变化时调用：切回事件循环中重新加载，
+        避免分发过程中插件列表、熔断器与并发名额被另一个线程修改
+        """
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.load_plugins)
+        else:
+            self.load_plugins()
+
     def start_watching(self):
-        """开始监听插件目录变化"""
+        """开始监听插件目录变化，在事件循环中调用时热重载在该事件循环中进行"""
         if self.observer:
             return
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
 
         event_handler = PluginFileHandler(self)
         self.observer = Observer()
@@ -192,25 +255,222 @@ class PluginManager:
             self.observer.join()
             self.observer = None
 
+    def add_reload_listener(self, listener: Callable):
+        """
+        注册插件加载完成后的回调，参数为本次加载登记的定时任务
+        在事件循环中开始监听时，热重载与回调都在事件循环中进行，否则在文件监听线程中调用
+        """
+        self._reload_listeners.append(listener)
+
+    def _publish_jobs(self):
+        self.jobs = dict(_job_registry)
+        for listener in self._reload_listeners:
+            try:
+                listener(self.jobs)
+            except Exception as e:
+                self.logger.error(f"插件加载回调执行时发生错误: {e}")
+
+    def add_middleware(self, pre: Optional[Callable] = None, post: Optional[Callable] = None,
+                       plugins: Optional[Iterable[str]] = None):
+        """
+        添加中间件
+        pre(msg, client) 在插件之前调用，返回假值时拦截事件；post(msg, client) 在插件之后调用。
+        两者都可以是普通函数或异步函数，msg 为原始字典。
+        :param pre: 前置钩子
+        :param post: 后置钩子
+        :param plugins: 只作用于这些插件名；为 None 时为全局中间件，每个事件只执行一次，
+                        全局前置钩子拦截的事件不会进入任何插件
+        """
+        if pre is None and post is None:
+            raise ValueError("pre 与 post 至少需要指定一个")
+        scope = frozenset(plugins) if plugins is not None else None
+        self._middlewares.append((pre, post, scope))
+        self._compile()
+
+    @staticmethod
+    def _hook(func: Callable) -> tuple:
+        return (func, inspect.iscoroutinefunction(func))
+
+    def _compile(self, plugins: Optional[list] = None) -> tuple:
+        """
+        将插件与中间件编译为扁平的调用链，每个插件的参数类型与钩子列表只计算一次，
+        并按优先级从高到低排序（相同优先级保持加载顺序）
+        链中每项: (插件函数, 是否传入 Message, 前置钩子, 后置钩子, 插件名, 等级, 冷却/限频限制, 熔断器, 并发名额或 None, 开关位)
+        """
+        if plugins is None:
+            plugins = self.plugins
+        pipeline = []
+        ordered = sorted(plugins, key=lambda func: -getattr(func, "plugin_priority", 0))
+        gates = {}
+        # 开关位、熔断器与并发名额都按插件名区分，同名的插件只保留优先级高（先加载）的一个
+        unique = {}
+        for plugin_func in ordered:
+            name = getattr(plugin_func, "plugin_name", plugin_func.__name__)
+            if name in unique:
+                first = unique[name]
+                self.logger.error(f"插件 {plugin_func.__module__}.{plugin_func.__name__} 与 "
+                                  f"{first.__module__}.{first.__name__} 同名（{name}），已跳过")
+                continue
+            unique[name] = plugin_func
+        # 先交还已移除插件的位序号，新插件可以复用
+        self.enablement.reclaim(unique)
+        for name, plugin_func in unique.items():
+            # 如果第一个参数期望 Message 类型，则传递包装后的对象，否则传递原始字典
+            params = list(inspect.signature(plugin_func).parameters.values())
+            wants_message = len(params) >= 1 and params[0].annotation == Message
+            pre = tuple(self._hook(p) for p, _, scope in self._middlewares
+                        if p is not None and scope is not None and name in scope)
+            post = tuple(self._hook(p) for _, p, scope in self._middlewares
+                         if p is not None and scope is not None and name in scope)
+            gate = None
+            concurrency = getattr(plugin_func, "plugin_concurrency", None)
+            if concurrency:
+                gate = self.gates.get(name)
+                if gate is None or gate.config != concurrency:
+                    gate = PluginConcurrency(name, *concurrency)
+                gates[name] = gate
+            pipeline.append((plugin_func, wants_message, pre, post, name,
+                             getattr(plugin_func, "plugin_tier", "normal"),
+                             getattr(plugin_func, "plugin_limits", ()),
+                             self.breakers.get(name) or self.breakers.setdefault(
+                                 name, self.breaker_factory(name)), gate,
+                             1 << self.enablement.slot(name)))
+        self._global_pre = tuple(self._hook(p) for p, _, scope in self._middlewares
+                                 if p is not None and scope is None)
+        self._global_post = tuple(self._hook(p) for _, p, scope in self._middlewares
+                                  if p is not None and scope is None)
+        self._pipeline = tuple(pipeline)
+        self.gates = gates
+        self._compiled_for = plugins
+        self._compiled_len = len(plugins)
+        return self._pipeline
+
+    async def _run_hooks(self, hooks: tuple, msg: dict, client) -> bool:
+        """依次执行钩子，任一前置钩子返回假值或出错时返回 False"""
+        for hook, is_async in hooks:
+            try:
+                result = hook(msg, client)
+                if is_async:
+                    result = await result
+            except Exception as e:
+                self.logger.error(f"中间件 {getattr(hook, '__name__', hook)} 执行时发生错误: {e}")
+                return False
+            if not result:
+                return False
+        return True
+
+    async def _run_post(self, hooks: tuple, msg: dict, client) -> None:
+        for hook, is_async in hooks:
+            try:
+                result = hook(msg, client)
+                if is_async:
+                    await result
+            except Exception as e:
+                self.logger.error(f"中间件 {getattr(hook, '__name__', hook)} 执行时发生错误: {e}")
+
+    def _check_limits(self, limits: tuple, name: str, msg: dict):
+        """
+        检查 @cooldown / @throttle 限制，未受限时立即计为一次使用，
+        避免并发到达的事件在任何一个记录使用之前全部通过检查；未指定 when 的限制只作用于消息事件
+        :return: 受限时返回 None，否则返回已计数的 (限制, 键) 列表
+        """
+        counted = []
+        for limit in limits:
+            if limit.when is None:
+                # 心跳、通知等事件既不受限也不计数
+                if msg.get("post_type") != "message":
+                    continue
+            else:
+                try:
+                    if not limit.when(msg):
+                        continue
+                except Exception as e:
+                    self.logger.error(f"插件 {name} 的限制条件执行时发生错误: {e}")
+                    continue
+            key = limit.key(name, msg)
+            if not limit.allowed(key):
+                # 已计数的其他限制不算这次使用
+                for counted_limit, counted_key in counted:
+                    counted_limit.refund(counted_key)
+                return None
+            limit.hit(key)
+            counted.append((limit, key))
+        return counted
+
     async def process_message(self, msg: dict, client):
-        """处理消息，调用所有注册的插件函数"""
+        """处理消息，按编译好的调用链调用所有注册的插件函数"""
+        pipeline = self._pipeline
+        if self._compiled_for is not self.plugins or self._compiled_len != len(self.plugins):
+            pipeline = self._compile()
+        if self._global_pre and not await self._run_hooks(self._global_pre, msg, client):
+            return
         # 将字典消息包装成 Message 对象
         message_obj = Message(msg)
-        for plugin_func in self.plugins:
+        overload = self.overload
+        disabled = self.enablement.mask(msg)
+        for plugin_func, wants_message, pre, post, name, tier, limits, breaker, gate, bit in pipeline:
+            if disabled & bit:
+                self.enablement.skipped += 1
+                continue
+            if overload is not None and overload.level and not overload.allows(tier):
+                overload.record_shed(name)
+                continue
+            if pre and not await self._run_hooks(pre, msg, client):
+                continue
+            # 熔断中的插件不消耗限制次数，也不占用并发名额
+            if not breaker.allow():
+                continue
+            counted = None
+            if limits:
+                counted = self._check_limits(limits, name, msg)
+                if counted is None:
+                    breaker.release()
+                    continue
+            if gate is not None:
+                gate_key = gate.key(msg)
+                if not await gate.acquire(gate_key):
+                    # 被丢弃或被更新的事件替代，没有调用插件，不消耗限制次数
+                    for limit, key in counted or ():
+                        limit.refund(key)
+                    breaker.release()
+                    continue
+            handled = False
+            used = False  # 插件是否处理了事件（返回真值、HANDLED 或 StopPropagation）
             try:
-                # 检查函数签名以确定传递哪种类型的参数
-                sig = inspect.signature(plugin_func)
-                params = list(sig.parameters.values())
-
-                # 如果第一个参数期望 Message 类型，则传递包装后的对象
-                if (len(params) >= 1 and
-                    params[0].annotation == Message):
-                    await plugin_func(message_obj, client)
-                else:
-                    # 否则传递原始字典
-                    await plugin_func(msg, client)
+                result = await plugin_func(message_obj if wants_message else msg, client)
+                breaker.record_success()
+                used = bool(result)
+                handled = result is HANDLED
+            except StopPropagation:
+                breaker.record_success()
+                used = handled = True
             except Exception as e:
+                breaker.record_failure()
                 self.logger.error(f"插件 {plugin_func.__name__} 处理消息时发生错误: {e}")
+            finally:
+                if gate is not None:
+                    gate.release(gate_key)
+            if counted and not used:
+                # 插件忽略了该事件，退回未指定 when 的限制计数；指定了 when 的限制按条件计数
+                for limit, key in counted:
+                    if limit.when is None:
+                        limit.refund(key)
+            if post:
+                await self._run_post(post, msg, client)
+            if handled:
+                # 事件已处理，优先级更低的插件不再执行
+                break
+        if self._global_post:
+            await self._run_post(self._global_post, msg, client)
+
+    def stats(self) -> dict:
+        """插件数、各插件的熔断状态、并发限制计数与开关表"""
+        return {
+            "plugins": len(self.plugins),
+            "breakers": {name: breaker.stats() for name, breaker in self.breakers.items()},
+            "concurrency": {name: gate.stats() for name, gate in self.gates.items()},
+            "enablement": self.enablement.stats(),
+        }
 
     def get_plugin_count(self):
         """获取已加载的插件函数数量"""
@@ -0,0 +1,205 @@
+"""
+入站消息限流
+在分发给插件之前按用户与按群进行令牌桶限流，超出速率的消息按策略处理：
+drop 直接丢弃，sample 每 N 条放行一条，merge 将一段时间内的消息合并为一个事件再分发。
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .logs import Logger
+
+POLICIES = ("drop", "sample", "merge")
+
+
+class TokenBucket:
+    """令牌桶，rate 为每秒补充的令牌数，burst 为桶容量"""
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, now: float) -> float:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+
+class InboundLimiter:
+    """
+    按用户（群内为 群+用户）与按群的入站消息限流
+
+    只限制 post_type 为 message 的事件，通知、请求与元事件不受影响。
+    merge 策略下，超出速率的消息先按会话与发送者缓存，发送者停止刷屏 merge_window 秒后
+    （最迟 max_merge_delay 秒）合并为一个事件，通过 bind() 注册的函数分发。
+    """
+    def __init__(self, user_rate: float = 1.0, user_burst: int = 5,
+                 group_rate: float = 10.0, group_burst: int = 30,
+                 policy: str = "drop", sample_every: int = 10,
+                 merge_window: float = 2.0, max_merge_delay: float = 10.0,
+                 max_buckets: int = 10000):
+        """
+        :param user_rate: 每个用户每秒允许的消息数
+        :param user_burst: 每个用户允许的突发消息数
+        :param group_rate: 每个群每秒允许的消息数，None 表示不限制
+        :param group_burst: 每个群允许的突发消息数
+        :param policy: 超出速率时的处理策略，drop / sample / merge
+        :param sample_every: sample 策略下每多少条超出的消息放行一条
+        :param merge_window: merge 策略下发送者停止发言多少秒后分发合并事件
+        :param max_merge_delay: merge 策略下合并事件的最长等待时间（秒）
+        :param max_buckets: 令牌桶数量上限，超出时淘汰最久未使用的桶
+        """
+        if policy not in POLICIES:
+            raise ValueError(f"未知的限流策略: {policy}，可选 {POLICIES}")
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.policy = policy
+        self.sample_every = sample_every
+        self.merge_window = merge_window
+        self.max_merge_delay = max_merge_delay
+        self.max_buckets = max_buckets
+        self.logger = Logger()
+
+        self._buckets: "OrderedDict[tuple, TokenBucket]" = OrderedDict()
+        self._excess: Dict[tuple, int] = {}  # sample 策略的超出计数
+        # merge 策略的缓存: (群号, 用户ID) -> [事件列表, 首条时间, 定时器]
+        self._merging: Dict[Tuple[int, int], list] = {}
+        self._dispatch: Optional[Callable[[dict], None]] = None
+        self.checked = 0
+        self.passed = 0
+        self.dropped = 0
+        self.sampled = 0
+        self.merged = 0
+        self.merged_events = 0
+
+    def bind(self, dispatch: Callable[[dict], None]) -> None:
+        """注册 merge 策略下分发合并事件的函数"""
+        self._dispatch = dispatch
+
+    def _bucket(self, key: tuple, rate: float, burst: float, now: float) -> TokenBucket:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(rate, burst, now)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.refill(now)
+        return bucket
+
+    def admit(self, event: dict) -> bool:
+        """
+        检查事件是否可以立即分发
+        :param event: 原始事件字典
+        :return: True 表示立即分发；False 表示已被丢弃或进入合并缓存
+        """
+        if event.get("post_type") != "message":
+            return True
+        self.checked += 1
+        now = time.monotonic()
+        group_id = event.get("group_id") or 0
+        user_key = (group_id, event.get("user_id") or 0)
+
+        if user_key in self._merging:
+            # 刷屏仍在继续，后续消息都并入同一个合并事件
+            self._merge(user_key, event)
+            return False
+
+        user = self._bucket(("user",) + user_key, self.user_rate, self.user_burst, now)
+        group = None
+        if group_id and self.group_rate is not None:
+            group = self._bucket(("group", group_id), self.group_rate, self.group_burst, now)
+
+        if user.tokens >= 1 and (group is None or group.tokens >= 1):
+            user.tokens -= 1
+            if group is not None:
+                group.tokens -= 1
+            self.passed += 1
+            return True
+        return self._on_excess(user_key, event)
+
+    def _on_excess(self, user_key: Tuple[int, int], event: dict) -> bool:
+        if self.policy == "sample":
+            count = self._excess.get(user_key, 0) + 1
+            if count >= self.sample_every:
+                self._excess.pop(user_key, None)
+                self.sampled += 1
+                return True
+            self._excess[user_key] = count
+            self.dropped += 1
+            return False
+        if self.policy == "merge" and self._dispatch is not None:
+            self._merge(user_key, event)
+            return False
+        self.dropped += 1
+        return False
+
+    def _merge(self, user_key: Tuple[int, int], event: dict) -> None:
+        loop = asyncio.get_running_loop()
+        entry = self._merging.get(user_key)
+        if entry is None:
+            entry = self._merging[user_key] = [[], loop.time(), None]
+        else:
+            entry[2].cancel()
+        entry[0].append(event)
+        self.merged += 1
+        # 发送者每发一条就推迟分发，但不超过首条消息之后 max_merge_delay 秒
+        delay = min(self.merge_window, entry[1] + self.max_merge_delay - loop.time())
+        entry[2] = loop.call_later(max(delay, 0), self._emit, user_key)
+
+    def _emit(self, user_key: Tuple[int, int]) -> None:
+        entry = self._merging.pop(user_key, None)
+        if entry is None:
+            return
+        merged = self.merge_events(entry[0])
+        self.merged_events += 1
+        self.logger.info(f"合并 {len(entry[0])} 条刷屏消息后分发, 群号: {user_key[0] or '私聊'}, "
+                         f"用户: {user_key[1]}")
+        try:
+            self._dispatch(merged)
+        except Exception as e:
+            self.logger.error(f"分发合并消息时发生错误: {e}")
+
+    @staticmethod
+    def merge_events(events: List[dict]) -> dict:
+        """
+        将同一发送者的多条消息合并为一个事件
+        以最后一条为基础，message 与 raw_message 依次拼接，并附加 merged_count 与 merged_message_ids
+        """
+        merged = dict(events[-1])
+        if all(isinstance(e.get("message"), list) for e in events):
+            segments = []
+            for index, e in enumerate(events):
+                if index:
+                    segments.append({"type": "text", "data": {"text": "\n"}})
+                segments.extend(e["message"])
+            merged["message"] = segments
+        else:
+            merged["message"] = "\n".join(str(e.get("message", "")) for e in events)
+        merged["raw_message"] = "\n".join(e.get("raw_message", "") for e in events)
+        merged["merged_count"] = len(events)
+        merged["merged_message_ids"] = [e.get("message_id") for e in events]
+        return merged
+
+    def flush(self) -> None:
+        """立即分发所有缓存的合并事件"""
+        for user_key in list(self._merging):
+            self._merging[user_key][2].cancel()
+            self._emit(user_key)
+
+    def stats(self) -> dict:
+        return {
+            "checked": self.checked,
+            "passed": self.passed,
+            "dropped": self.dropped,
+            "sampled": self.sampled,
+            "merged": self.merged,
+            "merged_events": self.merged_events,
+            "buckets": len(self._buckets),
+        }
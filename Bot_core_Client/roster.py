@@ -0,0 +1,221 @@
+"""
+群成员名册
+一次性拉取所有群的成员列表，按列存储（整数数组 + 驻留字符串），不保留原始字典，
+数百个群、每群数千成员时内存占用远小于缓存 get_group_member_list 的返回值。
+按 (群号, 用户ID) 查找为 O(1)，并根据接收循环中的成员通知事件增量更新。
+"""
+import asyncio
+import sys
+from array import array
+from typing import Dict, Iterator, List, Optional
+
+from .logs import Logger
+
+ROLES = ("member", "admin", "owner")
+_ROLE_CODES = {name: code for code, name in enumerate(ROLES)}
+
+
+class GroupRoster:
+    """单个群的成员列，删除成员时用最后一行填补空位"""
+    __slots__ = ("user_ids", "roles", "join_times", "cards", "nicknames", "index")
+
+    def __init__(self):
+        self.user_ids = array("q")
+        self.roles = array("b")
+        self.join_times = array("q")
+        self.cards: List[str] = []
+        self.nicknames: List[str] = []
+        self.index: Dict[int, int] = {}  # user_id -> 行号
+
+    def upsert(self, user_id: int, role: str = "member", join_time: int = 0,
+               card: str = "", nickname: str = "") -> None:
+        code = _ROLE_CODES.get(role, 0)
+        card = sys.intern(card or "")
+        nickname = sys.intern(nickname or "")
+        row = self.index.get(user_id)
+        if row is None:
+            self.index[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            self.roles.append(code)
+            self.join_times.append(join_time)
+            self.cards.append(card)
+            self.nicknames.append(nickname)
+        else:
+            self.roles[row] = code
+            self.join_times[row] = join_time or self.join_times[row]
+            self.cards[row] = card
+            self.nicknames[row] = nickname or self.nicknames[row]
+
+    def remove(self, user_id: int) -> bool:
+        row = self.index.pop(user_id, None)
+        if row is None:
+            return False
+        last = len(self.user_ids) - 1
+        if row != last:
+            moved = self.user_ids[last]
+            self.user_ids[row] = moved
+            self.roles[row] = self.roles[last]
+            self.join_times[row] = self.join_times[last]
+            self.cards[row] = self.cards[last]
+            self.nicknames[row] = self.nicknames[last]
+            self.index[moved] = row
+        self.user_ids.pop()
+        self.roles.pop()
+        self.join_times.pop()
+        self.cards.pop()
+        self.nicknames.pop()
+        return True
+
+    def row(self, row: int) -> dict:
+        return {
+            "user_id": self.user_ids[row],
+            "role": ROLES[self.roles[row]],
+            "join_time": self.join_times[row],
+            "card": self.cards[row],
+            "nickname": self.nicknames[row],
+        }
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+
+class Roster:
+    """所有群的成员名册"""
+
+    def __init__(self, concurrency: int = 4):
+        """
+        :param concurrency: 刷新时同时进行的 get_group_member_list 请求数
+        """
+        self.concurrency = concurrency
+        self.logger = Logger()
+        self._groups: Dict[int, GroupRoster] = {}
+        self.refreshed = 0
+        self.failed = 0
+        self.updates = 0
+
+    async def refresh(self, client, group_ids: Optional[List[int]] = None) -> int:
+        """
+        拉取群成员列表并替换对应群的名册
+        :param client: BotClient 实例
+        :param group_ids: 要刷新的群号，默认为机器人加入的全部群
+        :return: 成功刷新的群数
+        """
+        if group_ids is None:
+            groups = await client.get_group_list(no_cache=True)
+            if groups is None:
+                self.logger.error("获取群列表失败，名册未刷新")
+                return 0
+            group_ids = [group["group_id"] for group in groups]
+            # 已退出的群
+            for group_id in set(self._groups) - set(group_ids):
+                del self._groups[group_id]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(group_id: int) -> bool:
+            async with semaphore:
+                members = await client.get_group_member_list(group_id)
+            if members is None:
+                self.failed += 1
+                self.logger.warning(f"获取群 {group_id} 成员列表失败")
+                return False
+            roster = GroupRoster()
+            for member in members:
+                roster.upsert(member["user_id"], member.get("role", "member"),
+                              member.get("join_time", 0), member.get("card", ""),
+                              member.get("nickname", ""))
+            self._groups[group_id] = roster
+            return True
+
+        results = await asyncio.gather(*(fetch(group_id) for group_id in group_ids))
+        count = sum(results)
+        self.refreshed += count
+        self.logger.info(f"成员名册已刷新 {count}/{len(group_ids)} 个群，"
+                         f"共 {self.member_count()} 名成员")
+        return count
+
+    def get(self, group_id: int, user_id: int) -> Optional[dict]:
+        """
+        查找群成员
+        :return: {"user_id", "role", "join_time", "card", "nickname"}，不在名册中返回 None
+        """
+        roster = self._groups.get(group_id)
+        if roster is None:
+            return None
+        row = roster.index.get(user_id)
+        return None if row is None else roster.row(row)
+
+    def role(self, group_id: int, user_id: int) -> Optional[str]:
+        """群成员的角色（owner / admin / member），不在名册中返回 None"""
+        roster = self._groups.get(group_id)
+        if roster is None:
+            return None
+        row = roster.index.get(user_id)
+        return None if row is None else ROLES[roster.roles[row]]
+
+    def contains(self, group_id: int, user_id: int) -> bool:
+        roster = self._groups.get(group_id)
+        return roster is not None and user_id in roster.index
+
+    def members(self, group_id: int) -> Iterator[dict]:
+        """遍历群内全部成员"""
+        roster = self._groups.get(group_id)
+        if roster is None:
+            return
+        for row in range(len(roster)):
+            yield roster.row(row)
+
+    def groups(self) -> List[int]:
+        return list(self._groups)
+
+    def member_count(self, group_id: Optional[int] = None) -> int:
+        if group_id is not None:
+            roster = self._groups.get(group_id)
+            return len(roster) if roster is not None else 0
+        return sum(len(roster) for roster in self._groups.values())
+
+    def on_event(self, event: dict) -> None:
+        """
+        根据成员通知事件增量更新，由接收循环对每个事件调用
+        只更新已在名册中的群；机器人自身进群后需要 refresh 该群
+        :param event: 原始事件字典
+        """
+        if event.get("post_type") != "notice":
+            return
+        notice_type = event.get("notice_type")
+        roster = self._groups.get(event.get("group_id"))
+        user_id = event.get("user_id")
+
+        if notice_type == "group_decrease" and user_id == event.get("self_id"):
+            self._groups.pop(event.get("group_id"), None)
+            self.updates += 1
+            return
+        if roster is None or user_id is None:
+            return
+
+        if notice_type == "group_increase":
+            roster.upsert(user_id, "member", event.get("time", 0))
+        elif notice_type == "group_decrease":
+            roster.remove(user_id)
+        elif notice_type == "group_admin":
+            row = roster.index.get(user_id)
+            if row is None:
+                return
+            roster.roles[row] = _ROLE_CODES["admin" if event.get("sub_type") == "set" else "member"]
+        elif notice_type == "group_card":
+            row = roster.index.get(user_id)
+            if row is None:
+                return
+            roster.cards[row] = sys.intern(event.get("card_new") or "")
+        else:
+            return
+        self.updates += 1
+
+    def stats(self) -> dict:
+        return {
+            "groups": len(self._groups),
+            "members": self.member_count(),
+            "refreshed": self.refreshed,
+            "failed": self.failed,
+            "updates": self.updates,
+        }
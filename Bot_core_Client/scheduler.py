@@ -0,0 +1,275 @@
+"""
+定时任务
+插件用 @scheduled(cron=...) 或 @scheduled(every=...) 声明定时任务，不再在导入时自行启动
+while True 循环。所有任务由 Bot 中的一个调度器管理，共用一个截止时间堆；
+插件热重载时任务会被取消并按新代码重新登记。
+"""
+import asyncio
+import heapq
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set
+
+from .logs import Logger
+
+# 定时任务注册表，加载插件时清空并由 @scheduled 重新填充
+_job_registry: Dict[str, "Job"] = {}
+
+MISFIRE_POLICIES = ("run_once", "skip")
+
+
+class CronExpr:
+    """
+    五段式 cron 表达式：分 时 日 月 周（本地时间）
+    每段支持 *、数字、逗号列表、a-b 范围与 /n 步长；周的 0 和 7 都表示周日。
+    日与周都不是 * 时，满足其一即可（与 crontab 相同）。
+    """
+    _RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron 表达式需要 5 段: {expr!r}")
+        self.expr = expr
+        parsed = [self._parse(field, low, high) for field, (low, high) in zip(fields, self._RANGES)]
+        self.minutes, self.hours, self.days, self.months, weekdays = parsed
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    @staticmethod
+    def _parse(field: str, low: int, high: int) -> Set[int]:
+        values = set()
+        for part in field.split(","):
+            step = 1
+            if "/" in part:
+                part, step_text = part.split("/", 1)
+                step = int(step_text)
+            if part == "*":
+                start, end = low, high
+            elif "-" in part:
+                start, end = (int(x) for x in part.split("-", 1))
+            else:
+                start = int(part)
+                end = high if step > 1 else start
+            if start < low or end > high or start > end or step < 1:
+                raise ValueError(f"cron 字段超出范围: {field!r}")
+            values.update(range(start, end + 1, step))
+        return values
+
+    def _day_matches(self, moment: datetime) -> bool:
+        day_ok = moment.day in self.days
+        # datetime.weekday(): 周一为 0；cron: 周日为 0
+        weekday_ok = (moment.weekday() + 1) % 7 in self.weekdays
+        if self._any_day:
+            return weekday_ok
+        if self._any_weekday:
+            return day_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, moment: datetime) -> datetime:
+        """moment 之后的下一次触发时间"""
+        t = moment.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 5)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+            elif t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+            elif t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+            else:
+                return t
+        raise ValueError(f"cron 表达式没有可触发的时间: {self.expr!r}")
+
+
+class Job:
+    """一个定时任务的配置与运行状态"""
+
+    def __init__(self, name: str, func: Callable, cron: Optional[str], every: Optional[float],
+                 jitter: float, misfire: str, misfire_grace: float, max_instances: int):
+        self.name = name
+        self.func = func
+        self.cron = CronExpr(cron) if cron else None
+        self.every = every
+        self.jitter = jitter
+        self.misfire = misfire
+        self.misfire_grace = misfire_grace
+        self.max_instances = max_instances
+        self.next_run: Optional[float] = None  # 时间戳
+        self.tasks: Set[asyncio.Task] = set()
+        self.runs = 0
+        self.skipped = 0
+        self.failures = 0
+
+    @property
+    def schedule_key(self) -> tuple:
+        """调度参数，热重载前后相同时保留原来的下次运行时间"""
+        return (self.cron.expr if self.cron else None, self.every)
+
+    def compute_next(self, after: float) -> float:
+        if self.cron is not None:
+            base = self.cron.next_after(datetime.fromtimestamp(after)).timestamp()
+        else:
+            base = after + self.every
+        return base + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+
+def scheduled(cron: Optional[str] = None, every: Optional[float] = None, name: Optional[str] = None,
+              jitter: float = 0.0, misfire: str = "run_once", misfire_grace: float = 60.0,
+              max_instances: int = 1):
+    """
+    定时任务装饰器，被装饰的异步函数以 BotClient 为唯一参数
+    :param cron: cron 表达式（分 时 日 月 周），与 every 二选一
+    :param every: 运行间隔（秒）
+    :param name: 任务名，默认为 模块名.函数名
+    :param jitter: 每次运行时间随机推迟 0 ~ jitter 秒，避免多个任务同时触发
+    :param misfire: 错过运行时间超过 misfire_grace 秒时的处理：run_once 补运行一次，skip 跳过
+    :param misfire_grace: 允许的延迟（秒）
+    :param max_instances: 同一任务同时运行的实例上限，达到上限时本次运行被跳过
+    """
+    if (cron is None) == (every is None):
+        raise ValueError("cron 与 every 必须且只能指定一个")
+    if every is not None and every <= 0:
+        raise ValueError("every 必须大于 0")
+    if misfire not in MISFIRE_POLICIES:
+        raise ValueError(f"未知的 misfire 策略: {misfire}，可选 {MISFIRE_POLICIES}")
+
+    def decorator(func):
+        job_name = name or f"{func.__module__}.{func.__qualname__}"
+        _job_registry[job_name] = Job(job_name, func, cron, every, jitter, misfire,
+                                      misfire_grace, max_instances)
+        func.job_name = job_name
+        return func
+
+    return decorator
+
+
+class Scheduler:
+    """所有定时任务共用的调度器：一个截止时间堆与一个计时任务"""
+
+    def __init__(self, max_concurrency: int = 4):
+        """
+        :param max_concurrency: 所有任务同时运行的上限
+        """
+        self.max_concurrency = max_concurrency
+        self.logger = Logger()
+        self.jobs: Dict[str, Job] = {}
+        self._heap: List[tuple] = []  # (运行时间, 序号, 任务名)
+        self._seq = itertools.count()
+        self._client = None
+        self._timer: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def start(self, client) -> None:
+        """启动调度器，任务运行时传入 client"""
+        self._client = client
+        self._wakeup = asyncio.Event()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        if self._timer is None or self._timer.done():
+            self._timer = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        for job in self.jobs.values():
+            for task in list(job.tasks):
+                task.cancel()
+
+    def sync(self, jobs: Dict[str, Job]) -> None:
+        """
+        用新加载的任务替换当前任务（插件加载后调用）
+        旧任务正在运行的实例被取消；调度参数未变的任务保留原来的下次运行时间
+        """
+        now = time.time()
+        old_jobs = self.jobs
+        self.jobs = {}
+        for job_name, job in jobs.items():
+            old = old_jobs.pop(job_name, None)
+            if old is not None:
+                for task in list(old.tasks):
+                    task.cancel()
+                if old.schedule_key == job.schedule_key and old.next_run is not None:
+                    job.next_run = old.next_run
+            if job.next_run is None:
+                job.next_run = job.compute_next(now)
+            self.jobs[job_name] = job
+            heapq.heappush(self._heap, (job.next_run, next(self._seq), job_name))
+        for old in old_jobs.values():
+            for task in list(old.tasks):
+                task.cancel()
+            self.logger.info(f"定时任务 [{old.name}] 已移除")
+        # 堆中属于旧任务的条目在弹出时被跳过，条目过多时重建
+        if len(self._heap) > 4 * len(self.jobs) + 64:
+            self._heap = [(job.next_run, next(self._seq), job.name) for job in self.jobs.values()]
+            heapq.heapify(self._heap)
+        self.logger.info(f"已登记 {len(self.jobs)} 个定时任务")
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            deadline, _, job_name = self._heap[0]
+            job = self.jobs.get(job_name)
+            if job is None or job.next_run != deadline:
+                # 任务已被替换或移除
+                heapq.heappop(self._heap)
+                continue
+            delay = deadline - time.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    # 新登记的任务可能更早，被唤醒后重新检查堆顶
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            self._fire(job, deadline)
+
+    def _fire(self, job: Job, deadline: float) -> None:
+        now = time.time()
+        late = now - deadline
+        if late > job.misfire_grace and job.misfire == "skip":
+            job.skipped += 1
+            self.logger.warning(f"定时任务 [{job.name}] 错过运行时间 {late:.0f} 秒，已跳过")
+        elif len(job.tasks) >= job.max_instances:
+            job.skipped += 1
+            self.logger.warning(f"定时任务 [{job.name}] 上一次运行尚未结束，本次跳过")
+        else:
+            task = asyncio.ensure_future(self._execute(job))
+            job.tasks.add(task)
+            task.add_done_callback(job.tasks.discard)
+        # 下一次运行从当前时间往后计算，错过的多次运行不会连续补跑
+        job.next_run = job.compute_next(max(now, deadline))
+        heapq.heappush(self._heap, (job.next_run, next(self._seq), job.name))
+
+    async def _execute(self, job: Job) -> None:
+        async with self._slots:
+            job.runs += 1
+            try:
+                await job.func(self._client)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.failures += 1
+                self.logger.error(f"定时任务 [{job.name}] 执行时发生错误: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "jobs": len(self.jobs),
+            "running": sum(len(job.tasks) for job in self.jobs.values()),
+            "runs": sum(job.runs for job in self.jobs.values()),
+            "skipped": sum(job.skipped for job in self.jobs.values()),
+            "failures": sum(job.failures for job in self.jobs.values()),
+        }
@@ -0,0 +1,298 @@
+"""
+插件会话状态存储
+多步交互插件（问答、报名流程等）按 (插件, 群, 用户) 保存状态，代替模块级字典。
+存储由 PluginManager 持有，插件热重载不会清空；条目按 TTL 与 LRU 淘汰并统计内存占用，
+可选地以批量事务写回 sqlite，进程重启后仍可读取。
+"""
+import asyncio
+import json
+import sqlite3
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from .logs import Logger
+
+StateKey = Tuple[str, int, int]  # (插件名, 群号, 用户ID)，私聊群号为 0，群级状态用户ID为 0
+
+_DELETED = object()  # 写回队列中表示删除的标记
+
+
+def _sizeof(value: Any) -> int:
+    """
+    粗略估算值的内存占用（字节），只计算值本身与容器的直接元素，不做序列化，
+    多步插件每次 set 都会调用；启用持久化时在写回时按 JSON 长度校正
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += sys.getsizeof(k) + sys.getsizeof(v)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += sys.getsizeof(item)
+    return size
+
+
+class StateStore:
+    """
+    (插件, 群, 用户) -> 状态值
+
+    值在写入 sqlite 时以 JSON 保存，启用持久化时只应存放可 JSON 序列化的值。
+    读取到的是存储中的对象本身，修改后需要再次 set 才会刷新过期时间并写回。
+    """
+    def __init__(self, ttl: float = 3600.0, max_entries: int = 100000,
+                 max_bytes: int = 64 * 1024 * 1024, sqlite_path: Optional[str] = None,
+                 flush_interval: float = 1.0, batch_size: int = 500,
+                 purge_interval: float = 60.0):
+        """
+        :param ttl: 默认存活时间（秒）
+        :param max_entries: 内存中的条目上限，超出时淘汰最久未使用的条目
+        :param max_bytes: 内存中状态值的估算总大小上限（字节）
+        :param sqlite_path: 可选，持久化的 sqlite 文件路径
+        :param flush_interval: 写回 sqlite 的最长间隔（秒）
+        :param batch_size: 累计多少次修改后立即写回
+        :param purge_interval: 扫描清理内存中过期条目的间隔（秒）
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.purge_interval = purge_interval
+        self.logger = Logger()
+        # key -> (过期时间, 值, 估算大小)，过期时间为 time.time()，与数据库一致
+        self._entries: "OrderedDict[StateKey, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._dirty: Dict[StateKey, tuple] = {}  # 待写回: key -> (过期时间, 值) 或 (0, _DELETED)
+        self._last_flush = self._last_purge = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+        self._task: Optional[asyncio.Task] = None
+
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plugin_state ("
+                "plugin TEXT NOT NULL, group_id INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+                "expire_at REAL NOT NULL, data TEXT NOT NULL, "
+                "PRIMARY KEY (plugin, group_id, user_id))")
+            self._db.execute("DELETE FROM plugin_state WHERE expire_at < ?", (time.time(),))
+            self._db.commit()
+
+    @staticmethod
+    def make_key(plugin: str, group_id: Optional[int] = None, user_id: Optional[int] = None) -> StateKey:
+        return (plugin, group_id or 0, user_id or 0)
+
+    def get(self, plugin: str, group_id: Optional[int] = None, user_id: Optional[int] = None,
+            default: Any = None) -> Any:
+        """
+        读取状态
+        :param plugin: 插件名（通常为 @plugin 的名称）
+        :param group_id: 群号，私聊为 None
+        :param user_id: 用户ID，群级状态为 None
+        :param default: 不存在或已过期时的返回值
+        """
+        key = self.make_key(plugin, group_id, user_id)
+        item = self._entries.get(key)
+        if item is None and self._db is not None:
+            item = self._load(key)
+        if item is None:
+            self.misses += 1
+            return default
+        if item[0] < time.time():
+            self._discard(key)
+            self.expired += 1
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return item[1]
+
+    def set(self, plugin: str, group_id: Optional[int] = None, user_id: Optional[int] = None,
+            value: Any = None, ttl: Optional[float] = None) -> None:
+        """
+        写入状态，并刷新过期时间
+        :param value: 状态值
+        :param ttl: 本条目的存活时间（秒），默认使用构造时的 ttl
+        """
+        key = self.make_key(plugin, group_id, user_id)
+        expire_at = time.time() + (self.ttl if ttl is None else ttl)
+        size = _sizeof(value)
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._entries[key] = (expire_at, value, size)
+        self._bytes += size
+        self._mark_dirty(key, (expire_at, value))
+        self._evict()
+        self._maintain()
+
+    def pop(self, plugin: str, group_id: Optional[int] = None, user_id: Optional[int] = None,
+            default: Any = None) -> Any:
+        """删除并返回状态"""
+        value = self.get(plugin, group_id, user_id, _DELETED)
+        if value is _DELETED:
+            return default
+        self._discard(self.make_key(plugin, group_id, user_id))
+        self._maintain()
+        return value
+
+    def clear_plugin(self, plugin: str) -> int:
+        """
+        删除某个插件的全部状态
+        :return: 删除的内存条目数
+        """
+        keys = [key for key in self._entries if key[0] == plugin]
+        for key in keys:
+            self._discard(key)
+        for key in [key for key in self._dirty if key[0] == plugin]:
+            del self._dirty[key]
+        if self._db is not None:
+            self._db.execute("DELETE FROM plugin_state WHERE plugin = ?", (plugin,))
+            self._db.commit()
+        return len(keys)
+
+    def _load(self, key: StateKey) -> Optional[tuple]:
+        """从写回队列或数据库载入被淘汰出内存的条目"""
+        pending = self._dirty.get(key)
+        if pending is not None:
+            if pending[1] is _DELETED:
+                return None
+            expire_at, value = pending
+        else:
+            row = self._db.execute(
+                "SELECT expire_at, data FROM plugin_state "
+                "WHERE plugin = ? AND group_id = ? AND user_id = ?", key).fetchone()
+            if row is None:
+                return None
+            return self._remember(key, (row[0], json.loads(row[1]), len(row[1])))
+        return self._remember(key, (expire_at, value, _sizeof(value)))
+
+    def _remember(self, key: StateKey, item: tuple) -> tuple:
+        self._entries[key] = item
+        self._bytes += item[2]
+        self._evict()
+        return item
+
+    def _discard(self, key: StateKey) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= old[2]
+        self._mark_dirty(key, (0, _DELETED))
+
+    def _mark_dirty(self, key: StateKey, item: tuple) -> None:
+        if self._db is not None:
+            self._dirty[key] = item
+
+    def start(self) -> None:
+        """启动定时写回与过期清理，保证修改最迟 flush_interval 秒后写入数据库（由 Bot.run 调用）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                if self._dirty:
+                    self.flush()
+                if time.monotonic() - self._last_purge >= self.purge_interval:
+                    self.purge_expired()
+            except Exception as e:
+                self.logger.error(f"定时写回插件状态时发生错误: {e}")
+
+    def _maintain(self) -> None:
+        """在写入时顺带执行批量写回与过期清理，修改较多时不必等待定时写回"""
+        now = time.monotonic()
+        if self._dirty and (len(self._dirty) >= self.batch_size
+                            or now - self._last_flush >= self.flush_interval):
+            self.flush()
+        if now - self._last_purge >= self.purge_interval:
+            self.purge_expired()
+
+    def _evict(self) -> None:
+        """超出数量或大小上限时淘汰最久未使用的条目，持久化的条目仍保留在数据库中"""
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            _, old = self._entries.popitem(last=False)
+            self._bytes -= old[2]
+            self.evicted += 1
+
+    def purge_expired(self) -> int:
+        """
+        清理内存中所有过期条目
+        :return: 清理的条目数
+        """
+        self._last_purge = time.monotonic()
+        now = time.time()
+        keys = [key for key, item in self._entries.items() if item[0] < now]
+        for key in keys:
+            old = self._entries.pop(key)
+            self._bytes -= old[2]
+        self.expired += len(keys)
+        return len(keys)
+
+    def flush(self) -> None:
+        """在一个事务中写回所有修改，并清理数据库中的过期条目"""
+        self._last_flush = time.monotonic()
+        if self._db is None or not self._dirty:
+            return
+        upserts = []
+        deletes = []
+        for key, (expire_at, value) in self._dirty.items():
+            if value is _DELETED:
+                deletes.append(key)
+            else:
+                try:
+                    data = json.dumps(value, ensure_ascii=False)
+                    upserts.append(key + (expire_at, data))
+                    item = self._entries.get(key)
+                    if item is not None and item[1] is value:
+                        # 已经序列化过，用 JSON 长度校正 set 时的粗略估算
+                        self._bytes += len(data) - item[2]
+                        self._entries[key] = (item[0], value, len(data))
+                except (TypeError, ValueError) as e:
+                    self.logger.warning(f"插件状态 {key} 无法序列化，未持久化: {e}")
+        self._dirty.clear()
+        try:
+            with self._db:
+                self._db.executemany(
+                    "DELETE FROM plugin_state WHERE plugin = ? AND group_id = ? AND user_id = ?",
+                    deletes)
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO plugin_state (plugin, group_id, user_id, expire_at, data) "
+                    "VALUES (?, ?, ?, ?, ?)", upserts)
+                self._db.execute("DELETE FROM plugin_state WHERE expire_at < ?", (time.time(),))
+        except sqlite3.Error as e:
+            self.logger.error(f"写回插件状态数据库失败: {e}")
+
+    def close(self) -> None:
+        """停止定时写回，写回并关闭数据库"""
+        self.stop()
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "unflushed": len(self._dirty),
+        }
@@ -0,0 +1,157 @@
+"""
+分层时间轮
+以固定刻度为单位管理大量带过期时间的键：插入、更新、删除均为 O(1)，
+到期的键在推进时间轮时被移除，内存只与仍在有效期内的键数量有关。
+不需要后台任务，读写时按当前时间推进。
+"""
+import time
+from typing import Any, Dict, Hashable, List, Optional, Set
+
+
+class TimingWheel:
+    """
+    分层时间轮，默认刻度 0.1 秒、每层 64 个槽、4 层，覆盖约 19 天
+
+    第 L 层的每个槽代表 slots^L 个刻度，键按剩余刻度数放入对应层，
+    低层转完一圈时把上一层当前槽中的键重新分配到下层。超出范围的键放在最高层，到时再次分配。
+    """
+    def __init__(self, tick: float = 0.1, slots: int = 64, levels: int = 4):
+        """
+        :param tick: 刻度（秒），过期时间的精度
+        :param slots: 每层的槽数
+        :param levels: 层数
+        """
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._wheels: List[List[Set[Hashable]]] = [
+            [set() for _ in range(slots)] for _ in range(levels)]
+        self._counts = [0] * levels  # 每层的键数，用于跳过空层
+        # key -> [到期刻度, 值, 层, 槽]
+        self._entries: Dict[Hashable, list] = {}
+        self._current = self._now_tick()
+        self.expired = 0
+
+    def _now_tick(self) -> int:
+        return int(time.monotonic() / self.tick)
+
+    def _place(self, key: Hashable, entry: list) -> None:
+        delta = entry[0] - self._current
+        span = self.slots
+        level = 0
+        while delta >= span and level < self.levels - 1:
+            span *= self.slots
+            level += 1
+        slot = (entry[0] // (span // self.slots)) % self.slots
+        entry[2] = level
+        entry[3] = slot
+        self._wheels[level][slot].add(key)
+        self._counts[level] += 1
+
+    def _take(self, level: int, slot: int) -> Set[Hashable]:
+        """取出并清空一个槽"""
+        bucket = self._wheels[level][slot]
+        if bucket:
+            self._wheels[level][slot] = set()
+            self._counts[level] -= len(bucket)
+        return bucket
+
+    def _skip_empty(self, target: int) -> None:
+        """
+        低层全空时，直接跳到下一次需要分配上层槽的刻度之前，
+        长时间空闲后推进的代价与经过的刻度数无关
+        """
+        span = 1
+        for level in range(self.levels):
+            if self._counts[level]:
+                break
+            span *= self.slots
+        if span > 1:
+            self._current = min(target, (self._current // span + 1) * span - 1)
+
+    def advance(self) -> None:
+        """推进到当前时间，移除所有到期的键"""
+        target = self._now_tick()
+        if not self._entries:
+            # 时间轮为空时直接跳到当前刻度
+            self._current = max(self._current, target)
+            return
+        while self._current < target:
+            self._skip_empty(target)
+            if self._current >= target:
+                break
+            self._current += 1
+            tick = self._current
+            # 先从高层到低层把到期区间内的键重新分配
+            span = self.slots
+            for level in range(1, self.levels):
+                if tick % span:
+                    break
+                for key in self._take(level, (tick // span) % self.slots):
+                    self._place(key, self._entries[key])
+                span *= self.slots
+            bucket = self._take(0, tick % self.slots)
+            if bucket:
+                for key in bucket:
+                    entry = self._entries[key]
+                    if entry[0] <= tick:
+                        del self._entries[key]
+                        self.expired += 1
+                    else:
+                        # 最高层放不下时被提前分配到这里，重新放置
+                        self._place(key, entry)
+            if not self._entries:
+                self._current = target
+                break
+
+    def schedule(self, key: Hashable, delay: float, value: Any = None) -> None:
+        """
+        设置键在 delay 秒后过期，已存在时替换
+        :param key: 键
+        :param delay: 存活时间（秒）
+        :param value: 关联的值
+        """
+        self.advance()
+        self.cancel(key)
+        deadline = self._current + max(1, int(-(-delay // self.tick)))
+        entry = [deadline, value, 0, 0]
+        self._entries[key] = entry
+        self._place(key, entry)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """获取未过期键的值"""
+        self.advance()
+        entry = self._entries.get(key)
+        return default if entry is None else entry[1]
+
+    def update(self, key: Hashable, value: Any) -> bool:
+        """更新键的值，不改变过期时间，键不存在时返回 False"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        entry[1] = value
+        return True
+
+    def remaining(self, key: Hashable) -> Optional[float]:
+        """键的剩余时间（秒），不存在返回 None"""
+        self.advance()
+        entry = self._entries.get(key)
+        return None if entry is None else (entry[0] - self._current) * self.tick
+
+    def cancel(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self._wheels[entry[2]][entry[3]].discard(key)
+        self._counts[entry[2]] -= 1
+        return True
+
+    def __contains__(self, key: Hashable) -> bool:
+        self.advance()
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        return {"active": len(self._entries), "expired": self.expired}
@@ -0,0 +1,69 @@
+"""
+插件熔断：closed -> open -> half-open -> closed / open
+"""
+from Bot_core_Client import breaker as breaker_module
+from Bot_core_Client.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def _breaker(monkeypatch) -> tuple:
+    clock = FakeClock()
+    monkeypatch.setattr(breaker_module, "time", clock)
+    return clock, CircuitBreaker("test", failure_threshold=3, window=60, recovery_time=10,
+                                 max_recovery_time=30)
+
+
+def test_trips_after_threshold_and_recovers_after_successful_probe(monkeypatch):
+    clock, breaker = _breaker(monkeypatch)
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    clock.now += 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # 试探调用进行中，其他调用被拒绝
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+    assert breaker.stats()["trips"] == 1
+
+
+def test_failed_probe_doubles_recovery_time_up_to_the_limit(monkeypatch):
+    clock, breaker = _breaker(monkeypatch)
+    for _ in range(3):
+        breaker.record_failure()
+    for recovery in (10, 20, 30, 30):
+        clock.now += recovery - 1
+        assert not breaker.allow()
+        clock.now += 1
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+
+
+def test_failures_outside_the_window_do_not_trip(monkeypatch):
+    clock, breaker = _breaker(monkeypatch)
+    for _ in range(5):
+        breaker.record_failure()
+        clock.now += 31
+    assert breaker.state == CLOSED
+
+
+def test_released_probe_can_be_retried(monkeypatch):
+    clock, breaker = _breaker(monkeypatch)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 10
+    assert breaker.allow()
+    breaker.release()
+    assert breaker.allow()
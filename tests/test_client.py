@@ -0,0 +1,83 @@
+"""
+BotClient 的动作调用：echo 匹配、并发查询合并与本地消息存储的副本
+"""
+import asyncio
+import json
+
+from Bot_core_Client.api.BotClient import BotClient as FullBotClient
+from Bot_core_Client.api.client import BotClient
+from Bot_core_Client.message_store import MessageStore
+
+
+class RecordingSocket:
+    """记录发出的动作，测试中手动回复"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, data):
+        self.sent.append(json.loads(data))
+
+
+def _reply(client: BotClient, request: dict, data) -> None:
+    client.handle_response({"status": "ok", "retcode": 0, "data": data, "echo": request["echo"]})
+
+
+def test_coalesced_callers_each_get_a_copy():
+    async def main():
+        socket = RecordingSocket()
+        client = BotClient(socket)
+
+        async def initiator():
+            # 发起查询的调用方先恢复执行，修改结果不能影响合并进来的调用方
+            result = await client.call_action("get_group_info", {"group_id": 1}, coalesce=True)
+            result["mutated"] = True
+            return result
+
+        first = asyncio.ensure_future(initiator())
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(client.call_action("get_group_info", {"group_id": 1}, coalesce=True))
+        await asyncio.sleep(0)
+        assert len(socket.sent) == 1
+        assert client.coalesced == 1
+
+        _reply(client, socket.sent[0], {"v": 1, "members": [1, 2]})
+        mutated, joined = await asyncio.gather(first, second)
+        assert mutated == {"v": 1, "members": [1, 2], "mutated": True}
+        assert joined == {"v": 1, "members": [1, 2]}
+        assert mutated["members"] is not joined["members"]
+
+    asyncio.run(main())
+
+
+def test_response_is_matched_by_echo():
+    async def main():
+        socket = RecordingSocket()
+        client = BotClient(socket)
+        a = asyncio.ensure_future(client.call_action("get_status"))
+        b = asyncio.ensure_future(client.call_action("get_version_info"))
+        await asyncio.sleep(0)
+        _reply(client, socket.sent[1], "version")
+        _reply(client, socket.sent[0], "status")
+        assert await asyncio.gather(a, b) == ["status", "version"]
+        assert not client._pending
+
+    asyncio.run(main())
+
+
+def test_stored_messages_are_returned_as_copies():
+    async def main():
+        store = MessageStore()
+        event = {"post_type": "message", "message_type": "group", "group_id": 1, "user_id": 2,
+                 "message_id": 7, "raw_message": "hi", "message": [{"type": "text", "data": {"text": "hi"}}]}
+        store.add(event)
+        client = FullBotClient(RecordingSocket(), message_store=store)
+        found = await client.get_msg(7)
+        found["message"][0]["data"]["text"] = "changed"
+        recent = client.get_recent_msgs(group_id=1)
+        recent[0]["raw_message"] = "changed"
+        assert (await client.get_msg(7))["message"][0]["data"]["text"] == "hi"
+        assert client.get_recent_msgs(group_id=1)[0]["raw_message"] == "hi"
+        assert event["raw_message"] == "hi"
+
+    asyncio.run(main())
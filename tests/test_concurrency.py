@@ -0,0 +1,79 @@
+"""
+插件并发名额：按键计数与 queue / drop / latest 策略
+"""
+import asyncio
+
+import pytest
+
+from Bot_core_Client.concurrency import PluginConcurrency, validate
+
+
+def test_drop_policy_skips_when_full():
+    async def main():
+        gate = PluginConcurrency("p", 1, overflow="drop")
+        assert await gate.acquire(None)
+        assert not await gate.acquire(None)
+        gate.release(None)
+        assert await gate.acquire(None)
+        gate.release(None)
+        return gate.stats()
+
+    stats = asyncio.run(main())
+    assert stats["dropped"] == 1
+    assert stats["running"] == 0
+
+
+def test_latest_policy_keeps_only_the_newest_waiter():
+    async def main():
+        gate = PluginConcurrency("p", 1, overflow="latest")
+        assert await gate.acquire(None)
+        waiters = [asyncio.ensure_future(gate.acquire(None)) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.release(None)
+        results = await asyncio.gather(*waiters)
+        gate.release(None)
+        return results, gate.stats()
+
+    results, stats = asyncio.run(main())
+    assert results == [False, False, True]
+    assert stats["coalesced"] == 2
+    assert stats["running"] == 0
+
+
+def test_keys_are_counted_separately():
+    async def main():
+        gate = PluginConcurrency("p", 1, per_key="conversation", overflow="drop")
+        group = gate.key({"group_id": 1, "user_id": 2})
+        private = gate.key({"user_id": 2})
+        assert group != private
+        assert await gate.acquire(group)
+        assert await gate.acquire(private)
+        assert not await gate.acquire(group)
+        gate.release(group)
+        gate.release(private)
+        return gate._slots
+
+    assert asyncio.run(main()) == {}
+
+
+def test_cancelled_waiter_does_not_leak_a_slot():
+    async def main():
+        gate = PluginConcurrency("p", 1)
+        assert await gate.acquire(None)
+        waiter = asyncio.ensure_future(gate.acquire(None))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        gate.release(None)
+        return gate.stats()
+
+    stats = asyncio.run(main())
+    assert stats["running"] == 0
+    assert stats["waiting"] == 0
+
+
+@pytest.mark.parametrize("args", [(0, None, "queue"), (1, "room", "queue"), (1, None, "lifo"),
+                                  (1, None, "queue", 0)])
+def test_invalid_parameters(args):
+    with pytest.raises(ValueError):
+        validate("p", *args)
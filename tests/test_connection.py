@@ -0,0 +1,85 @@
+"""
+与连接无关的发送通道：断线排队、补发顺序与分片帧的失败处理
+"""
+import asyncio
+import json
+
+import pytest
+from websockets.exceptions import ConnectionClosedError
+
+from Bot_core_Client.api.client import BotClient
+from Bot_core_Client.api.connection import Connection, StreamInterrupted
+
+
+class ClosingSocket:
+    """读取完第一个分片后连接断开"""
+
+    async def send(self, data):
+        if isinstance(data, str):
+            raise ConnectionClosedError(None, None)
+        async for _ in data:
+            raise ConnectionClosedError(None, None)
+
+
+class RecordingSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, data):
+        self.sent.append(data)
+
+
+async def _fragments(action: str):
+    yield '{"action": "%s", "params": {}' % action
+    yield ', "echo": "x"}'
+
+
+def test_streamed_send_fails_immediately_when_connection_closes():
+    async def main():
+        connection = Connection()
+        connection.bind(ClosingSocket())
+        with pytest.raises(StreamInterrupted):
+            await connection.send(_fragments("send_group_msg"))
+        assert not connection.connected
+        # 未连接时分片帧同样不排队
+        with pytest.raises(StreamInterrupted):
+            await connection.send(_fragments("send_group_msg"))
+        assert connection.pending() == 0
+
+    asyncio.run(main())
+
+
+def test_call_action_returns_without_waiting_for_timeout():
+    async def main():
+        connection = Connection()
+        client = BotClient(connection)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        original_send = connection.send
+
+        async def send(data):
+            # 以分片发送动作帧，与 LocalFile 的发送方式相同
+            await original_send(_fragments(json.loads(data)["action"]))
+
+        connection.send = send
+        assert await client.call_action("send_group_msg", {"group_id": 1}, timeout=5) is None
+        assert loop.time() - started < 1
+        assert not client._pending
+
+    asyncio.run(main())
+
+
+def test_offline_actions_are_batched_into_sqlite_and_flushed_in_order(tmp_path):
+    async def main():
+        connection = Connection(sqlite_path=str(tmp_path / "outbound.db"), flush_interval=0)
+        for i in range(5):
+            await connection.send(json.dumps({"action": "send_group_msg", "params": {"i": i}}))
+        assert connection.pending() == 5
+        socket = RecordingSocket()
+        connection.bind(socket)
+        await connection._flush_task
+        assert [json.loads(frame)["params"]["i"] for frame in socket.sent] == list(range(5))
+        assert connection.pending() == 0
+        connection.close()
+
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+"""
+入站事件去重：消息按 message_id，通知只丢弃重连后重新推送的
+"""
+from Bot_core_Client.dedup import EventDeduplicator
+
+
+def _poke(time_: int = 1700000000) -> dict:
+    return {"post_type": "notice", "notice_type": "notify", "sub_type": "poke", "time": time_,
+            "group_id": 1, "user_id": 2, "target_id": 10000, "self_id": 10000}
+
+
+def test_same_second_pokes_are_both_dispatched():
+    dedup = EventDeduplicator()
+    dedup.connected()
+    assert not dedup.is_duplicate(_poke())
+    assert not dedup.is_duplicate(_poke())
+    assert dedup.stats()["dropped"] == 0
+
+
+def test_notice_replayed_after_reconnect_is_dropped():
+    dedup = EventDeduplicator()
+    dedup.connected()
+    assert not dedup.is_duplicate(_poke())
+    dedup.connected()
+    assert dedup.is_duplicate(_poke())
+    assert not dedup.is_duplicate(_poke(1700000001))
+
+
+def test_notice_after_replay_window_is_dispatched():
+    dedup = EventDeduplicator(replay_window=0)
+    dedup.connected()
+    assert not dedup.is_duplicate(_poke())
+    dedup.connected()
+    dedup._connected_at -= 1
+    assert not dedup.is_duplicate(_poke())
+
+
+def test_messages_are_deduplicated_by_message_id():
+    dedup = EventDeduplicator()
+    dedup.connected()
+    message = {"post_type": "message", "message_id": 5, "time": 1}
+    assert not dedup.is_duplicate(message)
+    assert dedup.is_duplicate(dict(message, time=2))
+    assert not dedup.is_duplicate({"post_type": "meta_event", "meta_event_type": "heartbeat"})
@@ -0,0 +1,54 @@
+"""
+下载缓存：LRU 淘汰、并发请求合并与重启后恢复
+"""
+import asyncio
+import os
+
+from Bot_core_Client.api.download_cache import DownloadCache
+
+
+def _writer(size: int, calls: list):
+    async def write(path: str) -> bool:
+        calls.append(path)
+        await asyncio.sleep(0.01)
+        with open(path, "wb") as f:
+            f.write(b"x" * size)
+        return True
+    return write
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    async def main():
+        cache = DownloadCache(str(tmp_path), max_bytes=250)
+        calls = []
+        a = await cache.fetch("a", _writer(100, calls), ".jpg")
+        await cache.fetch("b", _writer(100, calls), ".jpg")
+        assert cache.get("a") == a  # a 最近使用过，淘汰 b
+        await cache.fetch("c", _writer(100, calls), ".jpg")
+        return cache
+
+    cache = asyncio.run(main())
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1
+    assert sorted(os.listdir(tmp_path)) == ["a.jpg", "c.jpg"]
+
+
+def test_concurrent_fetches_download_once(tmp_path):
+    async def main():
+        cache = DownloadCache(str(tmp_path))
+        calls = []
+        paths = await asyncio.gather(*(cache.fetch("k", _writer(10, calls), ".png") for _ in range(5)))
+        return paths, calls
+
+    paths, calls = asyncio.run(main())
+    assert len(set(paths)) == 1
+    assert len(calls) == 1
+
+
+def test_existing_files_are_restored_and_partial_files_removed(tmp_path):
+    (tmp_path / "k.png").write_bytes(b"x" * 10)
+    (tmp_path / "tmp123.part").write_bytes(b"x")
+    cache = DownloadCache(str(tmp_path))
+    assert cache.get("k") == os.path.join(str(tmp_path), "k.png")
+    assert not (tmp_path / "tmp123.part").exists()
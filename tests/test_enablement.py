@@ -0,0 +1,50 @@
+"""
+按群开关插件：位序号分配、交还与保存
+"""
+import asyncio
+import json
+
+from Bot_core_Client.enablement import EnablementTable
+
+
+def test_disable_only_affects_that_group():
+    table = EnablementTable()
+    bit = 1 << table.slot("roll")
+    assert table.disable("roll", group_id=1)
+    assert not table.disable("roll", group_id=1)
+    assert table.mask({"group_id": 1, "user_id": 2}) & bit
+    assert not table.mask({"group_id": 2, "user_id": 2}) & bit
+    assert not table.is_enabled("roll", group_id=1)
+    assert table.is_enabled("roll", user_id=2)
+    assert table.disabled_plugins(group_id=1) == ["roll"]
+    assert table.enable("roll", group_id=1)
+    assert table.mask({"group_id": 1}) == 0
+
+
+def test_reclaim_frees_unused_slots_and_keeps_disabled_ones():
+    table = EnablementTable()
+    for name in ("a", "b", "c"):
+        table.slot(name)
+    table.disable("c", group_id=1)
+    assert table.reclaim(["b"]) == 1
+    # a 的位被交还，c 仍被关闭，保留原来的位
+    assert table.slot("d") == 0
+    assert table.slot("c") == 2
+    assert not table.is_enabled("c", group_id=1)
+
+
+def test_changes_are_saved_once_after_the_delay(tmp_path):
+    path = tmp_path / "enablement.json"
+
+    async def main():
+        table = EnablementTable(str(path), save_delay=0.05)
+        table.disable("a", group_id=1)
+        table.disable("b", group_id=1)
+        assert not path.exists()
+        await asyncio.sleep(0.2)
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    data = asyncio.run(main())
+    assert data["groups"] == {"1": 3}
+    restored = EnablementTable(str(path))
+    assert restored.disabled_plugins(group_id=1) == ["a", "b"]
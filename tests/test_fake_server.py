@@ -0,0 +1,60 @@
+"""
+端到端测试：启动 FakeNapCat，运行 Bot 加载插件，通过 wait_for_action 断言机器人发出的动作
+"""
+import asyncio
+import textwrap
+
+from Bot_core_Client.bot import Bot
+from Bot_core_Client.fake_server import FakeNapCat
+
+PLUGIN_PACKAGE = "fake_server_plugins"
+PLUGIN = textwrap.dedent('''
+    from Bot_core_Client.api.client import Message, plugin
+
+
+    @plugin("echo_test")
+    async def echo(msg: Message, client):
+        if msg.raw.startswith("/echo "):
+            await client.send_group_msg(msg.group_id, msg.raw[len("/echo "):])
+''')
+
+
+def _write_plugins(tmp_path, monkeypatch) -> None:
+    plugin_dir = tmp_path / PLUGIN_PACKAGE
+    plugin_dir.mkdir()
+    (plugin_dir / "__init__.py").write_text("")
+    (plugin_dir / "echo.py").write_text(PLUGIN, encoding="utf-8")
+    # 插件按相对于当前目录的模块路径导入
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+
+async def _wait_until(condition, timeout: float = 5.0) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "等待超时"
+        await asyncio.sleep(0.02)
+
+
+def test_plugin_replies_through_fake_server(tmp_path, monkeypatch):
+    _write_plugins(tmp_path, monkeypatch)
+
+    async def main():
+        async with FakeNapCat(token="secret", seed=1) as server:
+            group_id = next(iter(server.members))
+            user_id = next(iter(server.members[group_id]))
+            bot = Bot(server.url, token=server.token, plugin_dir=PLUGIN_PACKAGE)
+            task = asyncio.ensure_future(bot.run())
+            try:
+                await _wait_until(lambda: server.stats()["connections"]
+                                  and bot.plugin_manager.get_plugin_count())
+                await server.push(server.group_message(group_id, user_id, "/echo 你好"))
+                request = await server.wait_for_action(
+                    "send_group_msg", lambda params: params.get("group_id") == group_id)
+                assert request["params"]["message"] == [{"type": "text", "data": {"text": "你好"}}]
+            finally:
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+入站事件队列：到达顺序与队列满时的策略
+"""
+import asyncio
+
+import pytest
+
+from Bot_core_Client.inbound_queue import InboundQueue
+
+
+def _event(post_type: str, i: int) -> dict:
+    return {"post_type": post_type, "i": i}
+
+
+async def _drain(queue: InboundQueue) -> list:
+    events = []
+    while len(queue):
+        events.append(await queue.get())
+    return events
+
+
+def test_events_come_out_in_arrival_order():
+    async def main():
+        queue = InboundQueue(max_size=10)
+        for i, post_type in enumerate(["message", "notice", "meta_event", "message"]):
+            await queue.put(_event(post_type, i))
+        return [e["i"] for e in await _drain(queue)]
+
+    assert asyncio.run(main()) == [0, 1, 2, 3]
+
+
+def test_drop_oldest_policy():
+    async def main():
+        queue = InboundQueue(max_size=2, policy="drop_oldest")
+        for i in range(4):
+            await queue.put(_event("message", i))
+        assert queue.stats()["dropped_by_type"] == {"message": 2}
+        return [e["i"] for e in await _drain(queue)]
+
+    assert asyncio.run(main()) == [2, 3]
+
+
+def test_priority_policy_drops_least_important_first():
+    async def main():
+        queue = InboundQueue(max_size=3, policy="priority")
+        await queue.put(_event("message", 0))
+        await queue.put(_event("meta_event", 1))
+        await queue.put(_event("notice", 2))
+        await queue.put(_event("message", 3))  # 丢弃心跳
+        await queue.put(_event("message", 4))  # 丢弃通知
+        await queue.put(_event("notice", 5))  # 队列中都是消息，丢弃新事件
+        assert queue.stats()["dropped_by_type"] == {"meta_event": 1, "notice": 2}
+        return [e["i"] for e in await _drain(queue)]
+
+    assert asyncio.run(main()) == [0, 3, 4]
+
+
+def test_block_policy_waits_for_room():
+    async def main():
+        queue = InboundQueue(max_size=1, policy="block")
+        await queue.put(_event("message", 0))
+        blocked = asyncio.ensure_future(queue.put(_event("message", 1)))
+        await asyncio.sleep(0)
+        assert not blocked.done()
+        assert (await queue.get())["i"] == 0
+        await asyncio.wait_for(blocked, 1)
+        assert queue.stats()["blocked"] == 1
+        return (await queue.get())["i"]
+
+    assert asyncio.run(main()) == 1
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        InboundQueue(policy="lifo")
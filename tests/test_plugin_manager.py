@@ -0,0 +1,198 @@
+"""
+插件调用链：冷却与限频、熔断、并发限制
+"""
+import asyncio
+
+from Bot_core_Client.api.client import HANDLED
+from Bot_core_Client.api.cooldown import cooldown
+from Bot_core_Client.plugin_manager import PluginManager
+
+
+def _plugin(func, name: str, priority: int = 0, concurrency=None):
+    func.plugin_name = name
+    func.plugin_tier = "normal"
+    func.plugin_priority = priority
+    func.plugin_concurrency = concurrency
+    return func
+
+
+def _manager(*plugins) -> PluginManager:
+    manager = PluginManager("tests_no_plugins")
+    manager.plugins = list(plugins)
+    return manager
+
+
+def _group_message(raw: str, user_id: int = 2) -> dict:
+    return {"post_type": "message", "message_type": "group", "group_id": 1, "user_id": user_id,
+            "raw_message": raw, "message": [{"type": "text", "data": {"text": raw}}]}
+
+
+HEARTBEAT = {"post_type": "meta_event", "meta_event_type": "heartbeat", "self_id": 10000}
+
+
+def test_cooldown_ignores_heartbeats():
+    replies = []
+
+    @cooldown(30, per="global")
+    async def ping(msg, client):
+        if msg.get("raw_message") == "/ping":
+            replies.append(msg["raw_message"])
+            return HANDLED
+
+    manager = _manager(_plugin(ping, "test_cooldown_heartbeat"))
+
+    async def main():
+        await manager.process_message(dict(HEARTBEAT), None)
+        await manager.process_message(_group_message("/ping"), None)
+        await manager.process_message(_group_message("/ping"), None)
+
+    asyncio.run(main())
+    assert replies == ["/ping"]
+
+
+def test_cooldown_counts_only_handled_messages():
+    replies = []
+
+    @cooldown(30, per="group")
+    async def ping(msg, client):
+        if msg.get("raw_message") == "/ping":
+            replies.append(msg["raw_message"])
+            return True
+
+    manager = _manager(_plugin(ping, "test_cooldown_handled"))
+
+    async def main():
+        for raw in ("hello", "world", "/ping", "/ping"):
+            await manager.process_message(_group_message(raw), None)
+
+    asyncio.run(main())
+    assert replies == ["/ping"]
+
+
+def test_cooldown_blocks_concurrent_burst():
+    calls = []
+
+    @cooldown(30, per="group")
+    async def slow(msg, client):
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return HANDLED
+
+    manager = _manager(_plugin(slow, "test_cooldown_burst"))
+
+    async def main():
+        await asyncio.gather(*(manager.process_message(_group_message("/draw"), None) for _ in range(10)))
+
+    asyncio.run(main())
+    assert calls == [1]
+
+
+class Recorder:
+    """代替 client 传给插件，记录同时运行的数量"""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.calls = 0
+        self.release = None
+
+    async def work(self):
+        self.calls += 1
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await self.release.wait()
+        finally:
+            self.running -= 1
+
+
+def test_gate_waiters_do_not_count_toward_inflight():
+    from Bot_core_Client.api.dispatch import DispatchTracker
+
+    async def gated(msg, client):
+        await client.work()
+
+    manager = _manager(_plugin(gated, "test_gate_inflight", concurrency=(1, None, "queue", 100)))
+    recorder = Recorder()
+
+    async def main():
+        recorder.release = asyncio.Event()
+        tracker = DispatchTracker()
+        tasks = []
+        for _ in range(5):
+            # 与 Bot._dispatch_loop 相同：占用上限的分发数低于 2 时才开始下一个分发
+            await asyncio.wait_for(tracker.wait_below(2), 1)
+            tasks.append(asyncio.ensure_future(tracker.run(manager.process_message(_group_message("x"), recorder))))
+            await asyncio.sleep(0)
+        assert tracker.running == 5
+        assert tracker.busy == 1
+        recorder.release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert recorder.calls == 5
+    assert recorder.peak == 1
+
+
+def test_queue_backlog_limit_drops_new_events():
+    async def gated(msg, client):
+        await client.work()
+
+    manager = _manager(_plugin(gated, "test_gate_backlog", concurrency=(1, None, "queue", 2)))
+    recorder = Recorder()
+
+    async def main():
+        recorder.release = asyncio.Event()
+        tasks = [asyncio.ensure_future(manager.process_message(_group_message("x"), recorder)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        recorder.release.set()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert recorder.calls == 3
+    assert manager.gates["test_gate_backlog"].stats()["dropped"] == 2
+
+
+GATED_PLUGIN = '''
+from Bot_core_Client.api.client import plugin
+
+
+@plugin("test_reload_gate", max_concurrency=1)
+async def gated(msg, client):
+    await client.work()
+'''
+
+
+def test_reload_from_watcher_thread_keeps_the_concurrency_gate(tmp_path, monkeypatch):
+    package = "reload_gate_plugins"
+    plugin_dir = tmp_path / package
+    plugin_dir.mkdir()
+    (plugin_dir / "__init__.py").write_text("")
+    (plugin_dir / "gated.py").write_text(GATED_PLUGIN, encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    manager = PluginManager(package)
+    recorder = Recorder()
+
+    async def main():
+        recorder.release = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        manager._loop = loop
+        manager.load_plugins()
+        gate = manager.gates["test_reload_gate"]
+        first = asyncio.ensure_future(manager.process_message(_group_message("x"), recorder))
+        await asyncio.sleep(0)
+        # 文件监听线程触发重新加载，重新加载在事件循环中进行
+        await loop.run_in_executor(None, manager.request_reload)
+        await asyncio.sleep(0.05)
+        assert manager.get_plugin_count() == 1
+        assert manager.gates["test_reload_gate"] is gate
+        second = asyncio.ensure_future(manager.process_message(_group_message("y"), recorder))
+        await asyncio.sleep(0.01)
+        assert recorder.running == 1
+        recorder.release.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(main())
+    assert recorder.calls == 2
+    assert recorder.peak == 1
@@ -0,0 +1,36 @@
+"""
+入站限流：超出速率的消息按策略丢弃或合并
+"""
+import asyncio
+
+from Bot_core_Client.ratelimit import InboundLimiter
+
+
+def _message(i: int) -> dict:
+    return {"post_type": "message", "message_type": "group", "group_id": 1, "user_id": 2,
+            "message_id": i, "raw_message": str(i), "message": [{"type": "text", "data": {"text": str(i)}}]}
+
+
+def test_merge_policy_emits_one_event_after_the_window():
+    async def main():
+        dispatched = []
+        limiter = InboundLimiter(user_rate=0.01, user_burst=1, group_rate=None, policy="merge",
+                                 merge_window=0.05, max_merge_delay=1.0)
+        limiter.bind(dispatched.append)
+        assert limiter.admit(_message(1))
+        assert not limiter.admit(_message(2))
+        assert not limiter.admit(_message(3))
+        assert dispatched == []
+        await asyncio.sleep(0.1)
+        assert len(dispatched) == 1
+        assert dispatched[0]["raw_message"] == "2\n3"
+        assert dispatched[0]["merged_message_ids"] == [2, 3]
+
+    asyncio.run(main())
+
+
+def test_non_message_events_are_not_limited():
+    limiter = InboundLimiter(user_rate=0.01, user_burst=1, group_rate=None, policy="drop")
+    assert limiter.admit(_message(1))
+    assert not limiter.admit(_message(2))
+    assert limiter.admit({"post_type": "notice", "notice_type": "notify", "group_id": 1, "user_id": 2})
@@ -0,0 +1,39 @@
+"""
+cron 表达式解析与下一次触发时间
+"""
+from datetime import datetime
+
+import pytest
+
+from Bot_core_Client.scheduler import CronExpr
+
+
+def test_steps_ranges_and_weekdays():
+    cron = CronExpr("*/15 9-17 * * 1-5")
+    # 2026-10-16 是周五，下一次在周一 9:00
+    assert cron.next_after(datetime(2026, 10, 16, 17, 50)) == datetime(2026, 10, 19, 9, 0)
+    assert cron.next_after(datetime(2026, 10, 19, 9, 0)) == datetime(2026, 10, 19, 9, 15)
+    assert cron.next_after(datetime(2026, 10, 19, 9, 14, 59)) == datetime(2026, 10, 19, 9, 15)
+
+
+def test_day_or_weekday_like_crontab():
+    # 日与周都指定时满足其一即可：每月 13 日或每个周五
+    cron = CronExpr("0 0 13 * 5")
+    assert cron.next_after(datetime(2026, 10, 19, 12, 0)) == datetime(2026, 10, 23, 0, 0)
+    assert cron.next_after(datetime(2026, 11, 7, 0, 0)) == datetime(2026, 11, 13, 0, 0)
+
+
+def test_sunday_is_zero_or_seven_and_months_roll_over():
+    assert CronExpr("30 8 * * 7").next_after(datetime(2026, 10, 19)) == datetime(2026, 10, 25, 8, 30)
+    assert CronExpr("0 0 1 1 *").next_after(datetime(2026, 10, 19)) == datetime(2027, 1, 1, 0, 0)
+
+
+@pytest.mark.parametrize("expr", ["* * * *", "60 * * * *", "* 5-2 * * *", "*/0 * * * *"])
+def test_invalid_expressions(expr):
+    with pytest.raises(ValueError):
+        CronExpr(expr)
+
+
+def test_impossible_date_raises():
+    with pytest.raises(ValueError):
+        CronExpr("0 0 31 2 *").next_after(datetime(2026, 1, 1))
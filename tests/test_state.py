@@ -0,0 +1,28 @@
+"""
+插件会话状态存储：大小估算、写回与重新载入
+"""
+from Bot_core_Client.state import StateStore
+
+
+def test_size_is_corrected_to_json_length_on_flush(tmp_path):
+    store = StateStore(sqlite_path=str(tmp_path / "state.db"), batch_size=1000)
+    value = {"step": 2, "answers": ["a", "b"]}
+    store.set("quiz", 1, 2, value)
+    assert store.stats()["bytes"] > 0
+    store.flush()
+    assert store.stats()["bytes"] == len('{"step": 2, "answers": ["a", "b"]}')
+    store.close()
+
+    reopened = StateStore(sqlite_path=str(tmp_path / "state.db"))
+    assert reopened.get("quiz", 1, 2) == value
+    assert reopened.stats()["bytes"] == len('{"step": 2, "answers": ["a", "b"]}')
+    reopened.close()
+
+
+def test_entries_are_evicted_by_estimated_size():
+    store = StateStore(max_bytes=2000)
+    for i in range(50):
+        store.set("big", 1, i, "x" * 200)
+    assert store.stats()["bytes"] <= 2000
+    assert store.get("big", 1, 49) == "x" * 200
+    assert store.get("big", 1, 0) is None
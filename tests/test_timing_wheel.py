@@ -0,0 +1,60 @@
+"""
+分层时间轮：到期时间、跨层重新分配与超出范围的键
+"""
+from Bot_core_Client import timing_wheel
+from Bot_core_Client.timing_wheel import TimingWheel
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_keys_expire_exactly_at_their_deadline_across_levels(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(timing_wheel, "time", clock)
+    # 每层 4 个槽、3 层：第 0 层 4 个刻度，第 1 层 16 个，第 2 层 64 个，更远的键放在最高层
+    wheel = TimingWheel(tick=1.0, slots=4, levels=3)
+    delays = {"a": 2, "b": 5, "c": 17, "d": 63, "e": 100}
+    for key, delay in delays.items():
+        wheel.schedule(key, delay, value=key)
+    for elapsed in range(1, 102):
+        clock.now += 1
+        for key, delay in delays.items():
+            assert (key in wheel) == (elapsed < delay), (key, elapsed)
+    assert len(wheel) == 0
+    assert wheel.stats()["expired"] == len(delays)
+
+
+def test_update_and_cancel_keep_the_deadline(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(timing_wheel, "time", clock)
+    wheel = TimingWheel(tick=1.0, slots=4, levels=3)
+    wheel.schedule("k", 10, 1)
+    clock.now += 6
+    assert wheel.update("k", 2)
+    assert wheel.get("k") == 2
+    assert wheel.remaining("k") == 4
+    clock.now += 4
+    assert wheel.get("k") is None
+    assert not wheel.update("k", 3)
+    wheel.schedule("k", 10)
+    assert wheel.cancel("k")
+    assert "k" not in wheel
+
+
+def test_long_idle_period_then_new_keys(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(timing_wheel, "time", clock)
+    wheel = TimingWheel(tick=1.0, slots=4, levels=3)
+    wheel.schedule("old", 3)
+    clock.now += 10000
+    assert "old" not in wheel
+    wheel.schedule("new", 3)
+    clock.now += 2
+    assert "new" in wheel
+    clock.now += 1
+    assert "new" not in wheel